@@ -84,7 +84,7 @@ INSTALLED_APPS = [
     'project.apps.ProjectConfig',
     'django_rq',
     'hreflang',
-    'openldap',
+    'openldap.apps.OpenldapConfig',
     'security',
     'shibboleth',
     'stats',
@@ -200,6 +200,8 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
+# How long browsers and proxies may reuse the login page before revalidating
+LOGIN_PAGE_CACHE_MAX_AGE = int(os.environ.get('LOGIN_PAGE_CACHE_MAX_AGE', 60))
 
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -243,15 +245,28 @@ SHIBBOLETH_FORCE_REAUTH_SESSION_KEY = 'shib_force_reauth'
 CREATE_UNKNOWN_USER = False
 
 # Redis Queue
-RQ_QUEUES = {
-    'default': {
-        'HOST': os.environ.get('RQ_HOST'),
-        'PORT': os.environ.get('RQ_PORT'),
-        'DB': os.environ.get('RQ_DB'),
-        'PASSWORD': os.environ.get('RQ_PASSWORD'),
-        'DEFAULT_TIMEOUT': os.environ.get('RQ_DEFAULT_TIMEOUT'),
-    }
+RQ_CONNECTION = {
+    'HOST': os.environ.get('RQ_HOST'),
+    'PORT': os.environ.get('RQ_PORT'),
+    'DB': os.environ.get('RQ_DB'),
+    'PASSWORD': os.environ.get('RQ_PASSWORD'),
+    'DEFAULT_TIMEOUT': os.environ.get('RQ_DEFAULT_TIMEOUT'),
 }
+# Queues in the order workers should take jobs from them:
+# - interactive: OpenLDAP changes to a single user, project or membership,
+#   which someone is waiting on
+# - default: jobs queued before the other queues existed
+# - email: notification emails
+# - ldap-bulk: OpenLDAP listings and batches
+# - reporting: long running reports
+RQ_QUEUE_PRIORITY = [
+    'interactive',
+    'default',
+    'email',
+    'ldap-bulk',
+    'reporting',
+]
+RQ_QUEUES = {name: dict(RQ_CONNECTION) for name in RQ_QUEUE_PRIORITY}
 '''
 if DEBUG:
     # This will cause jobs to execute immediately and on the same thread as they
@@ -269,6 +284,86 @@ OPENLDAP_JWT_KEY = os.environ.get('OPENLDAP_JWT_KEY')
 OPENLDAP_JWT_ISSUER = os.environ.get('OPENLDAP_JWT_ISSUER')
 OPENLDAP_JWT_AUDIENCE = os.environ.get('OPENLDAP_JWT_AUDIENCE')
 OPENLDAP_JWT_ALGORITHM = os.environ.get('OPENLDAP_JWT_ALGORITHM')
+OPENLDAP_POOL_SIZE = int(os.environ.get('OPENLDAP_POOL_SIZE', 10))
+OPENLDAP_MAX_RETRIES = int(os.environ.get('OPENLDAP_MAX_RETRIES', 3))
+OPENLDAP_RETRY_BACKOFF = float(os.environ.get('OPENLDAP_RETRY_BACKOFF', 0.5))
+
+# OpenLDAP circuit breaker
+OPENLDAP_CIRCUIT_WINDOW = int(os.environ.get('OPENLDAP_CIRCUIT_WINDOW', 60))
+OPENLDAP_CIRCUIT_MIN_REQUESTS = int(
+    os.environ.get('OPENLDAP_CIRCUIT_MIN_REQUESTS', 5)
+)
+OPENLDAP_CIRCUIT_FAILURE_RATE = float(
+    os.environ.get('OPENLDAP_CIRCUIT_FAILURE_RATE', 0.5)
+)
+OPENLDAP_CIRCUIT_RESET_TIMEOUT = int(
+    os.environ.get('OPENLDAP_CIRCUIT_RESET_TIMEOUT', 30)
+)
+OPENLDAP_CIRCUIT_MAX_RESET_TIMEOUT = int(
+    os.environ.get('OPENLDAP_CIRCUIT_MAX_RESET_TIMEOUT', 600)
+)
+OPENLDAP_CIRCUIT_PROBE_TIMEOUT = int(
+    os.environ.get('OPENLDAP_CIRCUIT_PROBE_TIMEOUT', 30)
+)
+OPENLDAP_CIRCUIT_MAX_DEFERRALS = int(
+    os.environ.get('OPENLDAP_CIRCUIT_MAX_DEFERRALS', 10)
+)
+
+# Caches
+# Cache shared between processes, used through common.cache and by the
+# OpenLDAP circuit breaker. It is held in Redis by default, and the
+# openldap.E001 deployment check refuses a process-local backend.
+SHARED_CACHE = 'shared'
+# Cache holding the version of the in-process institution registry
+INSTITUTION_REGISTRY_CACHE = SHARED_CACHE
+# The Redis server of the RQ queues, with the caches in database 1. The
+# password is not quoted, as redis-py does not unquote it for django-redis.
+REDIS_CACHE_LOCATION = 'redis://{auth}{host}:{port}/1'.format(
+    auth=':{}@'.format(os.environ['RQ_PASSWORD'])
+    if os.environ.get('RQ_PASSWORD') else '',
+    host=os.environ.get('RQ_HOST', 'localhost'),
+    port=os.environ.get('RQ_PORT', 6379),
+)
+CACHES = {
+    # Local to each process
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    SHARED_CACHE: {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django_redis.cache.RedisCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', REDIS_CACHE_LOCATION),
+        'TIMEOUT': int(os.environ.get('CACHE_TTL', 600)),
+        'KEY_PREFIX': 'cogs3',
+    },
+    # Read-through cache of OpenLDAP user and project lookups, invalidated
+    # whenever the API changes the user or project. The changes are made by
+    # RQ workers, so the cache must be shared with them, by default in Redis.
+    # django-redis ignores MAX_ENTRIES: the size of the cache is bounded by
+    # the maxmemory of Redis, with the volatile-lru policy, which evicts only
+    # keys with a timeout and so never the RQ queues.
+    'openldap': {
+        'BACKEND': os.environ.get(
+            'OPENLDAP_CACHE_BACKEND',
+            'django_redis.cache.RedisCache',
+        ),
+        'LOCATION': os.environ.get(
+            'OPENLDAP_CACHE_LOCATION', REDIS_CACHE_LOCATION
+        ),
+        'TIMEOUT': int(os.environ.get('OPENLDAP_CACHE_TTL', 300)),
+        'KEY_PREFIX': 'openldap',
+    },
+}
+
+# Cache of usage totals read from sacct dumps by calculate_priority
+SACCT_CACHE_DIR = os.environ.get(
+    'SACCT_CACHE_DIR', os.path.join(BASE_DIR, 'priority', 'cache')
+)
+SACCT_CACHE_MAX_BYTES = int(
+    os.environ.get('SACCT_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+)
 
 # Logging
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
@@ -1,5 +1,4 @@
 """cogs3 URL Configuration"""
-from django.conf import settings
 from django.conf.urls.i18n import i18n_patterns
 from django.contrib import admin
 from django.contrib.auth.views import LoginView
@@ -7,8 +6,8 @@ from django.urls import include
 from django.urls import path
 from django.views.generic.base import TemplateView
 
-from institution.models import Institution
 from users.openldap import reset_openldap_password
+from users.views import EducationalLoginView
 from users.views import LogoutView
 from users.views import RegisterView, CompleteRegistrationView
 from users.views import TermsOfService
@@ -29,14 +28,7 @@ urlpatterns = i18n_patterns(
     ),
     path(
         'accounts/login/',
-        LoginView.as_view(
-            redirect_authenticated_user=True,
-            extra_context={
-                'institutions': Institution.objects.order_by('name'),
-                'shibboleth_idp_login': settings.SHIBBOLETH_IDENTITY_PROVIDER_LOGIN,
-            },
-            template_name="registration/educational_login.html",
-        ),
+        EducationalLoginView.as_view(),
         name='login',
     ),
     path(
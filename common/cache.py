@@ -0,0 +1,110 @@
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+logger = logging.getLogger('common')
+
+MISSING = object()
+
+
+def get_cache():
+    """
+    Get the cache shared by every process, configured by the SHARED_CACHE
+    alias in CACHES.
+    """
+    return caches[settings.SHARED_CACHE]
+
+
+def tag_key(tag):
+    return 'tag:{}'.format(tag)
+
+
+def get_tag_versions(tags):
+    """
+    Get the current version of each tag, starting a version for any tag not
+    seen before.
+    """
+    cache = get_cache()
+    keys = [tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def make_key(namespace, parts=(), tags=()):
+    """
+    Build the key of a cached value from its namespace and the parts which
+    identify it within the namespace.
+
+    The key includes the current version of each of the value's tags, so
+    invalidating a tag leaves every value cached under it unreachable, to be
+    evicted by the cache in time.
+    """
+    key = ':'.join([namespace] + [str(part) for part in parts])
+    if tags:
+        key += ':' + '.'.join(get_tag_versions(tags))
+    return key
+
+
+def stats_key(namespace, outcome):
+    return 'stats:{namespace}:{outcome}'.format(
+        namespace=namespace,
+        outcome=outcome,
+    )
+
+
+def count(namespace, outcome):
+    cache = get_cache()
+    key = stats_key(namespace, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_or_set(namespace, parts, default, tags=(), timeout=DEFAULT_TIMEOUT):
+    """
+    Get a cached value, or compute it by calling `default` and cache it
+    until `timeout` passes or one of its `tags` is invalidated.
+
+    Hits and misses are counted per namespace, see get_stats().
+    """
+    cache = get_cache()
+    key = make_key(namespace, parts, tags)
+    value = cache.get(key, MISSING)
+    if value is MISSING:
+        count(namespace, 'misses')
+        logger.debug('Cache miss for %s', key)
+        value = default()
+        cache.set(key, value, timeout=timeout)
+    else:
+        count(namespace, 'hits')
+    return value
+
+
+def invalidate(*tags):
+    """
+    Discard every value cached under any of the tags.
+    """
+    get_cache().set_many(
+        {tag_key(tag): uuid.uuid4().hex for tag in tags},
+        timeout=None,
+    )
+
+
+def get_stats(namespace):
+    """
+    Get the number of hits and misses counted for a namespace.
+    """
+    cache = get_cache()
+    return {
+        outcome: cache.get(stats_key(namespace, outcome), 0)
+        for outcome in ('hits', 'misses')
+    }
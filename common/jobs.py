@@ -0,0 +1,118 @@
+import inspect
+import logging
+import uuid
+from functools import wraps
+
+from django_rq import get_queue, job
+from rq import get_current_job
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+logger = logging.getLogger('queue')
+
+# How long the latest job for an object is remembered
+COALESCE_TTL = 24 * 60 * 60
+
+PENDING_STATUSES = [
+    JobStatus.QUEUED,
+    JobStatus.DEFERRED,
+    JobStatus.SCHEDULED,
+]
+
+
+def decode(value):
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+def is_superseded(current_job, key):
+    """
+    Check whether a newer job has been queued for the same object as the
+    current job.
+    """
+    latest_job_id = decode(current_job.connection.get(key))
+    return latest_job_id is not None and latest_job_id != current_job.id
+
+
+def remove_pending_job(job_id, connection):
+    """
+    Remove a job from its queue, if it has not started yet.
+    """
+    try:
+        pending_job = Job.fetch(job_id, connection=connection)
+    except NoSuchJobError:
+        return
+    if pending_job.get_status() in PENDING_STATUSES:
+        logger.info('Removing superseded job %s', job_id)
+        pending_job.delete()
+
+
+def hand_over(current_job, job_id):
+    """
+    Make the job with `job_id`, queued to take the place of the current job
+    (when it is deferred, for example), the latest job for its object.
+    """
+    get_key = getattr(current_job.func, 'coalesce_key', None)
+    if get_key is not None:
+        current_job.connection.set(
+            get_key(current_job.args, current_job.kwargs),
+            job_id,
+            ex=COALESCE_TTL,
+        )
+
+
+def coalesced_job(target, queue='default'):
+    """
+    The same as django_rq's job decorator, but only the most recently queued
+    job for each object of `target` is run. Jobs sharing a target replace
+    one another, so a target should name a single idempotent operation.
+
+    The object is identified by the decorated function's first argument.
+    Queueing a job removes any job still waiting in the queue for the same
+    object, and a job which had already been taken by a worker is skipped if
+    a newer job for its object has been queued since, so only the last
+    requested change is applied.
+    """
+    def decorator(func):
+        parameter = next(iter(inspect.signature(func).parameters))
+
+        def get_key(args, kwargs):
+            object_id = args[0] if args else kwargs[parameter]
+            return 'coalesce:{target}:{object_id}'.format(
+                target=target,
+                object_id=object_id,
+            )
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            current_job = get_current_job()
+            if current_job is not None:
+                key = get_key(args, kwargs)
+                if is_superseded(current_job, key):
+                    logger.info(
+                        'Skipping job %s, superseded for %s', current_job.id,
+                        key
+                    )
+                    return None
+            return func(*args, **kwargs)
+
+        wrapper = job(queue)(wrapper)
+        enqueue = wrapper.delay
+
+        @wraps(enqueue)
+        def delay(*args, **kwargs):
+            key = get_key(args, kwargs)
+            connection = get_queue(queue).connection
+            job_id = str(uuid.uuid4())
+            previous_job_id = decode(connection.getset(key, job_id))
+            connection.expire(key, COALESCE_TTL)
+            if previous_job_id:
+                remove_pending_job(previous_job_id, connection)
+            return enqueue(*args, job_id=job_id, **kwargs)
+
+        wrapper.delay = delay
+        wrapper.coalesce_key = get_key
+        return wrapper
+
+    return decorator
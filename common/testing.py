@@ -0,0 +1,12 @@
+from django.conf import settings
+
+# Process-local caches with the same aliases as CACHES, for tests which
+# clear the caches, so that they never flush the configured Redis database
+LOCAL_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': alias,
+        'TIMEOUT': config.get('TIMEOUT', 300),
+        'KEY_PREFIX': config.get('KEY_PREFIX', ''),
+    } for alias, config in settings.CACHES.items()
+}
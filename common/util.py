@@ -1,12 +1,12 @@
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import get_template
 from django_rq import job
 
 
-def email_user(subject, context, text_template_path, html_template_path, attachments=[]):
+def build_user_email(subject, context, text_template_path, html_template_path, attachments=[]):
     """
-    Dispatch a notification email to a user.
+    Build a notification email to a user, without sending it.
 
     Args:
         subject (str): Email subject - required
@@ -32,8 +32,37 @@ def email_user(subject, context, text_template_path, html_template_path, attachm
     email.attach_alternative(html_alternative, "text/html")
     for filename, content in attachments:
         email.attach(filename, content)
+    return email
+
+
+def email_user(subject, context, text_template_path, html_template_path, attachments=[]):
+    """
+    Dispatch a notification email to a user.
+
+    Args:
+        subject (str): Email subject - required
+        context (str): Email context - required
+        text_template_path (str): text_template_path - required
+        html_template_path (str): html_template_path - required
+        attachments: list of attachments - optional
+            A tuple (filename,content), where
+            filename: the name of the attachment
+            content: the contents of the attached file
+    """
+    email = build_user_email(subject, context, text_template_path, html_template_path, attachments=attachments)
     email.send(fail_silently=False)
 
-@job
+
+def email_users(emails):
+    """
+    Dispatch several notification emails over a single connection.
+
+    Args:
+        emails (list): Emails built by build_user_email - required
+    """
+    if emails:
+        get_connection(fail_silently=False).send_messages(emails)
+
+@job('email')
 def email_user_async(subject, context, text_template_path, html_template_path, attachments=[]):
     email_user(subject, context, text_template_path, html_template_path, attachments=attachments)
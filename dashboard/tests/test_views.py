@@ -1,7 +1,12 @@
-from django.test import TestCase
+from django.contrib.auth.models import Permission
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
+from common import cache
+from common.testing import LOCAL_CACHES
+from dashboard.views import DashboardView
 from institution.models import Institution
+from project.models import ProjectUserMembership
 from users.models import CustomUser
 
 
@@ -72,3 +77,51 @@ class DashboardViewTests(TestCase):
         response = self.client.get(reverse('logout'))
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('logged_out'))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class DashboardCacheTests(TestCase):
+
+    fixtures = [
+        'institution/fixtures/tests/institutions.json',
+        'users/fixtures/tests/users.json',
+        'funding/fixtures/tests/funding_bodies.json',
+        'funding/fixtures/tests/attributions.json',
+        'project/fixtures/tests/categories.json',
+        'project/fixtures/tests/projects.json',
+        'project/fixtures/tests/memberships.json',
+    ]
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = CustomUser.objects.get(
+            email='shibboleth.user@example.ac.uk'
+        )
+        self.user.user_permissions.add(
+            Permission.objects.get(codename='change_projectusermembership')
+        )
+
+    def get_requests_count(self):
+        request = RequestFactory().get(reverse('home'))
+        request.user = CustomUser.objects.get(pk=self.user.pk)
+        response = DashboardView.as_view()(request)
+        return response.context_data['project_user_requests_count']
+
+    def test_requests_count_is_cached(self):
+        """
+        Ensure the count of membership requests is cached until a
+        membership changes.
+        """
+        self.assertEqual(self.get_requests_count(), 1)
+        self.assertEqual(
+            cache.get_stats('dashboard'), {'hits': 0, 'misses': 1}
+        )
+        self.assertEqual(self.get_requests_count(), 1)
+        self.assertEqual(
+            cache.get_stats('dashboard'), {'hits': 1, 'misses': 1}
+        )
+
+        membership = ProjectUserMembership.objects.get(pk=2)
+        membership.status = ProjectUserMembership.AUTHORISED
+        membership.save()
+        self.assertEqual(self.get_requests_count(), 0)
@@ -1,6 +1,7 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
 
+from common import cache
 from project.models import Project
 from project.models import ProjectUserMembership
 
@@ -12,9 +13,14 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context = super(DashboardView, self).get_context_data(**kwargs)
 
         if self.request.user.has_perm('project.change_projectusermembership'):
-            num_requests = ProjectUserMembership.objects.awaiting_authorisation(
-                self.request.user
-            ).count()
+            num_requests = cache.get_or_set(
+                'dashboard',
+                ['project_user_requests_count', self.request.user.pk],
+                lambda: ProjectUserMembership.objects.awaiting_authorisation(
+                    self.request.user
+                ).count(),
+                tags=['project_user_memberships'],
+            )
             context['project_user_requests_count'] = num_requests
 
         # if self.request.user.has_perm('project.add_project'):
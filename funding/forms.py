@@ -1,7 +1,7 @@
 from django import forms
 from django.utils.translation import gettext_lazy as _
 
-from institution.models import Institution
+from institution.registry import institution_registry
 
 from .models import FundingSource, Publication
 
@@ -35,16 +35,14 @@ class FundingSourceForm(forms.ModelForm):
     def clean_pi_email(self):
         cleaned_data = super().clean()
         email = cleaned_data['pi_email']
-        domain = email.split('@')[1]
-        if not Institution.objects.filter(base_domain=domain).exists():
+        self.institution = institution_registry.get_by_email_address(email)
+        if self.institution is None:
             raise forms.ValidationError(_(
                 'Please enter an institutional email address ending '
                 'with one of: ' + ', '.join(
-                    '@' + institution.base_domain
-                    for institution in Institution.objects.all()
+                    institution_registry.get_valid_domains()
                 ) + '.'
             ))
-        self.institution = Institution.objects.get(base_domain=domain)
         return email
 
 
@@ -105,13 +103,11 @@ class FundingSourceApprovalForm(forms.ModelForm):
     def clean_pi_email(self):
         cleaned_data = super().clean()
         email = cleaned_data['pi_email']
-        domain = email.split('@')[1]
-        if not Institution.objects.filter(base_domain=domain).exists():
+        if institution_registry.get_by_email_address(email) is None:
             raise forms.ValidationError(_(
                 'Please enter an institutional email address ending '
                 'with one of: ' + ', '.join(
-                    '@' + institution.base_domain
-                    for institution in Institution.objects.all()
+                    institution_registry.get_valid_domains()
                 ) + '.'
             ))
         return email
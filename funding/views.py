@@ -9,7 +9,7 @@ from django.utils.translation import gettext_lazy as _
 from django.views import generic
 
 from common.util import email_user_async
-from institution.models import Institution
+from institution.registry import institution_registry
 
 from .forms import (AddFundingSourceForm, FundingSourceApprovalForm,
                     FundingSourceForm, PublicationForm)
@@ -88,8 +88,9 @@ class FundingSourceCreateView(
             popup = ""
 
         fundingsource = form.save(commit=False)
-        domain = fundingsource.pi_email.split('@')[1]
-        institution = Institution.objects.get(base_domain=domain)
+        institution = institution_registry.get_by_email_address(
+            fundingsource.pi_email
+        )
         fundingsource.created_by = self.request.user
         fundingsource.save()
 
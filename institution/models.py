@@ -57,14 +57,11 @@ class Institution(models.Model):
         Args:
             email (str): User's email address.
         """
-        try:
-            _, domain = email.split('@')
-            support_email = Institution.objects.get(
-                base_domain=domain
-            ).support_email
-            return support_email if support_email else settings.DEFAULT_SUPPORT_EMAIL
-        except Exception:
-            return settings.DEFAULT_SUPPORT_EMAIL
+        from institution.registry import institution_registry
+        institution = institution_registry.get_by_email_address(email)
+        if institution is not None and institution.support_email:
+            return institution.support_email
+        return settings.DEFAULT_SUPPORT_EMAIL
 
     @classmethod
     def is_valid_email_address(cls, email):
@@ -74,15 +71,12 @@ class Institution(models.Model):
         Args:
             email (str): An email address to validate.
         """
-        try:
-            _, domain = email.split('@')
-            Institution.objects.get(base_domain=domain)
-        except Exception:
+        from institution.registry import institution_registry
+        if institution_registry.get_by_email_address(email) is None:
             raise InvalidInstitutionalEmailAddress(
                 'Email address domain is not supported.'
             )
-        else:
-            return True
+        return True
 
     @classmethod
     def is_valid_identity_provider(cls, identity_provider):
@@ -92,14 +86,14 @@ class Institution(models.Model):
         Args:
             identity_provider (str): An identity provider to validate.
         """
-        try:
-            Institution.objects.get(identity_provider=identity_provider)
-        except Exception:
+        from institution.registry import institution_registry
+        if institution_registry.get_by_identity_provider(
+            identity_provider
+        ) is None:
             raise InvalidInstitutionalIndentityProvider(
                 'Identity provider is not supported.'
             )
-        else:
-            return True
+        return True
 
     def id_str(self):
         return self.name.lower().replace(" ", "-")
@@ -0,0 +1,109 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from institution.models import Institution
+
+VERSION_KEY = 'institution-registry-version'
+
+
+class InstitutionRegistry:
+    """
+    An in-memory index of institutions by identity provider and by base
+    domain, loaded once per process, through which institutions are
+    resolved from identity providers and email addresses.
+
+    Once saving or deleting an institution is committed, the registry
+    version held in the INSTITUTION_REGISTRY_CACHE cache is changed, and a
+    process reloads its index the next time it sees a version other than
+    the one it loaded. With a cache shared between processes, a change made
+    in one process is seen by all of them. The process making the change
+    reloads its index straight away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+
+    @property
+    def cache(self):
+        return caches[settings.INSTITUTION_REGISTRY_CACHE]
+
+    def get_version(self):
+        return self.cache.get_or_set(
+            VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None
+        )
+
+    def load(self, version):
+        by_identity_provider = {}
+        by_base_domain = {}
+        valid_domains = []
+        for institution in Institution.objects.all():
+            if institution.identity_provider:
+                by_identity_provider.setdefault(
+                    institution.identity_provider, institution
+                )
+            if institution.base_domain:
+                by_base_domain.setdefault(
+                    institution.base_domain.lower(), institution
+                )
+                valid_domains.append('@' + institution.base_domain)
+        self._index = {
+            'identity_provider': by_identity_provider,
+            'base_domain': by_base_domain,
+            'valid_domains': valid_domains,
+        }
+        self._version = version
+
+    def reset(self):
+        """
+        Reload this process's index on the next lookup.
+        """
+        self._version = None
+
+    def get_index(self, name):
+        version = self.get_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self.load(version)
+        return self._index[name]
+
+    def get_by_identity_provider(self, identity_provider):
+        """
+        Get the institution using a Shibboleth identity provider, or None.
+        """
+        return self.get_index('identity_provider').get(identity_provider)
+
+    def get_by_base_domain(self, base_domain):
+        """
+        Get the institution with a base domain, or None.
+        """
+        return self.get_index('base_domain').get(base_domain.lower())
+
+    def get_by_email_address(self, email):
+        """
+        Get the institution whose base domain an email address belongs to,
+        or None.
+        """
+        try:
+            _, domain = email.split('@')
+        except (AttributeError, ValueError):
+            return None
+        return self.get_by_base_domain(domain)
+
+    def get_valid_domains(self):
+        """
+        Get the domains of institutional email addresses, each starting with
+        '@', in order of institution name.
+        """
+        return self.get_index('valid_domains')
+
+    def invalidate(self):
+        self.cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+institution_registry = InstitutionRegistry()
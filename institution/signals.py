@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common import cache
+from institution.models import Institution
+from institution.registry import institution_registry
+
+
+def invalidate_institutions():
+    institution_registry.invalidate()
+    cache.invalidate('institutions')
+
+
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+def invalidate_institution_registry(**kwargs):
+    institution_registry.reset()
+    # Other processes are only told once the change is committed, as they
+    # could otherwise reload the institutions as they were and keep them
+    # under the new version.
+    transaction.on_commit(invalidate_institutions)
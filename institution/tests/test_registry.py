@@ -0,0 +1,166 @@
+import mock
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from funding.forms import FundingSourceApprovalForm
+from institution.exceptions import InvalidInstitutionalEmailAddress
+from institution.models import Institution
+from institution.registry import institution_registry
+from users.middleware import SCWRemoteUserMiddleware
+from users.models import CustomUser
+
+
+class InstitutionRegistryTests(TestCase):
+
+    fixtures = [
+        'institution/fixtures/tests/institutions.json',
+        'users/fixtures/tests/users.json',
+    ]
+
+    def test_lookups(self):
+        institution = Institution.objects.get(base_domain='example.ac.uk')
+        self.assertEqual(
+            institution_registry.get_by_identity_provider(
+                'https://idp.example.ac.uk/shibboleth'
+            ),
+            institution,
+        )
+        self.assertEqual(
+            institution_registry.get_by_base_domain('Example.ac.uk'),
+            institution,
+        )
+        self.assertIsNone(
+            institution_registry.get_by_identity_provider(
+                'https://idp.unknown.ac.uk/shibboleth'
+            )
+        )
+        self.assertIsNone(institution_registry.get_by_base_domain(''))
+
+    def test_email_address_lookups(self):
+        institution = Institution.objects.get(base_domain='example.ac.uk')
+        self.assertEqual(
+            institution_registry.get_by_email_address('a.user@Example.ac.uk'),
+            institution,
+        )
+        for email in ('a.user@unknown.ac.uk', 'a.user', 'a@b@c', '', None):
+            self.assertIsNone(institution_registry.get_by_email_address(email))
+        self.assertEqual(
+            institution_registry.get_valid_domains(),
+            ['@example.ac.uk', '@example3.ac.uk', '@example2.ac.uk'],
+        )
+
+    def test_email_validation_makes_no_queries(self):
+        """
+        Ensure validating institutional email addresses does not query the
+        database once the index is loaded.
+        """
+        institution_registry.get_by_base_domain('example.ac.uk')
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                Institution.is_valid_email_address('a.user@example.ac.uk')
+            )
+            with self.assertRaises(InvalidInstitutionalEmailAddress):
+                Institution.is_valid_email_address('a.user@unknown.ac.uk')
+            Institution.parse_support_email_from_user_email(
+                'a.user@example.ac.uk'
+            )
+
+            form = FundingSourceApprovalForm()
+            form.cleaned_data = {'pi_email': 'a.user@unknown.ac.uk'}
+            with self.assertRaisesMessage(
+                ValidationError, '@example.ac.uk, @example3.ac.uk'
+            ):
+                form.clean_pi_email()
+
+    def test_index_is_loaded_once(self):
+        """
+        Ensure lookups do not query the database once the index is loaded.
+        """
+        institution_registry.get_by_base_domain('example.ac.uk')
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                institution_registry.get_by_base_domain('example.ac.uk')
+                institution_registry.get_by_identity_provider(
+                    'https://idp.example.ac.uk/shibboleth'
+                )
+
+    def test_index_is_invalidated_on_change(self):
+        """
+        Ensure saving or deleting an institution is reflected in lookups.
+        """
+        institution_registry.get_by_base_domain('example.ac.uk')
+        institution = Institution.objects.create(
+            name='New University',
+            base_domain='new.ac.uk',
+            identity_provider='https://idp.new.ac.uk/shibboleth',
+        )
+        self.assertEqual(
+            institution_registry.get_by_base_domain('new.ac.uk'), institution
+        )
+
+        institution.identity_provider = 'https://login.new.ac.uk/shibboleth'
+        institution.save()
+        self.assertIsNone(
+            institution_registry.get_by_identity_provider(
+                'https://idp.new.ac.uk/shibboleth'
+            )
+        )
+
+        institution.delete()
+        self.assertIsNone(institution_registry.get_by_base_domain('new.ac.uk'))
+
+    def test_version_changes_on_commit(self):
+        """
+        Ensure other processes are only told of a change to an institution
+        once it is committed.
+        """
+        version = institution_registry.get_version()
+        # Test cases never commit, so run the commit callbacks by hand
+        callbacks = []
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=callbacks.append
+        ):
+            institution = Institution.objects.create(
+                name='New University',
+                base_domain='new.ac.uk',
+            )
+        self.assertEqual(institution_registry.get_version(), version)
+        self.assertEqual(
+            institution_registry.get_by_base_domain('new.ac.uk'), institution
+        )
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(institution_registry.get_version(), version)
+
+    def test_middleware_makes_no_institution_queries(self):
+        """
+        Ensure a Shibboleth request from an authenticated user does not
+        query institutions.
+        """
+        request = RequestFactory().get(
+            '/',
+            REMOTE_USER='shibboleth.user',
+            **{'Shib-Identity-Provider': 'https://idp.example.ac.uk/shibboleth'}
+        )
+        SessionMiddleware().process_request(request)
+        request.session[BACKEND_SESSION_KEY] = (
+            'shibboleth.backends.ShibbolethRemoteUserBackend'
+        )
+        request.user = CustomUser.objects.get(
+            username='shibboleth.user@example.ac.uk'
+        )
+        middleware = SCWRemoteUserMiddleware()
+        institution_registry.get_by_base_domain('example.ac.uk')
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertIsNone(middleware.process_request(request))
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'institution_institution' in query['sql']
+        ])
@@ -0,0 +1,178 @@
+import asyncio
+
+import aiohttp
+from django.conf import settings
+
+from openldap.circuit_breaker import CircuitOpenError, circuit_breaker
+from openldap.schemas.project.activate_project import activate_project_validator
+from openldap.schemas.project.get_project import get_project_validator
+from openldap.schemas.project.list_projects import list_projects_validator
+from openldap.schemas.project_membership.create_project_membership import \
+    create_project_membership_validator
+from openldap.schemas.project_membership.delete_project_membership import \
+    delete_project_membership_validator
+from openldap.schemas.project_membership.list_project_memberships import \
+    list_project_memberships_validator
+from openldap.schemas.user.activate_user import activate_user_validator
+from openldap.schemas.user.get_user import get_user_validator
+from openldap.schemas.user.list_users import list_users_validator
+from openldap.util import decode_content, raise_for_data_error
+
+
+class AsyncOpenLDAPClient:
+    """
+    Make OpenLDAP API calls as coroutines over one aiohttp session, so that
+    many calls overlap their network latency.
+
+    The session keeps a pool of at most `max_concurrency` (by default
+    OPENLDAP_POOL_SIZE) connections, and a semaphore keeps the same number
+    of requests in flight at once. Every request goes through the OpenLDAP
+    circuit breaker: it is refused with CircuitOpenError while the circuit
+    is open, and its outcome is recorded otherwise.
+
+    Unlike the jobs in the other API modules, these calls have no side
+    effects: callers are responsible for updating models and notifying
+    users.
+    """
+
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency or settings.OPENLDAP_POOL_SIZE
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=5),
+        )
+        return self
+
+    async def __aexit__(self, *args):
+        await self.session.close()
+
+    async def request(self, method, path, validator=None, data=None):
+        """
+        Send a request to the OpenLDAP API, waiting for a free slot first.
+
+        Connection errors, timeouts and server errors count as failures of
+        the circuit breaker, as they do for the synchronous session.
+
+        Args:
+            method (str): HTTP method - required
+            path (list): URL path components after OPENLDAP_HOST - required
+            validator: Compiled validator for the response - optional
+            data (dict): Form data to send - optional
+        """
+        url = ''.join([settings.OPENLDAP_HOST] + path)
+        headers = {'Cache-Control': 'no-cache'}
+        if data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        async with self.semaphore:
+            if not circuit_breaker.allow_request():
+                raise CircuitOpenError(circuit_breaker.retry_after())
+            try:
+                async with self.session.request(
+                    method, url, headers=headers, data=data
+                ) as response:
+                    content = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                circuit_breaker.record_failure()
+                raise
+        if response.status >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        response.raise_for_status()
+        if validator is None:
+            return content
+        response = decode_content(content, validator)
+        raise_for_data_error(response.get('data'))
+        return response
+
+    async def list_users(self):
+        return await self.request('GET', ['user/'], list_users_validator)
+
+    async def get_user_by_id(self, user_id):
+        return await self.request(
+            'GET', ['user/', user_id, '/'], get_user_validator
+        )
+
+    async def get_user_by_email_address(self, email_address):
+        return await self.request(
+            'GET', ['user/', email_address, '/'], get_user_validator
+        )
+
+    async def activate_user_account(self, email_address):
+        return await self.request(
+            'PUT', ['user/enable/', email_address, '/'],
+            activate_user_validator
+        )
+
+    async def deactivate_user_account(self, email_address):
+        return await self.request('DELETE', ['user/', email_address, '/'])
+
+    async def list_projects(self):
+        return await self.request(
+            'GET', ['project/'], list_projects_validator
+        )
+
+    async def get_project(self, project_code):
+        return await self.request(
+            'GET', ['project/', project_code, '/'], get_project_validator
+        )
+
+    async def activate_project(self, project_code):
+        return await self.request(
+            'PUT', ['project/enable/', project_code, '/'],
+            activate_project_validator
+        )
+
+    async def deactivate_project(self, project_code):
+        return await self.request('DELETE', ['project/', project_code, '/'])
+
+    async def list_project_memberships(self, project_code):
+        return await self.request(
+            'GET', ['project/member/', project_code, '/'],
+            list_project_memberships_validator
+        )
+
+    async def create_project_membership(self, project_code, email_address):
+        return await self.request(
+            'POST', ['project/member/', project_code, '/'],
+            create_project_membership_validator,
+            data={'email': email_address},
+        )
+
+    async def delete_project_membership(self, project_code, email_address):
+        return await self.request(
+            'DELETE', ['project/member/', project_code, '/', email_address, '/'],
+            delete_project_membership_validator
+        )
+
+
+def run_batch(operations, max_concurrency=None, return_exceptions=True):
+    """
+    Run a batch of OpenLDAP API calls concurrently through one event loop.
+
+    Args:
+        operations (list): (method name, *args) tuples naming calls of
+            AsyncOpenLDAPClient, e.g. ('get_project', 'scw0000') - required
+        max_concurrency (int): Maximum requests in flight - optional
+        return_exceptions (bool): Return a call's exception in place of its
+            result, rather than raising the first one - optional
+
+    Returns:
+        list: The result of each operation, in order.
+    """
+    async def run():
+        async with AsyncOpenLDAPClient(max_concurrency) as client:
+            return await asyncio.gather(
+                *(
+                    getattr(client, name)(*args)
+                    for name, *args in operations
+                ),
+                return_exceptions=return_exceptions
+            )
+
+    return asyncio.run(run())
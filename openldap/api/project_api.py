@@ -1,20 +1,23 @@
-import jsonschema
-import requests
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django_rq import job
 
 from common.util import email_user
-from openldap.schemas.project.activate_project import activate_project_json
-from openldap.schemas.project.create_project import create_project_json
-from openldap.schemas.project.get_project import get_project_json
-from openldap.schemas.project.list_projects import list_projects_json
+from openldap.cache import invalidate, project_keys, read_through
+from openldap.circuit_breaker import with_circuit_breaker
+from openldap.client import get_session
+from openldap.schemas.project.activate_project import activate_project_validator
+from openldap.schemas.project.create_project import create_project_validator
+from openldap.schemas.project.get_project import get_project_validator
+from openldap.schemas.project.list_projects import list_projects_validator
 from openldap.util import (
     decode_response, raise_for_data_error, verify_payload_data
 )
 
 
-@job
+@job('ldap-bulk')
+@read_through('projects')
+@with_circuit_breaker
 def list_projects():
     """
     List all OpenLDAP projects.
@@ -22,21 +25,22 @@ def list_projects():
     url = ''.join([settings.OPENLDAP_HOST, 'project/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, list_projects_json)
+        response = decode_response(response, list_projects_validator)
         raise_for_data_error(response.get('data'))
         return response
     except Exception as e:
         raise e
 
 
-@job
+@job('interactive')
+@read_through('project')
+@with_circuit_breaker
 def get_project(project_code):
     """
     Get an existing OpenLDAP project.
@@ -47,21 +51,21 @@ def get_project(project_code):
     url = ''.join([settings.OPENLDAP_HOST, 'project/', project_code, '/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, get_project_json)
+        response = decode_response(response, get_project_validator)
         raise_for_data_error(response.get('data'))
         return response
     except Exception as e:
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def create_project(allocation, notify_user=True):
     """
     Create an OpenLDAP project.
@@ -88,15 +92,14 @@ def create_project(allocation, notify_user=True):
         'technical_lead': project.tech_lead.profile.scw_username,
     }
     try:
-        response = requests.post(
+        response = get_session().post(
             url,
             headers=headers,
             data=payload,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, create_project_json)
+        response = decode_response(response, create_project_validator)
         data = response.get('data')
         raise_for_data_error(data)
         mapping = {
@@ -108,6 +111,7 @@ def create_project(allocation, notify_user=True):
         # Update project details.
         project.gid_number = data.get('gidNumber', '')
         project.save()
+        invalidate(project_keys(project.code))
 
         if notify_user:
             subject = _(
@@ -133,7 +137,8 @@ def create_project(allocation, notify_user=True):
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def deactivate_project(allocation, notify_user=True):
     """
     Deactivate an OpenLDAP project.
@@ -146,13 +151,15 @@ def deactivate_project(allocation, notify_user=True):
     url = ''.join([settings.OPENLDAP_HOST, 'project/', project.code, '/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.delete(
+        response = get_session().delete(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
 
+        invalidate(project_keys(project.code))
+
         if notify_user:
             subject = _(
                 '{company_name} Project {code} Deactivated'.format(
@@ -176,7 +183,8 @@ def deactivate_project(allocation, notify_user=True):
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def activate_project(allocation, notify_user=True):
     """
     Activate an OpenLDAP project.
@@ -191,16 +199,17 @@ def activate_project(allocation, notify_user=True):
     ])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.put(
+        response = get_session().put(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, activate_project_json)
+        response = decode_response(response, activate_project_validator)
         raise_for_data_error(response.get('data'))
 
+        invalidate(project_keys(project.code))
+
         if notify_user:
             subject = _(
                 '{company_name} Project {code} Activated'.format(
@@ -1,21 +1,25 @@
-import jsonschema
-import requests
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django_rq import job
 
-from common.util import email_user
+from common.util import build_user_email, email_user, email_users
+from openldap.cache import invalidate, project_keys
+from openldap.circuit_breaker import with_circuit_breaker
+from openldap.client import get_session
 from openldap.schemas.project_membership.create_project_membership import \
-    create_project_membership_json
+    create_project_membership_validator
 from openldap.schemas.project_membership.delete_project_membership import \
-    delete_project_membership_json
+    delete_project_membership_validator
 from openldap.schemas.project_membership.list_project_memberships import \
-    list_project_memberships_json
+    list_project_memberships_validator
 from openldap.util import decode_response, raise_for_data_error
 from common.util import email_user
 
 
-@job
+@job('ldap-bulk')
+@with_circuit_breaker
 def list_project_memberships(project_code):
     """
     List all OpenLDAP project memberships for a given project.
@@ -25,21 +29,21 @@ def list_project_memberships(project_code):
     ])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, list_project_memberships_json)
+        response = decode_response(response, list_project_memberships_validator)
         raise_for_data_error(response.get('data'))
         return response
     except Exception as e:
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def create_project_membership(project_membership, notify_user=True):
     """
     Create an OpenLDAP project membership.
@@ -60,17 +64,20 @@ def create_project_membership(project_membership, notify_user=True):
         'email': project_membership.user.email,
     }
     try:
-        response = requests.post(
+        response = get_session().post(
             url,
             headers=headers,
             data=payload,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, create_project_membership_json)
+        response = decode_response(
+            response, create_project_membership_validator
+        )
         raise_for_data_error(response.get('data'))
 
+        invalidate(project_keys(project_membership.project.code))
+
         if notify_user:
             subject = _('{company_name} Project Membership Created'.format(company_name=settings.COMPANY_NAME))
             context = {
@@ -88,7 +95,100 @@ def create_project_membership(project_membership, notify_user=True):
         raise e
 
 
-@job
+def post_project_membership(project_code, email):
+    """
+    Create an OpenLDAP project membership without any side effects, so that
+    it can be called from several threads at once.
+    """
+    url = ''.join([settings.OPENLDAP_HOST, 'project/member/', project_code, '/'])
+    headers = {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Cache-Control': 'no-cache',
+    }
+    payload = {
+        'email': email,
+    }
+    response = get_session().post(
+        url,
+        headers=headers,
+        data=payload,
+        timeout=5,
+    )
+    response.raise_for_status()
+    response = decode_response(response, create_project_membership_validator)
+    raise_for_data_error(response.get('data'))
+    return response
+
+
+@job('ldap-bulk')
+@with_circuit_breaker
+def create_project_memberships(project, project_memberships, notify_user=True):
+    """
+    Create several OpenLDAP memberships of a project in a single job.
+
+    The requests are made concurrently over the pooled OpenLDAP session, at
+    most OPENLDAP_POOL_SIZE at a time, and the notification emails are sent
+    together once all requests have completed. Memberships that could not be
+    created have their status reset, and an error listing them is raised.
+
+    Args:
+        project (Project): Project - required
+        project_memberships (list): Memberships of the project - required
+        notify_user (bool): Issue notification emails to the users? - optional
+    """
+    if not project_memberships:
+        return {}
+    max_workers = min(settings.OPENLDAP_POOL_SIZE, len(project_memberships))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (
+                project_membership,
+                executor.submit(
+                    post_project_membership,
+                    project.code,
+                    project_membership.user.email,
+                ),
+            ) for project_membership in project_memberships
+        ]
+
+    responses = {}
+    failures = []
+    emails = []
+    for project_membership, future in futures:
+        try:
+            responses[project_membership.id] = future.result()
+        except Exception as e:
+            project_membership.reset_status()
+            failures.append('{email}: {error}'.format(
+                email=project_membership.user.email,
+                error=e,
+            ))
+            continue
+
+        if notify_user:
+            subject = _('{company_name} Project Membership Created'.format(company_name=settings.COMPANY_NAME))
+            context = {
+                'first_name': project_membership.user.first_name,
+                'to': project_membership.user.email,
+                'code': project.code,
+                'status': project_membership.get_status_display().lower(),
+            }
+            text_template_path = 'notifications/project_membership/update.txt'
+            html_template_path = 'notifications/project_membership/update.html'
+            emails.append(build_user_email(subject, context, text_template_path, html_template_path))
+    if responses:
+        invalidate(project_keys(project.code))
+    email_users(emails)
+
+    if failures:
+        raise ValueError('Failed to create project memberships: {failures}'.format(
+            failures='; '.join(failures),
+        ))
+    return responses
+
+
+@job('interactive')
+@with_circuit_breaker
 def delete_project_membership(project_membership, notify_user=True):
     """
     Delete an OpenLDAP project membership.
@@ -103,16 +203,19 @@ def delete_project_membership(project_membership, notify_user=True):
     ])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.delete(
+        response = get_session().delete(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, delete_project_membership_json)
+        response = decode_response(
+            response, delete_project_membership_validator
+        )
         raise_for_data_error(response.get('data'))
 
+        invalidate(project_keys(project_membership.project.code))
+
         if notify_user:
             subject = _('{company_name} Project Membership Deleted'.format(company_name=settings.COMPANY_NAME))
             context = {
@@ -128,3 +231,74 @@ def delete_project_membership(project_membership, notify_user=True):
     except Exception as e:
         project_membership.reset_status()
         raise e
+
+
+def delete_project_membership_request(project_code, email):
+    """
+    Delete an OpenLDAP project membership without any side effects, so that
+    it can be called from several threads at once.
+    """
+    url = ''.join([
+        settings.OPENLDAP_HOST, 'project/member/', project_code, '/', email, '/'
+    ])
+    headers = {'Cache-Control': 'no-cache'}
+    response = get_session().delete(
+        url,
+        headers=headers,
+        timeout=5,
+    )
+    response.raise_for_status()
+    response = decode_response(response, delete_project_membership_validator)
+    raise_for_data_error(response.get('data'))
+    return response
+
+
+@job('ldap-bulk')
+@with_circuit_breaker
+def delete_project_memberships(project, project_memberships):
+    """
+    Delete several OpenLDAP memberships of a project in a single job.
+
+    This is used to remove memberships from OpenLDAP which are no longer
+    authorised in Cogs, so unlike delete_project_membership it leaves the
+    memberships in Cogs untouched and notifies nobody. The requests are made
+    concurrently, at most OPENLDAP_POOL_SIZE at a time, and an error listing
+    the memberships which could not be deleted is raised.
+
+    Args:
+        project (Project): Project - required
+        project_memberships (list): Memberships of the project - required
+    """
+    if not project_memberships:
+        return {}
+    max_workers = min(settings.OPENLDAP_POOL_SIZE, len(project_memberships))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (
+                project_membership,
+                executor.submit(
+                    delete_project_membership_request,
+                    project.code,
+                    project_membership.user.email,
+                ),
+            ) for project_membership in project_memberships
+        ]
+
+    responses = {}
+    failures = []
+    for project_membership, future in futures:
+        try:
+            responses[project_membership.id] = future.result()
+        except Exception as e:
+            failures.append('{email}: {error}'.format(
+                email=project_membership.user.email,
+                error=e,
+            ))
+    if responses:
+        invalidate(project_keys(project.code))
+
+    if failures:
+        raise ValueError('Failed to delete project memberships: {failures}'.format(
+            failures='; '.join(failures),
+        ))
+    return responses
@@ -1,23 +1,24 @@
-import jsonschema
-import requests
-
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django_rq import job
 
 from common.util import email_user
-from openldap.schemas.user.activate_user import activate_user_json
-from openldap.schemas.user.create_user import create_user_json
-from openldap.schemas.user.get_user import get_user_json
-from openldap.schemas.user.list_users import list_users_json
-from openldap.schemas.user.reset_user_password import reset_user_password_json
+from openldap.cache import invalidate, read_through, user_keys
+from openldap.circuit_breaker import with_circuit_breaker
+from openldap.client import get_session
+from openldap.schemas.user.activate_user import activate_user_validator
+from openldap.schemas.user.create_user import create_user_validator
+from openldap.schemas.user.get_user import get_user_validator
+from openldap.schemas.user.list_users import list_users_validator
+from openldap.schemas.user.reset_user_password import reset_user_password_validator
 from openldap.util import decode_response
 from openldap.util import raise_for_data_error
 from openldap.util import verify_payload_data
 from common.util import email_user
 
 
-@job
+@job('ldap-bulk')
+@with_circuit_breaker
 def list_users():
     """
     List all LDAP user accounts.
@@ -25,21 +26,21 @@ def list_users():
     url = ''.join([settings.OPENLDAP_HOST, 'user/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, list_users_json)
+        response = decode_response(response, list_users_validator)
         raise_for_data_error(response.get('data'))
         return response
     except Exception as e:
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def create_user(user, notify_user=True):
     """
     Create an LDAP user account.
@@ -65,15 +66,14 @@ def create_user(user, notify_user=True):
     if hasattr(user.profile, 'department'):
         payload.update({'department': user.profile.department})
     try:
-        response = requests.post(
+        response = get_session().post(
             url,
             headers=headers,
             data=payload,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, create_user_json)
+        response = decode_response(response, create_user_validator)
         data = response.get('data')
         raise_for_data_error(data)
         mapping = {
@@ -86,6 +86,7 @@ def create_user(user, notify_user=True):
         user.profile.scw_username = data.get('uid', '')
         user.profile.uid_number = data.get('uidnumber', '')
         user.save()
+        invalidate(user_keys(user))
 
         if notify_user:
             subject = _('{company_name} Account Created'.format(company_name=settings.COMPANY_NAME))
@@ -104,7 +105,9 @@ def create_user(user, notify_user=True):
         raise e
 
 
-@job
+@job('interactive')
+@read_through('user_id')
+@with_circuit_breaker
 def get_user_by_id(user_id):
     """
     Get an existing user's LDAP account details by user id.
@@ -115,21 +118,22 @@ def get_user_by_id(user_id):
     url = ''.join([settings.OPENLDAP_HOST, 'user/', user_id, '/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, get_user_json)
+        response = decode_response(response, get_user_validator)
         raise_for_data_error(response.get('data'))
         return response
     except Exception as e:
         raise e
 
 
-@job
+@job('interactive')
+@read_through('user_email')
+@with_circuit_breaker
 def get_user_by_email_address(email_address):
     """
     Get an existing user's LDAP account details by email address.
@@ -140,21 +144,21 @@ def get_user_by_email_address(email_address):
     url = ''.join([settings.OPENLDAP_HOST, 'user/', email_address, '/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, get_user_json)
+        response = decode_response(response, get_user_validator)
         raise_for_data_error(response.get('data'))
         return response
     except Exception as e:
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def reset_user_password(user, password, notify_user=True):
     """
     Reset a user's LDAP account password.
@@ -171,15 +175,14 @@ def reset_user_password(user, password, notify_user=True):
     }
     payload = {'password': password}
     try:
-        response = requests.post(
+        response = get_session().post(
             url,
             headers=headers,
             data=payload,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, reset_user_password_json)
+        response = decode_response(response, reset_user_password_validator)
         raise_for_data_error(response.get('data'))
 
         if notify_user:
@@ -196,7 +199,8 @@ def reset_user_password(user, password, notify_user=True):
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def deactivate_user_account(user, notify_user=True):
     """
     Deactivate an existing user's LDAP account.
@@ -208,13 +212,15 @@ def deactivate_user_account(user, notify_user=True):
     url = ''.join([settings.OPENLDAP_HOST, 'user/', user.email, '/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.delete(
+        response = get_session().delete(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
 
+        invalidate(user_keys(user))
+
         if notify_user:
             subject = _('{company_name} Account Deactivated'.format(company_name=settings.COMPANY_NAME))
             context = {
@@ -231,7 +237,8 @@ def deactivate_user_account(user, notify_user=True):
         raise e
 
 
-@job
+@job('interactive')
+@with_circuit_breaker
 def activate_user_account(user, notify_user=True):
     """
     Activate an existing user's LDAP account.
@@ -243,16 +250,17 @@ def activate_user_account(user, notify_user=True):
     url = ''.join([settings.OPENLDAP_HOST, 'user/enable/', user.email, '/'])
     headers = {'Cache-Control': 'no-cache'}
     try:
-        response = requests.put(
+        response = get_session().put(
             url,
             headers=headers,
             timeout=5,
         )
         response.raise_for_status()
-        response = decode_response(response)
-        jsonschema.validate(response, activate_user_json)
+        response = decode_response(response, activate_user_validator)
         raise_for_data_error(response.get('data'))
 
+        invalidate(user_keys(user))
+
         if notify_user:
             subject = _('{company_name} Account Activated'.format(company_name=settings.COMPANY_NAME))
             context = {
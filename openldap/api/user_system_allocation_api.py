@@ -1,7 +1,7 @@
 from django_rq import job
 
 
-@job
+@job('interactive')
 def get_system_allocation(email):
     """
     Get a system allocation.
@@ -12,7 +12,7 @@ def get_system_allocation(email):
     raise NotImplementedError('Not yet implemented.')
 
 
-@job
+@job('interactive')
 def update_system_allocation(email, system_id):
     """
     Update a system allocation.
@@ -24,7 +24,7 @@ def update_system_allocation(email, system_id):
     raise NotImplementedError('Not yet implemented.')
 
 
-@job
+@job('interactive')
 def delete_system_allocation(email, system_id):
     """
     Delete a system allocation.
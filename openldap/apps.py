@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OpenldapConfig(AppConfig):
     name = 'openldap'
+
+    def ready(self):
+        import openldap.checks
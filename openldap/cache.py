@@ -0,0 +1,71 @@
+from functools import wraps
+
+from django.core.cache import caches
+
+
+def get_cache():
+    """
+    Get the cache of OpenLDAP lookups, configured by the `openldap` alias in
+    CACHES.
+    """
+    return caches['openldap']
+
+
+def make_key(kind, *args):
+    """
+    Build the cache key of a lookup. User ids, email addresses and project
+    codes are matched case insensitively by OpenLDAP, so keys are too.
+    """
+    return ':'.join([kind] + [str(arg).lower() for arg in args])
+
+
+def read_through(kind):
+    """
+    Cache the responses of an OpenLDAP lookup, keyed by `kind` and the
+    lookup's arguments, for the TTL of the `openldap` cache.
+
+    Failed lookups raise, and deferred lookups return None, so neither is
+    ever cached.
+    """
+    def decorator(func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = make_key(kind, *args, *kwargs.values())
+            response = cache.get(key)
+            if response is None:
+                response = func(*args, **kwargs)
+                if response is not None:
+                    cache.set(key, response)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def user_keys(user):
+    """
+    Get the cache keys of the lookups of a user's OpenLDAP account.
+    """
+    keys = [make_key('user_email', user.email)]
+    scw_username = getattr(getattr(user, 'profile', None), 'scw_username', '')
+    if scw_username:
+        keys.append(make_key('user_id', scw_username))
+    return keys
+
+
+def project_keys(project_code):
+    """
+    Get the cache keys of the lookups which include an OpenLDAP project,
+    which lists the project's members.
+    """
+    return [make_key('project', project_code), make_key('projects')]
+
+
+def invalidate(keys):
+    """
+    Discard cached lookups after a change to OpenLDAP.
+    """
+    get_cache().delete_many(keys)
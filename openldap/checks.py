@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Ensure the caches holding the circuit breaker's state and the cached
+    OpenLDAP lookups are shared between processes. RQ runs each job in a
+    forked work horse, so with a process-local cache the breaker's counts
+    are lost after every job and the cached lookups are never invalidated.
+
+    Only run by `check --deploy`, so that tests, migrations and management
+    commands may still use process-local caches.
+    """
+    errors = []
+    for alias in (settings.SHARED_CACHE, 'openldap'):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+            errors.append(
+                Error(
+                    'The {alias} cache uses {backend}, which is not shared '
+                    'between processes.'.format(alias=alias, backend=backend),
+                    hint='Use a cache shared with the RQ workers, such as '
+                    'django_redis.cache.RedisCache.',
+                    id='openldap.E001',
+                )
+            )
+    return errors
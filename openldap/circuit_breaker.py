@@ -0,0 +1,229 @@
+import contextvars
+import logging
+import random
+import time
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+import django_rq
+from django.conf import settings
+from rq import get_current_job
+
+from common.cache import get_cache
+from common.jobs import hand_over
+
+logger = logging.getLogger('openldap')
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling OpenLDAP while it is believed to be unhealthy.
+    """
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super(CircuitOpenError, self).__init__(
+            'OpenLDAP is unavailable, retry in {:.0f}s'.format(retry_after)
+        )
+
+
+class CircuitBreaker:
+    """
+    Track the health of the OpenLDAP API across every process, in the cache
+    shared between them.
+
+    The circuit opens when, within a window of OPENLDAP_CIRCUIT_WINDOW
+    seconds, at least OPENLDAP_CIRCUIT_MIN_REQUESTS requests were made and
+    the proportion which failed reached OPENLDAP_CIRCUIT_FAILURE_RATE. While
+    open, requests are refused. Once the reset timeout has passed, a single
+    probe request is allowed through: if it succeeds the circuit closes,
+    otherwise it opens again with the reset timeout doubled, up to
+    OPENLDAP_CIRCUIT_MAX_RESET_TIMEOUT. Failures of any other request while
+    the circuit is open do not extend the reset timeout.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name='openldap'):
+        self.name = name
+        # The probe held by the current thread or asyncio task, if any
+        self.probe = contextvars.ContextVar(
+            'circuit_probe_{}'.format(name), default=None
+        )
+
+    def key(self, suffix):
+        return 'circuit:{name}:{suffix}'.format(name=self.name, suffix=suffix)
+
+    def get_opening(self):
+        return get_cache().get(self.key('opening'))
+
+    def reset_timeout(self, opens):
+        return min(
+            settings.OPENLDAP_CIRCUIT_RESET_TIMEOUT * 2**(opens - 1),
+            settings.OPENLDAP_CIRCUIT_MAX_RESET_TIMEOUT,
+        )
+
+    def retry_after(self):
+        """
+        Get the number of seconds until a probe request will be allowed.
+        """
+        opening = self.get_opening()
+        if opening is None:
+            return 0
+        return max(
+            0, opening['opened_at'] + self.reset_timeout(opening['opens']) -
+            time.time()
+        )
+
+    @property
+    def state(self):
+        if self.get_opening() is None:
+            return self.CLOSED
+        if self.retry_after() > 0:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow_request(self):
+        """
+        Decide whether a request may be made now. Only one probe request is
+        allowed while the circuit is half open.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        probe = uuid.uuid4().hex
+        if not get_cache().add(
+            self.key('probe'),
+            probe,
+            timeout=settings.OPENLDAP_CIRCUIT_PROBE_TIMEOUT,
+        ):
+            return False
+        self.probe.set(probe)
+        return True
+
+    def take_probe(self):
+        """
+        Decide whether the request just made by this thread or task was the
+        probe, which it can only be once.
+        """
+        probe = self.probe.get()
+        self.probe.set(None)
+        return probe is not None and get_cache().get(self.key('probe')) == probe
+
+    def count(self, suffix):
+        cache = get_cache()
+        key = self.key(suffix)
+        cache.add(key, 0, timeout=settings.OPENLDAP_CIRCUIT_WINDOW)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # The window expired between adding and incrementing the key
+            cache.set(key, 1, timeout=settings.OPENLDAP_CIRCUIT_WINDOW)
+            return 1
+
+    def record_success(self):
+        self.probe.set(None)
+        if self.get_opening() is not None:
+            logger.info('OpenLDAP circuit %s closed', self.name)
+            get_cache().delete_many([
+                self.key('opening'),
+                self.key('probe'),
+                self.key('requests'),
+                self.key('failures'),
+            ])
+            return
+        self.count('requests')
+
+    def record_failure(self):
+        opening = self.get_opening()
+        if opening is not None:
+            # A failed probe reopens the circuit for longer. Other failures
+            # are of requests made before the circuit opened, and are ignored.
+            if self.take_probe():
+                self.open(opening['opens'] + 1)
+            return
+        requests = self.count('requests')
+        failures = self.count('failures')
+        if (
+            requests >= settings.OPENLDAP_CIRCUIT_MIN_REQUESTS and
+            failures / requests >= settings.OPENLDAP_CIRCUIT_FAILURE_RATE
+        ):
+            self.open(1)
+
+    def open(self, opens):
+        logger.warning(
+            'OpenLDAP circuit %s opened for %ss', self.name,
+            self.reset_timeout(opens)
+        )
+        cache = get_cache()
+        cache.set(
+            self.key('opening'),
+            {
+                'opened_at': time.time(),
+                'opens': opens,
+            },
+            timeout=None,
+        )
+        cache.delete(self.key('probe'))
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def defer_job(job, retry_after):
+    """
+    Enqueue a job again once OpenLDAP may have recovered, backing off
+    exponentially with each deferral. Jitter spreads the deferred jobs out,
+    so that the backlog is worked through gradually after recovery.
+    """
+    deferrals = job.meta.get('circuit_deferrals', 0) + 1
+    delay = min(
+        max(
+            retry_after,
+            settings.OPENLDAP_CIRCUIT_RESET_TIMEOUT * 2**(deferrals - 1),
+        ),
+        settings.OPENLDAP_CIRCUIT_MAX_RESET_TIMEOUT,
+    )
+    delay += random.uniform(0, settings.OPENLDAP_CIRCUIT_RESET_TIMEOUT)
+    logger.info('Deferring job %s by %.0fs', job.func_name, delay)
+    job_id = str(uuid.uuid4())
+    hand_over(job, job_id)
+    django_rq.get_queue(job.origin).enqueue_in(
+        timedelta(seconds=delay),
+        job.func_name,
+        args=job.args,
+        kwargs=job.kwargs,
+        job_timeout=job.timeout,
+        job_id=job_id,
+        meta={'circuit_deferrals': deferrals},
+    )
+
+
+def with_circuit_breaker(func):
+    """
+    Refuse to call an OpenLDAP API function while the circuit is open.
+
+    In an RQ worker the job is deferred instead, until it has been deferred
+    OPENLDAP_CIRCUIT_MAX_DEFERRALS times, after which it is run regardless
+    so that the usual failure handling applies. Elsewhere CircuitOpenError
+    is raised straight away, before any model state is changed.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not circuit_breaker.allow_request():
+            retry_after = circuit_breaker.retry_after()
+            job = get_current_job()
+            if job is None:
+                raise CircuitOpenError(retry_after)
+            deferrals = job.meta.get('circuit_deferrals', 0)
+            if deferrals < settings.OPENLDAP_CIRCUIT_MAX_DEFERRALS:
+                defer_job(job, retry_after)
+                return None
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,70 @@
+import os
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from openldap.circuit_breaker import circuit_breaker
+
+_sessions = {}
+
+
+class CircuitBreakerSession(requests.Session):
+    """
+    A requests session which reports the outcome of each request to the
+    OpenLDAP circuit breaker. Connection errors, timeouts and server errors
+    count as failures; client errors mean the service is healthy.
+    """
+
+    def request(self, *args, **kwargs):
+        try:
+            response = super(CircuitBreakerSession, self).request(
+                *args, **kwargs
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            circuit_breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        return response
+
+
+def create_session():
+    """
+    Create a requests session for the OpenLDAP API, whose connections are
+    kept alive and pooled, and whose idempotent requests are retried with
+    backoff on connection errors and gateway errors.
+    """
+    retries = Retry(
+        total=settings.OPENLDAP_MAX_RETRIES,
+        backoff_factor=settings.OPENLDAP_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.OPENLDAP_POOL_SIZE,
+        max_retries=retries,
+    )
+    session = CircuitBreakerSession()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+def get_session():
+    """
+    Get the OpenLDAP API session for the current process.
+
+    Sessions are never shared between processes, as pooled connections
+    would not survive a worker forking.
+    """
+    pid = os.getpid()
+    if pid not in _sessions:
+        _sessions.clear()
+        _sessions[pid] = create_session()
+    return _sessions[pid]
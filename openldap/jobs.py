@@ -0,0 +1,177 @@
+"""
+Jobs which propagate changes to OpenLDAP, taking primary keys rather than
+model instances.
+
+Each job reloads its objects, with the relations the API function uses, when
+it runs in the worker. Payloads in Redis stay small, and the API functions
+see the current state of the objects rather than the state when the job was
+queued, so that resetting a status on failure cannot overwrite newer
+changes.
+
+Jobs which set the state of a user, a project's allocation or a project
+membership are coalesced by operation: of the jobs queued for an object
+which have not yet started, only the most recently queued of each kind is
+run, so repeated changes in quick succession cost one call. Each kind is
+idempotent and the jobs left run in the order they were queued, so the
+object still ends up in the last requested state, and a create is never
+removed by a later job which depends on it.
+
+For compatibility, a model instance may be passed in place of a primary key,
+and only its primary key is used. Jobs queued before this module existed
+reference the instance based functions in `openldap.api`, which are
+unchanged and still run.
+"""
+from django.apps import apps
+from django_rq import job
+
+from common.jobs import coalesced_job
+from openldap.api import project_api, project_membership_api, user_api
+
+USER_RELATED = ['profile']
+ALLOCATION_RELATED = [
+    'project__category',
+    'project__tech_lead__profile',
+]
+PROJECT_MEMBERSHIP_RELATED = [
+    'project',
+    'user__profile',
+]
+
+
+def get_pk(instance_or_pk):
+    """
+    Get the primary key of a model instance, or return a primary key as is.
+    """
+    return getattr(instance_or_pk, 'pk', instance_or_pk)
+
+
+def load(model, instance_or_pk, related):
+    """
+    Load an object afresh with its related objects. Models are given by
+    label, as the models modules import this module's callers.
+    """
+    return apps.get_model(model).objects.select_related(*related).get(
+        pk=get_pk(instance_or_pk)
+    )
+
+
+@coalesced_job('openldap.user.create', queue='interactive')
+def create_user(user_id, notify_user=True):
+    user = load('users.CustomUser', user_id, USER_RELATED)
+    return user_api.create_user(user, notify_user=notify_user)
+
+
+@coalesced_job('openldap.user.activate', queue='interactive')
+def activate_user_account(user_id, notify_user=True):
+    user = load('users.CustomUser', user_id, USER_RELATED)
+    return user_api.activate_user_account(user, notify_user=notify_user)
+
+
+@coalesced_job('openldap.user.deactivate', queue='interactive')
+def deactivate_user_account(user_id, notify_user=True):
+    user = load('users.CustomUser', user_id, USER_RELATED)
+    return user_api.deactivate_user_account(user, notify_user=notify_user)
+
+
+@job('interactive')
+def reset_user_password(user_id, password, notify_user=True):
+    user = load('users.CustomUser', user_id, USER_RELATED)
+    return user_api.reset_user_password(
+        user, password, notify_user=notify_user
+    )
+
+
+@coalesced_job('openldap.allocation.create', queue='interactive')
+def create_project(allocation_id, notify_user=True):
+    allocation = load(
+        'project.SystemAllocationRequest', allocation_id, ALLOCATION_RELATED
+    )
+    return project_api.create_project(allocation, notify_user=notify_user)
+
+
+@coalesced_job('openldap.allocation.activate', queue='interactive')
+def activate_project(allocation_id, notify_user=True):
+    allocation = load(
+        'project.SystemAllocationRequest', allocation_id, ALLOCATION_RELATED
+    )
+    return project_api.activate_project(allocation, notify_user=notify_user)
+
+
+@coalesced_job('openldap.allocation.deactivate', queue='interactive')
+def deactivate_project(allocation_id, notify_user=True):
+    allocation = load(
+        'project.SystemAllocationRequest', allocation_id, ALLOCATION_RELATED
+    )
+    return project_api.deactivate_project(
+        allocation, notify_user=notify_user
+    )
+
+
+@coalesced_job(
+    'openldap.project_membership.create', queue='interactive'
+)
+def create_project_membership(project_membership_id, notify_user=True):
+    project_membership = load(
+        'project.ProjectUserMembership', project_membership_id,
+        PROJECT_MEMBERSHIP_RELATED
+    )
+    return project_membership_api.create_project_membership(
+        project_membership, notify_user=notify_user
+    )
+
+
+@coalesced_job(
+    'openldap.project_membership.delete', queue='interactive'
+)
+def delete_project_membership(project_membership_id, notify_user=True):
+    project_membership = load(
+        'project.ProjectUserMembership', project_membership_id,
+        PROJECT_MEMBERSHIP_RELATED
+    )
+    return project_membership_api.delete_project_membership(
+        project_membership, notify_user=notify_user
+    )
+
+
+@job('ldap-bulk')
+def create_project_memberships(
+    project_id, project_membership_ids, notify_user=True
+):
+    """
+    Only memberships which are still authorised are created, as a membership
+    revoked since the job was queued may already have been deleted by a job
+    on the interactive queue.
+    """
+    ProjectUserMembership = apps.get_model('project.ProjectUserMembership')
+    project = load('project.Project', project_id, [])
+    project_memberships = list(
+        ProjectUserMembership.objects.filter(
+            project=project,
+            pk__in=[get_pk(pk) for pk in project_membership_ids],
+            status=ProjectUserMembership.AUTHORISED,
+        ).select_related(*PROJECT_MEMBERSHIP_RELATED)
+    )
+    return project_membership_api.create_project_memberships(
+        project, project_memberships, notify_user=notify_user
+    )
+
+
+@job('ldap-bulk')
+def delete_project_memberships(project_id, project_membership_ids):
+    """
+    Memberships which have been authorised again since the job was queued
+    are kept.
+    """
+    ProjectUserMembership = apps.get_model('project.ProjectUserMembership')
+    project = load('project.Project', project_id, [])
+    project_memberships = list(
+        ProjectUserMembership.objects.filter(
+            project=project,
+            pk__in=[get_pk(pk) for pk in project_membership_ids],
+        ).exclude(
+            status=ProjectUserMembership.AUTHORISED,
+        ).select_related(*PROJECT_MEMBERSHIP_RELATED)
+    )
+    return project_membership_api.delete_project_memberships(
+        project, project_memberships
+    )
@@ -0,0 +1,132 @@
+import timeit
+from types import SimpleNamespace
+
+import jsonschema
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from openldap.schemas.user.get_user import get_user_json, get_user_validator
+from openldap.schemas.user.list_users import (
+    list_users_json, list_users_validator
+)
+from openldap.util import decode_response
+from security.json_web_token import JSONWebToken
+
+JWT_SETTINGS = {
+    'OPENLDAP_JWT_KEY': 'benchmark-key',
+    'OPENLDAP_JWT_ISSUER': 'https://openldap.example.com/',
+    'OPENLDAP_JWT_AUDIENCE': 'https://openldap.example.com/',
+    'OPENLDAP_JWT_ALGORITHM': 'HS256',
+}
+
+
+def make_response(data):
+    """
+    Build an object standing in for an OpenLDAP API response carrying
+    `data` in a signed JWT.
+    """
+    payload = {
+        'iss': JWT_SETTINGS['OPENLDAP_JWT_ISSUER'],
+        'aud': JWT_SETTINGS['OPENLDAP_JWT_AUDIENCE'],
+        'iat': 1527098868,
+        'nbf': 1527098268,
+        'data': data,
+    }
+    token = JSONWebToken.encode(payload, JWT_SETTINGS['OPENLDAP_JWT_KEY'])
+    if isinstance(token, str):
+        token = token.encode()
+    return SimpleNamespace(content=token)
+
+
+def decode_and_validate_per_call(response, schema):
+    """
+    Decode and validate a response as each API call did before validators
+    were compiled once.
+    """
+    payload = JSONWebToken.decode(
+        data=response.content.strip(),
+        key=JWT_SETTINGS['OPENLDAP_JWT_KEY'],
+        audience=JWT_SETTINGS['OPENLDAP_JWT_AUDIENCE'],
+        algorithms=[JWT_SETTINGS['OPENLDAP_JWT_ALGORITHM']],
+    )
+    jsonschema.validate(payload, schema)
+    return payload
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the decoding and validation of OpenLDAP API responses, with '
+        'schemas validated per call and with precompiled validators.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n',
+            '--number',
+            type=int,
+            help='Number of responses to decode for each measurement.',
+            default=2000
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            help='Number of users in the list_users response.',
+            default=500
+        )
+
+    def handle(self, *args, **options):
+        number = options.get('number', 2000)
+        user = {
+            field: {'0': value, 'count': 1}
+            for field, value in (
+                ('uid', 'e.joe.bloggs'),
+                ('mail', 'joe.bloggs@example.ac.uk'),
+                ('displayname', 'Joe Bloggs'),
+                ('gidNumber', '5000001'),
+                ('uidnumber', '5000001'),
+            )
+        }
+        user['telephone'] = '00000-000-000'
+        list_data = {
+            str(index): 'e.user.{}'.format(index)
+            for index in range(options.get('users', 500))
+        }
+        list_data.update({'count': len(list_data), 'error': ''})
+        cases = [
+            ('get_user', make_response({'0': user, 'count': 1, 'error': ''}),
+             get_user_json, get_user_validator),
+            ('list_users', make_response(list_data), list_users_json,
+             list_users_validator),
+        ]
+
+        self.stdout.write(
+            '{:<12} {:>16} {:>16} {:>8}'.format(
+                'response', 'per call (us)', 'compiled (us)', 'speedup'
+            )
+        )
+        with override_settings(**JWT_SETTINGS):
+            for name, response, schema, validator in cases:
+                # Check both paths accept the response before timing them
+                decode_and_validate_per_call(response, schema)
+                decode_response(response, validator)
+
+                per_call = min(
+                    timeit.repeat(
+                        lambda: decode_and_validate_per_call(response, schema),
+                        number=number,
+                        repeat=3
+                    )
+                ) / number
+                compiled = min(
+                    timeit.repeat(
+                        lambda: decode_response(response, validator),
+                        number=number,
+                        repeat=3
+                    )
+                ) / number
+                self.stdout.write(
+                    '{:<12} {:>16.1f} {:>16.1f} {:>7.1f}x'.format(
+                        name, per_call * 1e6, compiled * 1e6,
+                        per_call / compiled
+                    )
+                )
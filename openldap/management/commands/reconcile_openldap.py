@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from openldap.reconciliation import (
+    apply_reconciliation, fetch_cogs_state, fetch_directory_state, reconcile
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the users, projects and project memberships in OpenLDAP '
+        'with those in Cogs, and optionally fix the differences.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Correct membership in_ldap flags, and enqueue jobs to '
+            'create and delete project memberships in OpenLDAP so that they '
+            'match Cogs. Users and projects are only reported.',
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            help='Maximum number of concurrent requests to OpenLDAP. '
+            'Defaults to the OPENLDAP_POOL_SIZE setting.',
+            default=None
+        )
+        parser.add_argument(
+            '--details',
+            action='store_true',
+            help='List each difference found, not just the number of each '
+            'kind.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        directory = fetch_directory_state(max_workers=options.get('workers'))
+        reconciliation = reconcile(directory, fetch_cogs_state())
+        self.stdout.write(
+            'Fetched {users} users, {projects} projects and {memberships} '
+            'project memberships in {seconds:.1f}s.'.format(
+                users=len(directory.users),
+                projects=len(directory.projects),
+                memberships=sum(
+                    len(members) for members in directory.memberships.values()
+                ),
+                seconds=time.perf_counter() - start,
+            )
+        )
+
+        for field in reconciliation._fields:
+            items = getattr(reconciliation, field)
+            self.stdout.write('{}: {}'.format(field, len(items)))
+            if options.get('details'):
+                if isinstance(items, dict):
+                    items = [
+                        '{}: {}'.format(key, value)
+                        for key, value in items.items()
+                    ]
+                for item in items:
+                    self.stdout.write('    {}'.format(item))
+
+        if options.get('apply'):
+            apply_reconciliation(reconciliation)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    'Updated {flags} in_ldap flags, and submitted {created} '
+                    'memberships for creation and {deleted} for deletion, '
+                    'in one job per project.'.format(
+                        flags=len(reconciliation.memberships_in_ldap_changed),
+                        created=len(reconciliation.memberships_to_create),
+                        deleted=len(reconciliation.memberships_to_delete),
+                    )
+                )
+            )
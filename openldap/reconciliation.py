@@ -0,0 +1,190 @@
+from collections import defaultdict, namedtuple
+
+from openldap import jobs
+from openldap.api.async_api import run_batch
+from project.models import Project, ProjectUserMembership
+from project.openldap import create_openldap_project_memberships
+from users.models import Profile
+
+DirectoryState = namedtuple(
+    'DirectoryState', ['users', 'projects', 'memberships', 'errors']
+)
+CogsState = namedtuple('CogsState', ['users', 'projects', 'memberships'])
+Reconciliation = namedtuple(
+    'Reconciliation', [
+        'users_missing',
+        'users_unknown',
+        'projects_missing',
+        'projects_unknown',
+        'projects_without_gid_number',
+        'memberships_to_create',
+        'memberships_to_delete',
+        'memberships_unknown',
+        'memberships_in_ldap_changed',
+        'errors',
+    ]
+)
+
+
+def parse_listing(data):
+    """
+    Extract the values of an OpenLDAP listing, which are keyed by index
+    alongside `count` and `error` entries, as a set of lower case strings.
+    """
+    return {
+        value.lower()
+        for key, value in data.items()
+        if key not in ('count', 'error') and isinstance(value, str)
+    }
+
+
+def parse_members(response):
+    """
+    Get the user ids of the members of an OpenLDAP project from its member
+    listing.
+    """
+    members = set()
+    for key, entry in response.get('data').items():
+        if key not in ('count', 'error'):
+            members |= parse_listing(entry.get('member', {}))
+    return members
+
+
+def fetch_directory_state(max_workers=None):
+    """
+    Fetch the users, projects and project memberships held in OpenLDAP.
+
+    Requests are made concurrently through one event loop, with at most
+    `max_workers` (by default OPENLDAP_POOL_SIZE) in flight at once.
+    Projects whose memberships could not be listed are recorded in `errors`
+    rather than aborting the whole fetch.
+    """
+    users, projects = run_batch(
+        [('list_users', ), ('list_projects', )],
+        max_concurrency=max_workers,
+        return_exceptions=False,
+    )
+    users = parse_listing(users.get('data'))
+    projects = parse_listing(projects.get('data'))
+
+    codes = sorted(projects)
+    responses = run_batch(
+        [('list_project_memberships', code) for code in codes],
+        max_concurrency=max_workers,
+    )
+    memberships = {}
+    errors = {}
+    for code, response in zip(codes, responses):
+        if isinstance(response, Exception):
+            errors[code] = str(response)
+        else:
+            memberships[code] = parse_members(response)
+
+    return DirectoryState(users, projects, memberships, errors)
+
+
+def fetch_cogs_state():
+    """
+    Index the users, projects and project memberships held in Cogs by the
+    keys used in OpenLDAP: user ids and lower case project codes.
+    """
+    users = {
+        profile.scw_username.lower(): profile
+        for profile in Profile.objects.exclude(scw_username__isnull=True)
+        .exclude(scw_username='').select_related('user')
+    }
+    projects = {
+        project.code.lower(): project
+        for project in Project.objects.exclude(code__isnull=True)
+    }
+    memberships = {}
+    for membership in ProjectUserMembership.objects.filter(
+        user__profile__isnull=False
+    ).select_related('project', 'user__profile'):
+        scw_username = membership.user.profile.scw_username
+        if membership.project.code and scw_username:
+            key = (membership.project.code.lower(), scw_username.lower())
+            memberships[key] = membership
+
+    return CogsState(users, projects, memberships)
+
+
+def reconcile(directory, cogs):
+    """
+    Compare the state of OpenLDAP with that of Cogs, in time linear in the
+    number of users, projects and memberships on either side.
+    """
+    directory_memberships = {
+        (code, uid)
+        for code, members in directory.memberships.items()
+        for uid in members
+    }
+    authorised_memberships = {
+        key
+        for key, membership in cogs.memberships.items()
+        if membership.status == ProjectUserMembership.AUTHORISED and
+        key[0] in directory.memberships
+    }
+
+    memberships_in_ldap_changed = []
+    for key, membership in cogs.memberships.items():
+        if key[0] in directory.errors:
+            continue
+        in_ldap = key in directory_memberships
+        if membership.in_ldap != in_ldap:
+            membership.in_ldap = in_ldap
+            memberships_in_ldap_changed.append(membership)
+
+    memberships_to_delete = []
+    memberships_unknown = []
+    for key in directory_memberships - authorised_memberships:
+        if key in cogs.memberships:
+            memberships_to_delete.append(cogs.memberships[key])
+        else:
+            memberships_unknown.append(key)
+
+    return Reconciliation(
+        users_missing=sorted(set(cogs.users) - directory.users),
+        users_unknown=sorted(directory.users - set(cogs.users)),
+        projects_missing=sorted(
+            code for code, project in cogs.projects.items()
+            if project.gid_number and code not in directory.projects
+        ),
+        projects_unknown=sorted(directory.projects - set(cogs.projects)),
+        projects_without_gid_number=sorted(
+            code for code in directory.projects
+            if code in cogs.projects and not cogs.projects[code].gid_number
+        ),
+        memberships_to_create=[
+            cogs.memberships[key]
+            for key in sorted(authorised_memberships - directory_memberships)
+        ],
+        memberships_to_delete=memberships_to_delete,
+        memberships_unknown=sorted(memberships_unknown),
+        memberships_in_ldap_changed=memberships_in_ldap_changed,
+        errors=directory.errors,
+    )
+
+
+def apply_reconciliation(reconciliation):
+    """
+    Fix the drift found by `reconcile` where this is safe to do
+    automatically: correct `in_ldap` flags, and enqueue batched jobs to
+    create authorised memberships and delete memberships which are no
+    longer authorised, one of each per project. Users are not notified, and
+    deleting leaves the memberships in Cogs untouched. Users and projects
+    which differ are left to be resolved by hand.
+    """
+    ProjectUserMembership.objects.bulk_update(
+        reconciliation.memberships_in_ldap_changed, ['in_ldap']
+    )
+    create_openldap_project_memberships(
+        reconciliation.memberships_to_create, notify_user=False
+    )
+    memberships_to_delete = defaultdict(list)
+    for membership in reconciliation.memberships_to_delete:
+        memberships_to_delete[membership.project_id].append(membership.pk)
+    for project_id, membership_ids in memberships_to_delete.items():
+        jobs.delete_project_memberships.delay(
+            project_id=project_id, project_membership_ids=membership_ids
+        )
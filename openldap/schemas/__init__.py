@@ -0,0 +1,12 @@
+import jsonschema
+
+
+def compile_schema(schema):
+    """
+    Check a JSON schema once and build a reusable validator for it, so that
+    validating a response does not rebuild the validator or re-resolve the
+    schema's references.
+    """
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 list_projects_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/ListProjects",
@@ -35,12 +37,6 @@ list_projects_json = {
             "type": "object",
             "additionalProperties": False,
             "properties": {
-                "0": {
-                    "type": "string"
-                },
-                "1": {
-                    "type": "string"
-                },
                 "error": {
                     "type": "string"
                 },
@@ -48,6 +44,11 @@ list_projects_json = {
                     "type": "integer"
                 }
             },
+            "patternProperties": {
+                "^[0-9]+$": {
+                    "type": "string"
+                }
+            },
             "required": [
                 "count",
                 "error",
@@ -56,3 +57,5 @@ list_projects_json = {
         }
     }
 }
+
+list_projects_validator = compile_schema(list_projects_json)
@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 create_project_membership_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/CreateProjectMembership",
@@ -69,3 +71,5 @@ create_project_membership_json = {
         }
     }
 }
+
+create_project_membership_validator = compile_schema(create_project_membership_json)
@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 list_project_memberships_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/ListProjectMemberships",
@@ -46,9 +48,6 @@ list_project_memberships_json = {
             "type": "object",
             "additionalProperties": False,
             "properties": {
-                "0": {
-                    "$ref": "#/definitions/0"
-                },
                 "error": {
                     "type": "string"
                 },
@@ -56,6 +55,11 @@ list_project_memberships_json = {
                     "type": "integer"
                 }
             },
+            "patternProperties": {
+                "^[0-9]+$": {
+                    "$ref": "#/definitions/0"
+                }
+            },
             "required": ["count", "error"],
             "title": "Data"
         },
@@ -63,15 +67,19 @@ list_project_memberships_json = {
             "type": "object",
             "additionalProperties": False,
             "properties": {
-                "0": {
-                    "type": "string"
-                },
                 "count": {
                     "type": "integer"
                 }
             },
+            "patternProperties": {
+                "^[0-9]+$": {
+                    "type": "string"
+                }
+            },
             "required": ["count"],
             "title": "Member"
         }
     }
 }
+
+list_project_memberships_validator = compile_schema(list_project_memberships_json)
@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 create_user_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/CreateUser",
@@ -98,3 +100,5 @@ create_user_json = {
         }
     }
 }
+
+create_user_validator = compile_schema(create_user_json)
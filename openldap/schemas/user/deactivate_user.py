@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 deactivate_user_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/DeleteUser",
@@ -46,3 +48,5 @@ deactivate_user_json = {
         }
     }
 }
+
+deactivate_user_validator = compile_schema(deactivate_user_json)
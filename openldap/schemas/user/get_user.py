@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 get_user_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/GetUser",
@@ -104,3 +106,5 @@ get_user_json = {
         }
     }
 }
+
+get_user_validator = compile_schema(get_user_json)
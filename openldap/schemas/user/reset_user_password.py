@@ -1,3 +1,5 @@
+from openldap.schemas import compile_schema
+
 reset_user_password_json = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/ResetPassword",
@@ -43,3 +45,5 @@ reset_user_password_json = {
         }
     }
 }
+
+reset_user_password_validator = compile_schema(reset_user_password_json)
@@ -3,11 +3,16 @@ import mock
 import requests
 
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from common.cache import get_cache as get_shared_cache
+from common.testing import LOCAL_CACHES
+from openldap.cache import get_cache
 
 from users.models import CustomUser
 
 
+@override_settings(CACHES=LOCAL_CACHES)
 class OpenLDAPBaseAPITests(TestCase):
 
     fixtures = [
@@ -21,6 +26,8 @@ class OpenLDAPBaseAPITests(TestCase):
         settings.OPENLDAP_JWT_ISSUER = 'https://openldap.example.com/'
         settings.OPENLDAP_JWT_AUDIENCE = 'https://openldap.example.com/'
         settings.OPENLDAP_JWT_ALGORITHM = 'HS256'
+        get_cache().clear()
+        get_shared_cache().clear()
 
         self.user = CustomUser.objects.get(
             email='shibboleth.user@example.ac.uk'
@@ -40,10 +47,10 @@ class OpenLDAPBaseAPITests(TestCase):
             mock_resp.json = mock.Mock(return_value=json_data)
         return mock_resp
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
-    @mock.patch('requests.put')
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.put')
+    @mock.patch('requests.Session.delete')
     def _test_query_with_invalid_json_schema(
         self, query, query_kwargs, delete_mock, put_mock, post_mock, get_mock
     ):
@@ -71,10 +78,10 @@ class OpenLDAPBaseAPITests(TestCase):
         with self.assertRaises(jsonschema.exceptions.ValidationError):
             query(**query_kwargs) if query_kwargs else query()
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
-    @mock.patch('requests.put')
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.put')
+    @mock.patch('requests.Session.delete')
     def _test_query_with_connection_error(
         self, query, query_kwargs, delete_mock, put_mock, post_mock, get_mock
     ):
@@ -93,10 +100,10 @@ class OpenLDAPBaseAPITests(TestCase):
         with self.assertRaises(requests.exceptions.ConnectionError):
             query(**query_kwargs) if query_kwargs else query()
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
-    @mock.patch('requests.put')
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.put')
+    @mock.patch('requests.Session.delete')
     def _test_query_with_http_error(
         self, query, query_kwargs, delete_mock, put_mock, post_mock, get_mock
     ):
@@ -115,10 +122,10 @@ class OpenLDAPBaseAPITests(TestCase):
         with self.assertRaises(requests.exceptions.HTTPError):
             query(**query_kwargs) if query_kwargs else query()
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
-    @mock.patch('requests.put')
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.put')
+    @mock.patch('requests.Session.delete')
     def _test_query_with_timeout_error(
         self, query, query_kwargs, delete_mock, put_mock, post_mock, get_mock
     ):
@@ -0,0 +1,205 @@
+import asyncio
+
+import aiohttp
+import mock
+
+from django.conf import settings
+from django.test import override_settings
+
+from openldap.api.async_api import AsyncOpenLDAPClient, run_batch
+from openldap.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, circuit_breaker
+)
+from openldap.tests.test_api import OpenLDAPBaseAPITests
+from security.json_web_token import JSONWebToken
+
+
+class FakeResponse:
+    """
+    The subset of an aiohttp response used by AsyncOpenLDAPClient, as the
+    async context manager returned by ClientSession.request.
+    """
+
+    def __init__(self, status=200, content=b'', delay=0):
+        self.status = status
+        self.content = content
+        self.delay = delay
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.delay)
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self):
+        if isinstance(self.content, str):
+            return self.content.encode()
+        return self.content
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                mock.Mock(), (), status=self.status
+            )
+
+
+class OpenLDAPAsyncAPITests(OpenLDAPBaseAPITests):
+
+    @staticmethod
+    def jwt_response(data, status=200):
+        payload = {
+            'iss': settings.OPENLDAP_JWT_ISSUER,
+            'aud': settings.OPENLDAP_JWT_AUDIENCE,
+            'iat': 1527098868,
+            'nbf': 1527098268,
+            'data': data,
+        }
+        token = JSONWebToken.encode(payload, settings.OPENLDAP_JWT_KEY)
+        return FakeResponse(status, token)
+
+    def project_response(self, code):
+        return self.jwt_response({
+            '0': {
+                'cn': {
+                    '0': code,
+                    'count': 1,
+                },
+                'member': {
+                    '0': 'e.shibboleth.user',
+                    'count': 1,
+                },
+            },
+            'count': 1,
+            'error': '',
+        })
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_run_batch(self, request_mock):
+        """
+        Ensure a batch of calls returns each call's result in order.
+        """
+        request_mock.side_effect = lambda method, url, **kwargs: (
+            self.project_response(url.rstrip('/').rsplit('/', 1)[1])
+        )
+        results = run_batch([
+            ('get_project', 'SCW0000'),
+            ('get_project', 'SCW0001'),
+        ])
+        self.assertEqual(
+            [result['data']['0']['cn']['0'] for result in results],
+            ['SCW0000', 'SCW0001'],
+        )
+        method, url = request_mock.call_args_list[0][0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, 'https://example.com/project/SCW0000/')
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_run_batch_returns_exceptions(self, request_mock):
+        """
+        Ensure a failed call does not prevent the others from completing.
+        """
+        def request(method, url, **kwargs):
+            if 'SCW0001' in url:
+                return FakeResponse(status=404)
+            return self.project_response('SCW0000')
+
+        request_mock.side_effect = request
+        results = run_batch([
+            ('get_project', 'SCW0000'),
+            ('get_project', 'SCW0001'),
+        ])
+        self.assertEqual(results[0]['data']['0']['cn']['0'], 'SCW0000')
+        self.assertIsInstance(results[1], aiohttp.ClientResponseError)
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            run_batch([('get_project', 'SCW0001')], return_exceptions=False)
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_create_project_membership(self, request_mock):
+        """
+        Ensure form data is posted with the matching content type.
+        """
+        request_mock.return_value = self.jwt_response({
+            'count': 1,
+            'error': '',
+            'project': 'scw0000',
+            'user_dn': {
+                'memberUid': 'e.shibboleth.user'
+            },
+        }, status=201)
+        run_batch(
+            [('create_project_membership', 'scw0000', self.user.email)],
+            return_exceptions=False
+        )
+        method, url = request_mock.call_args[0]
+        kwargs = request_mock.call_args[1]
+        self.assertEqual(method, 'POST')
+        self.assertEqual(url, 'https://example.com/project/member/scw0000/')
+        self.assertEqual(kwargs['data'], {'email': self.user.email})
+        self.assertEqual(
+            kwargs['headers']['Content-Type'],
+            'application/x-www-form-urlencoded'
+        )
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_concurrency_is_limited(self, request_mock):
+        """
+        Ensure requests overlap, but no more than max_concurrency at once.
+        """
+        in_flight = []
+        peak = []
+
+        class TrackedResponse(FakeResponse):
+
+            async def __aenter__(self):
+                in_flight.append(self)
+                peak.append(len(in_flight))
+                return await super().__aenter__()
+
+            async def __aexit__(self, *args):
+                in_flight.remove(self)
+
+        request_mock.side_effect = lambda method, url, **kwargs: (
+            TrackedResponse(status=204, delay=0.01)
+        )
+        run_batch(
+            [('deactivate_user_account', str(i)) for i in range(6)],
+            max_concurrency=2,
+            return_exceptions=False,
+        )
+        self.assertEqual(request_mock.call_count, 6)
+        self.assertEqual(max(peak), 2)
+
+    @override_settings(
+        OPENLDAP_CIRCUIT_MIN_REQUESTS=3,
+        OPENLDAP_CIRCUIT_FAILURE_RATE=0.5,
+    )
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_outcomes_are_recorded(self, request_mock):
+        """
+        Ensure connection errors and server errors count as failures of the
+        circuit breaker, and that calls are refused once it opens.
+        """
+        request_mock.side_effect = [
+            FakeResponse(status=404),
+            FakeResponse(status=503),
+            aiohttp.ClientConnectionError(),
+        ]
+        results = run_batch(
+            [('get_project', code) for code in ('a', 'b', 'c', 'd')],
+            max_concurrency=1,
+        )
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+        self.assertIsInstance(results[2], aiohttp.ClientConnectionError)
+        self.assertIsInstance(results[3], CircuitOpenError)
+        self.assertEqual(request_mock.call_count, 3)
+
+    def test_client_defaults_to_pool_size(self):
+
+        async def run():
+            async with AsyncOpenLDAPClient() as client:
+                return client.max_concurrency
+
+        with self.settings(OPENLDAP_POOL_SIZE=3):
+            self.assertEqual(asyncio.run(run()), 3)
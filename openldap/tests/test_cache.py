@@ -0,0 +1,170 @@
+import threading
+
+import mock
+
+from django.conf import settings
+from django.core.cache import caches
+
+from openldap.api import project_api, project_membership_api, user_api
+from openldap.cache import get_cache, make_key
+from openldap.tests.test_api import OpenLDAPBaseAPITests
+from project.models import ProjectUserMembership
+from security.json_web_token import JSONWebToken
+
+
+class OpenLDAPCacheTests(OpenLDAPBaseAPITests):
+
+    fixtures = OpenLDAPBaseAPITests.fixtures + [
+        'funding/fixtures/tests/funding_bodies.json',
+        'funding/fixtures/tests/attributions.json',
+        'project/fixtures/tests/categories.json',
+        'project/fixtures/tests/projects.json',
+        'project/fixtures/tests/memberships.json',
+    ]
+
+    @staticmethod
+    def mock_jwt_response(data, status=200):
+        payload = {
+            'iss': settings.OPENLDAP_JWT_ISSUER,
+            'aud': settings.OPENLDAP_JWT_AUDIENCE,
+            'iat': 1527098868,
+            'nbf': 1527098268,
+            'data': data,
+        }
+        token = JSONWebToken.encode(payload, settings.OPENLDAP_JWT_KEY)
+        if isinstance(token, str):
+            token = token.encode()
+        return OpenLDAPBaseAPITests.mock_response(
+            status=status, content=token
+        )
+
+    def project_response(self, code='SCW0000'):
+        return self.mock_jwt_response({
+            '0': {
+                'cn': {
+                    '0': code,
+                    'count': 1,
+                },
+                'member': {
+                    '0': 'e.shibboleth.user',
+                    'count': 1,
+                },
+            },
+            'count': 1,
+            'error': '',
+        })
+
+    @mock.patch('requests.Session.get')
+    def test_get_project_is_cached(self, get_mock):
+        """
+        Ensure repeated lookups of a project only reach OpenLDAP once,
+        whatever the case of the project code.
+        """
+        get_mock.return_value = self.project_response()
+        first = project_api.get_project('SCW0000')
+        self.assertEqual(project_api.get_project('scw0000'), first)
+        self.assertEqual(get_mock.call_count, 1)
+
+    @mock.patch('requests.Session.get')
+    def test_failed_lookup_is_not_cached(self, get_mock):
+        """
+        Ensure a failed lookup is retried on the next call.
+        """
+        get_mock.return_value = self.mock_jwt_response({
+            'count': 0,
+            'error': 'Project not found',
+        })
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                project_api.get_project('SCW0000')
+        self.assertEqual(get_mock.call_count, 2)
+
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
+    def test_membership_change_invalidates_project(self, get_mock, post_mock):
+        """
+        Ensure a project is fetched again after a membership of it is created.
+        """
+        get_mock.return_value = self.project_response()
+        post_mock.return_value = self.mock_jwt_response({
+            'count': 1,
+            'error': '',
+            'project': 'scw0000',
+            'user_dn': {
+                'memberUid': 'e.shibboleth.user'
+            },
+        }, status=201)
+        project_api.get_project('scw0000')
+        project_membership_api.create_project_membership(
+            ProjectUserMembership.objects.get(id=1), notify_user=False
+        )
+        project_api.get_project('scw0000')
+        self.assertEqual(get_mock.call_count, 2)
+
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
+    def test_invalidation_reaches_other_cache_instances(
+        self, get_mock, post_mock
+    ):
+        """
+        Ensure a change made with one instance of the cache, as in an RQ
+        worker, invalidates the lookups cached by another, as in a web
+        process.
+        """
+        get_mock.return_value = self.project_response()
+        post_mock.return_value = self.mock_jwt_response({
+            'count': 1,
+            'error': '',
+            'project': 'scw0000',
+            'user_dn': {
+                'memberUid': 'e.shibboleth.user'
+            },
+        }, status=201)
+        membership = ProjectUserMembership.objects.select_related(
+            'project', 'user'
+        ).get(id=1)
+        project_api.get_project('scw0000')
+
+        worker_caches = []
+
+        def worker():
+            # Each thread has its own instances of the caches
+            worker_caches.append(caches['openldap'])
+            project_membership_api.create_project_membership(
+                membership, notify_user=False
+            )
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(worker_caches[0], get_cache())
+        project_api.get_project('scw0000')
+        self.assertEqual(get_mock.call_count, 2)
+
+    @mock.patch('requests.Session.delete')
+    def test_deactivation_invalidates_user(self, delete_mock):
+        """
+        Ensure both lookups of a user are discarded once their account is
+        deactivated.
+        """
+        cache = get_cache()
+        email_key = make_key('user_email', self.user.email)
+        id_key = make_key('user_id', self.user.profile.scw_username)
+        cache.set_many({email_key: {}, id_key: {}})
+        delete_mock.return_value = self.mock_response(status=204)
+
+        user_api.deactivate_user_account(self.user, notify_user=False)
+        self.assertIsNone(cache.get(email_key))
+        self.assertIsNone(cache.get(id_key))
+
+    @mock.patch('requests.Session.delete')
+    def test_failed_deactivation_keeps_cache(self, delete_mock):
+        cache = get_cache()
+        email_key = make_key('user_email', self.user.email)
+        cache.set(email_key, {})
+        delete_mock.side_effect = ValueError('Connection failed')
+
+        with self.assertRaises(ValueError):
+            user_api.deactivate_user_account(self.user, notify_user=False)
+        self.assertEqual(cache.get(email_key), {})
@@ -0,0 +1,223 @@
+import mock
+import requests
+
+from django.core.checks import Error
+from django.core.checks.registry import registry
+from django.test import TestCase
+from django.test import override_settings
+
+from common.cache import get_cache
+from common.testing import LOCAL_CACHES
+from openldap.api import user_api
+from openldap.checks import check_shared_caches
+from openldap.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, circuit_breaker, with_circuit_breaker
+)
+from openldap.client import create_session
+from openldap.tests.test_api import OpenLDAPBaseAPITests
+
+
+@override_settings(
+    CACHES=LOCAL_CACHES,
+    OPENLDAP_CIRCUIT_MIN_REQUESTS=4,
+    OPENLDAP_CIRCUIT_FAILURE_RATE=0.5,
+    OPENLDAP_CIRCUIT_RESET_TIMEOUT=30,
+    OPENLDAP_CIRCUIT_MAX_RESET_TIMEOUT=100,
+    OPENLDAP_CIRCUIT_MAX_DEFERRALS=2,
+)
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.breaker = CircuitBreaker('test')
+
+    def expire_reset_timeout(self):
+        """
+        Move the opening of the circuit back past its reset timeout.
+        """
+        cache = get_cache()
+        opening = self.breaker.get_opening()
+        opening['opened_at'] -= self.breaker.reset_timeout(opening['opens'])
+        cache.set(self.breaker.key('opening'), opening, timeout=None)
+
+    def test_opens_at_failure_rate(self):
+        """
+        Ensure the circuit only opens once enough requests have been made
+        and enough of them failed.
+        """
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertGreater(self.breaker.retry_after(), 29)
+
+    def test_half_open_allows_one_probe(self):
+        """
+        Ensure a single probe is allowed once the reset timeout has passed,
+        and that a successful probe closes the circuit.
+        """
+        self.breaker.open(1)
+        self.expire_reset_timeout()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_backs_off(self):
+        """
+        Ensure a failed probe reopens the circuit for twice as long, up to
+        the maximum reset timeout.
+        """
+        self.breaker.open(1)
+        self.expire_reset_timeout()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.get_opening()['opens'], 2)
+        self.assertEqual(self.breaker.reset_timeout(2), 60)
+        self.assertEqual(self.breaker.reset_timeout(3), 100)
+
+    def test_only_probe_failure_backs_off(self):
+        """
+        Ensure failures of requests other than the probe, such as those made
+        before the circuit opened, do not extend the reset timeout.
+        """
+        self.breaker.open(1)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_opening()['opens'], 1)
+
+        self.expire_reset_timeout()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+        self.assertTrue(self.breaker.allow_request())
+        other_thread = CircuitBreaker('test')
+        other_thread.record_failure()
+        self.assertEqual(self.breaker.get_opening()['opens'], 1)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_opening()['opens'], 2)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_opening()['opens'], 2)
+
+    @override_settings(OPENLDAP_MAX_RETRIES=0)
+    @mock.patch('requests.Session.request')
+    def test_session_records_outcomes(self, request_mock):
+        """
+        Ensure connection errors and server errors count as failures, and
+        client errors do not.
+        """
+        session = create_session()
+        request_mock.return_value = mock.Mock(status_code=404)
+        for _ in range(2):
+            session.get('https://example.com/')
+        request_mock.return_value = mock.Mock(status_code=503)
+        session.get('https://example.com/')
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+
+        request_mock.side_effect = requests.ConnectionError()
+        with self.assertRaises(requests.ConnectionError):
+            session.get('https://example.com/')
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+
+    def test_call_fails_fast_outside_worker(self):
+        """
+        Ensure calls are refused while the circuit is open, without calling
+        the wrapped function.
+        """
+        func = mock.Mock()
+        circuit_breaker.open(1)
+        with self.assertRaises(CircuitOpenError):
+            with_circuit_breaker(func)()
+        func.assert_not_called()
+
+    @mock.patch('django_rq.get_queue')
+    @mock.patch('openldap.circuit_breaker.get_current_job')
+    def test_job_is_deferred_in_worker(self, job_mock, queue_mock):
+        """
+        Ensure jobs are enqueued again with backoff while the circuit is
+        open, and run regardless once deferred too many times.
+        """
+        job_mock.return_value = mock.Mock(
+            func_name='openldap.api.user_api.list_users',
+            origin='default',
+            args=(),
+            kwargs={},
+            timeout=180,
+            meta={'circuit_deferrals': 1},
+        )
+        func = mock.Mock()
+        circuit_breaker.open(1)
+
+        self.assertIsNone(with_circuit_breaker(func)())
+        func.assert_not_called()
+        queue_mock.assert_called_once_with('default')
+        enqueue_in = queue_mock.return_value.enqueue_in
+        delay, func_name = enqueue_in.call_args[0]
+        self.assertEqual(func_name, 'openldap.api.user_api.list_users')
+        self.assertGreaterEqual(delay.total_seconds(), 60)
+        self.assertLessEqual(delay.total_seconds(), 90)
+        self.assertEqual(
+            enqueue_in.call_args[1]['meta'], {'circuit_deferrals': 2}
+        )
+
+        job_mock.return_value.meta = {'circuit_deferrals': 2}
+        with_circuit_breaker(func)()
+        func.assert_called_once_with()
+
+
+class CircuitBreakerAPITests(OpenLDAPBaseAPITests):
+
+    @mock.patch('requests.Session.put')
+    def test_open_circuit_leaves_status(self, put_mock):
+        """
+        Ensure a refused call neither reaches OpenLDAP nor resets the user's
+        account status.
+        """
+        circuit_breaker.open(1)
+        with mock.patch.object(
+            self.user.profile, 'reset_account_status'
+        ) as reset_mock:
+            with self.assertRaises(CircuitOpenError):
+                user_api.activate_user_account(self.user, notify_user=False)
+        put_mock.assert_not_called()
+        reset_mock.assert_not_called()
+
+
+class SharedCacheCheckTests(TestCase):
+
+    def test_process_local_caches_are_refused(self):
+        """
+        Ensure a deployment is refused unless the circuit breaker's state
+        and the OpenLDAP lookups are cached in a shared backend.
+        """
+        caches = {
+            alias: {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': 'redis://localhost:6379/1',
+            } for alias in ('default', 'shared', 'openldap')
+        }
+        with override_settings(CACHES=caches, SHARED_CACHE='shared'):
+            self.assertEqual(check_shared_caches(None), [])
+        with override_settings(CACHES=LOCAL_CACHES, SHARED_CACHE='shared'):
+            errors = check_shared_caches(None)
+        self.assertEqual(len(errors), 2)
+        for error in errors:
+            self.assertIsInstance(error, Error)
+            self.assertEqual(error.id, 'openldap.E001')
+
+    def test_only_run_on_deployment(self):
+        """
+        Ensure the check does not stop tests, migrations and other commands
+        run with process-local caches.
+        """
+        self.assertNotIn(check_shared_caches, registry.get_checks())
+        self.assertIn(
+            check_shared_caches,
+            registry.get_checks(include_deployment_checks=True)
+        )
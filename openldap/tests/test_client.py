@@ -0,0 +1,46 @@
+import mock
+
+from django.test import TestCase
+from django.test import override_settings
+
+from openldap import client
+
+
+class OpenLDAPClientTests(TestCase):
+
+    def setUp(self):
+        client._sessions.clear()
+
+    def tearDown(self):
+        client._sessions.clear()
+
+    def test_session_is_reused(self):
+        """
+        Ensure repeated calls within a process share one session.
+        """
+        self.assertIs(client.get_session(), client.get_session())
+
+    def test_session_is_not_shared_after_fork(self):
+        """
+        Ensure a forked process creates its own session.
+        """
+        session = client.get_session()
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertIsNot(client.get_session(), session)
+
+    @override_settings(
+        OPENLDAP_POOL_SIZE=4,
+        OPENLDAP_MAX_RETRIES=2,
+        OPENLDAP_RETRY_BACKOFF=0.1,
+    )
+    def test_session_adapter_settings(self):
+        """
+        Ensure the connection pool and retries are configured from settings.
+        """
+        session = client.get_session()
+        adapter = session.get_adapter('https://example.com/')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertEqual(adapter.max_retries.backoff_factor, 0.1)
+        self.assertIn(504, adapter.max_retries.status_forcelist)
+        self.assertEqual(session.headers['Connection'], 'keep-alive')
@@ -0,0 +1,242 @@
+import pickle
+
+import mock
+
+from django.conf import settings
+
+from common.jobs import hand_over
+from common.util import email_user_async
+from openldap import jobs
+from openldap.api import project_membership_api, user_api
+from openldap.tests.test_api import OpenLDAPBaseAPITests
+from project.models import ProjectUserMembership
+from project.notifications import project_created_notification
+from users.models import Profile
+from users.notifications import user_created_notification
+from users.openldap import update_openldap_user
+
+
+class OpenLDAPJobTests(OpenLDAPBaseAPITests):
+
+    fixtures = OpenLDAPBaseAPITests.fixtures + [
+        'funding/fixtures/tests/funding_bodies.json',
+        'funding/fixtures/tests/attributions.json',
+        'project/fixtures/tests/categories.json',
+        'project/fixtures/tests/projects.json',
+        'project/fixtures/tests/memberships.json',
+    ]
+
+    @mock.patch('openldap.jobs.activate_user_account.delay')
+    def test_jobs_are_queued_with_primary_keys(self, delay_mock):
+        """
+        Ensure jobs are queued with a primary key rather than an instance.
+        """
+        profile = self.user.profile
+        profile.account_status = Profile.APPROVED
+        update_openldap_user(profile)
+        delay_mock.assert_called_once_with(user_id=self.user.id)
+        self.assertLess(
+            len(pickle.dumps(delay_mock.call_args)),
+            len(pickle.dumps(self.user)),
+        )
+
+    @mock.patch('openldap.api.user_api.activate_user_account')
+    def test_job_loads_current_instance(self, activate_mock):
+        """
+        Ensure a job runs with the current state of its objects, loading
+        them from an instance for jobs queued before primary keys were used.
+        """
+        stale_user = self.user
+        Profile.objects.filter(user=self.user).update(phone='01234 567890')
+
+        for argument in (self.user.id, stale_user):
+            activate_mock.reset_mock()
+            jobs.activate_user_account(argument, notify_user=False)
+            user = activate_mock.call_args[0][0]
+            self.assertIsNot(user, stale_user)
+            self.assertEqual(user.profile.phone, '01234 567890')
+            self.assertEqual(
+                activate_mock.call_args[1], {'notify_user': False}
+            )
+
+    @mock.patch('openldap.api.project_membership_api.create_project_memberships')
+    def test_create_project_memberships(self, create_mock):
+        """
+        Ensure only memberships of the given project which are still
+        authorised are loaded.
+        """
+        ProjectUserMembership.objects.filter(id=2).update(
+            status=ProjectUserMembership.AUTHORISED
+        )
+        jobs.create_project_memberships(1, [1, 2, 3], notify_user=False)
+        project, memberships = create_mock.call_args[0]
+        self.assertEqual(project.id, 1)
+        self.assertEqual(sorted(m.id for m in memberships), [1, 2])
+
+        ProjectUserMembership.objects.filter(id=2).update(
+            status=ProjectUserMembership.REVOKED
+        )
+        jobs.create_project_memberships(1, [1, 2, 3], notify_user=False)
+        project, memberships = create_mock.call_args[0]
+        self.assertEqual([m.id for m in memberships], [1])
+
+    @mock.patch('openldap.api.project_membership_api.delete_project_membership')
+    def test_delete_project_membership(self, delete_mock):
+        jobs.delete_project_membership(3)
+        membership = delete_mock.call_args[0][0]
+        self.assertEqual(membership, ProjectUserMembership.objects.get(id=3))
+        self.assertEqual(delete_mock.call_args[1], {'notify_user': True})
+
+
+    @mock.patch('openldap.api.project_membership_api.delete_project_memberships')
+    def test_delete_project_memberships(self, delete_mock):
+        """
+        Ensure memberships authorised again since the job was queued are
+        not deleted.
+        """
+        jobs.delete_project_memberships(1, [1, 2, 3])
+        project, memberships = delete_mock.call_args[0]
+        self.assertEqual(project.id, 1)
+        self.assertEqual([m.id for m in memberships], [2])
+
+
+class FakeRedis:
+    """
+    The subset of a Redis connection used to coalesce jobs.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def getset(self, key, value):
+        previous = self.get(key)
+        self.set(key, value)
+        return previous
+
+    def expire(self, key, seconds):
+        pass
+
+
+class OpenLDAPJobCoalescingTests(OpenLDAPBaseAPITests):
+
+    def setUp(self):
+        super(OpenLDAPJobCoalescingTests, self).setUp()
+        self.connection = FakeRedis()
+        patcher = mock.patch('common.jobs.get_queue')
+        patcher.start().return_value.connection = self.connection
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('common.jobs.Job.fetch')
+    @mock.patch('rq.queue.Queue.enqueue_call')
+    def test_newer_job_supersedes_queued_job(self, enqueue_mock, fetch_mock):
+        """
+        Ensure queueing a job for a user removes the job of the same kind
+        still queued for them, and that the newer job is the one remembered.
+        """
+        jobs.activate_user_account.delay(user_id=self.user.id)
+        first_id = enqueue_mock.call_args[1]['job_id']
+        fetch_mock.assert_not_called()
+
+        fetch_mock.return_value.get_status.return_value = 'queued'
+        jobs.activate_user_account.delay(user_id=self.user.id)
+        second_id = enqueue_mock.call_args[1]['job_id']
+
+        fetch_mock.assert_called_once_with(
+            first_id, connection=self.connection
+        )
+        fetch_mock.return_value.delete.assert_called_once_with()
+        key = jobs.activate_user_account.coalesce_key(
+            (self.user.id, ), {}
+        )
+        self.assertEqual(self.connection.get(key), second_id.encode())
+
+    @mock.patch('common.jobs.Job.fetch')
+    @mock.patch('rq.queue.Queue.enqueue_call')
+    def test_jobs_of_other_kinds_are_kept(self, enqueue_mock, fetch_mock):
+        """
+        Ensure a queued job is not removed by a later job of another kind for
+        the same object, such as a deactivation after a create.
+        """
+        fetch_mock.return_value.get_status.return_value = 'queued'
+        jobs.create_user.delay(user_id=self.user.id)
+        jobs.deactivate_user_account.delay(user_id=self.user.id)
+        jobs.activate_user_account.delay(user_id=self.user.id)
+        jobs.create_project_membership.delay(project_membership_id=1)
+        jobs.delete_project_membership.delay(project_membership_id=1)
+        self.assertEqual(enqueue_mock.call_count, 5)
+        fetch_mock.assert_not_called()
+
+    @mock.patch('common.jobs.Job.fetch')
+    @mock.patch('rq.queue.Queue.enqueue_call')
+    def test_started_job_is_not_removed(self, enqueue_mock, fetch_mock):
+        jobs.activate_user_account.delay(user_id=self.user.id)
+        fetch_mock.return_value.get_status.return_value = 'started'
+        jobs.activate_user_account.delay(user_id=self.user.id)
+        fetch_mock.return_value.delete.assert_not_called()
+
+    @mock.patch('openldap.api.user_api.activate_user_account')
+    @mock.patch('common.jobs.get_current_job')
+    def test_superseded_job_is_skipped(self, job_mock, activate_mock):
+        """
+        Ensure a job taken by a worker after a newer job was queued for the
+        same object does nothing.
+        """
+        key = jobs.activate_user_account.coalesce_key((self.user.id, ), {})
+        job_mock.return_value = mock.Mock(id='old', connection=self.connection)
+        self.connection.set(key, 'new')
+        self.assertIsNone(jobs.activate_user_account(self.user.id))
+        activate_mock.assert_not_called()
+
+        job_mock.return_value.id = 'new'
+        jobs.activate_user_account(self.user.id)
+        activate_mock.assert_called_once()
+
+    def test_deferred_job_takes_over(self):
+        """
+        Ensure a job deferred by the circuit breaker is not skipped as
+        superseded by the job it replaces.
+        """
+        current_job = mock.Mock(
+            id='old',
+            func=jobs.activate_user_account,
+            args=(self.user.id, ),
+            kwargs={},
+            connection=self.connection,
+        )
+        key = jobs.activate_user_account.coalesce_key((self.user.id, ), {})
+        self.connection.set(key, 'old')
+        hand_over(current_job, 'deferred')
+        self.assertEqual(self.connection.get(key), b'deferred')
+
+
+class QueueRoutingTests(OpenLDAPBaseAPITests):
+
+    @mock.patch('rq.queue.Queue.enqueue_call', autospec=True)
+    def test_jobs_are_routed_to_queues(self, enqueue_mock):
+        """
+        Ensure interactive changes, bulk operations and emails are queued
+        separately.
+        """
+        routes = [
+            (jobs.reset_user_password, 'interactive'),
+            (jobs.create_project_memberships, 'ldap-bulk'),
+            (jobs.delete_project_memberships, 'ldap-bulk'),
+            (user_api.list_users, 'ldap-bulk'),
+            (project_membership_api.create_project_membership, 'interactive'),
+            (email_user_async, 'email'),
+            (project_created_notification, 'email'),
+            (user_created_notification, 'email'),
+        ]
+        for func, queue in routes:
+            func.delay()
+            self.assertEqual(enqueue_mock.call_args[0][0].name, queue)
+            self.assertIn(queue, settings.RQ_QUEUE_PRIORITY)
+        self.assertEqual(
+            set(settings.RQ_QUEUES), set(settings.RQ_QUEUE_PRIORITY)
+        )
@@ -65,7 +65,7 @@ class OpenLDAPProjectAPITests(OpenLDAPBaseAPITests):
         except Exception as e:
             print(e)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_list_projects_query(self, get_mock):
         """
         List a list of all projects.
@@ -95,7 +95,7 @@ class OpenLDAPProjectAPITests(OpenLDAPBaseAPITests):
         result = project_api.list_projects()
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_project_query(self, get_mock):
         """
         Get an existing OpenLDAP project.
@@ -135,7 +135,7 @@ class OpenLDAPProjectAPITests(OpenLDAPBaseAPITests):
         self.assertEqual(result, expected_response)
 
     @skip("Pending implementation")
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_create_project_query(self, post_mock):
         """
         Create an OpenLDAP Project.
@@ -143,7 +143,7 @@ class OpenLDAPProjectAPITests(OpenLDAPBaseAPITests):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.put')
+    @mock.patch('requests.Session.put')
     def test_activate_project_query(self, mock_get):
         """
         Activate an existing OpenLDAP project.
@@ -151,7 +151,7 @@ class OpenLDAPProjectAPITests(OpenLDAPBaseAPITests):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.delete')
     def test_deactivate_project_query(self, mock_get):
         """
         Deactivate an existing OpenLDAP project.
@@ -5,10 +5,15 @@ import requests
 from unittest import skip
 
 from django.conf import settings
+from django.core import mail
+from django.core.mail.backends import locmem
 from django.test import TestCase
 
-from openldap.api import project_api
+from openldap.api import project_api, project_membership_api
 from openldap.tests.test_api import OpenLDAPBaseAPITests
+from project.models import Project, ProjectUserMembership
+from project.openldap import activate_existing_users
+from security.json_web_token import JSONWebToken
 
 
 class OpenLDAPProjectMembershipAPITests(OpenLDAPBaseAPITests):
@@ -32,7 +37,7 @@ class OpenLDAPProjectMembershipAPITests(OpenLDAPBaseAPITests):
         )
 
     @skip("Pending implementation")
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_create_project_membership_query(self, mock_get):
         """
         Create a project membership.
@@ -40,7 +45,7 @@ class OpenLDAPProjectMembershipAPITests(OpenLDAPBaseAPITests):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.put')
+    @mock.patch('requests.Session.put')
     def test_update_project_membership_query(self, mock_get):
         """
         Update an existing project membership.
@@ -48,9 +53,164 @@ class OpenLDAPProjectMembershipAPITests(OpenLDAPBaseAPITests):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.delete')
     def test_delete_project_membership_query(self, mock_get):
         """
         Delete a project membership.
         """
         pass
+
+
+class OpenLDAPProjectMembershipBatchAPITests(OpenLDAPBaseAPITests):
+
+    fixtures = OpenLDAPBaseAPITests.fixtures + [
+        'funding/fixtures/tests/funding_bodies.json',
+        'funding/fixtures/tests/attributions.json',
+        'project/fixtures/tests/categories.json',
+        'project/fixtures/tests/projects.json',
+        'project/fixtures/tests/memberships.json',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.get(pk=1)
+        self.memberships = list(
+            ProjectUserMembership.objects.filter(project=self.project)
+        )
+        for membership in self.memberships:
+            membership.previous_status = membership.status
+            membership.status = ProjectUserMembership.AUTHORISED
+            membership.save()
+
+    def mock_create_project_memberships_response(self):
+        payload = {
+            'iss': settings.OPENLDAP_JWT_ISSUER,
+            'aud': settings.OPENLDAP_JWT_AUDIENCE,
+            'iat': 1527100141,
+            'nbf': 1527099541,
+            'data': {
+                'count': 1,
+                'error': '',
+                'project': self.project.code,
+                'user_dn': {'memberUid': 'e.shibboleth.user'},
+            },
+        }
+        jwt = JSONWebToken.encode(payload, settings.OPENLDAP_JWT_KEY)
+        return OpenLDAPBaseAPITests.mock_response(status=201, content=jwt)
+
+    @mock.patch('requests.Session.post')
+    def test_create_project_memberships(self, post_mock):
+        """
+        Create several project memberships, notifying the users with a
+        single batch of emails.
+        """
+        post_mock.return_value = self.mock_create_project_memberships_response()
+        with mock.patch.object(
+            locmem.EmailBackend,
+            'send_messages',
+            autospec=True,
+            side_effect=locmem.EmailBackend.send_messages,
+        ) as send_messages_mock:
+            responses = project_membership_api.create_project_memberships(
+                project=self.project,
+                project_memberships=self.memberships,
+            )
+
+        self.assertEqual(
+            set(responses), {membership.id for membership in self.memberships}
+        )
+        self.assertEqual(post_mock.call_count, len(self.memberships))
+        call_urls = {call_args[0] for call_args, _ in post_mock.call_args_list}
+        self.assertEqual(call_urls, {
+            'https://example.com/project/member/{code}/'.format(code=self.project.code)
+        })
+        send_messages_mock.assert_called_once()
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            sorted(membership.user.email for membership in self.memberships)
+        )
+
+    @mock.patch('requests.Session.post')
+    def test_create_project_memberships_with_failure(self, post_mock):
+        """
+        Ensure failed memberships are reset and reported, while the others
+        are still created.
+        """
+        failed_membership = self.memberships[0]
+
+        def post(url, headers=None, data=None, timeout=None):
+            if data['email'] == failed_membership.user.email:
+                return OpenLDAPBaseAPITests.mock_response(
+                    status=500,
+                    raise_for_status=requests.exceptions.HTTPError('Internal Server Error.'),
+                )
+            return self.mock_create_project_memberships_response()
+
+        post_mock.side_effect = post
+        with self.assertRaises(ValueError) as context:
+            project_membership_api.create_project_memberships(
+                project=self.project,
+                project_memberships=self.memberships,
+            )
+
+        self.assertIn(failed_membership.user.email, str(context.exception))
+        failed_membership.refresh_from_db()
+        self.assertEqual(
+            failed_membership.status, failed_membership.previous_status
+        )
+        self.assertEqual(len(mail.outbox), len(self.memberships) - 1)
+
+    @mock.patch('requests.Session.delete')
+    def test_delete_project_memberships(self, delete_mock):
+        """
+        Delete several project memberships without notifying the users or
+        changing the memberships in Cogs, even if some fail.
+        """
+        failed_membership = self.memberships[0]
+
+        def delete(url, headers=None, timeout=None):
+            if failed_membership.user.email in url:
+                return OpenLDAPBaseAPITests.mock_response(
+                    status=500,
+                    raise_for_status=requests.exceptions.HTTPError('Internal Server Error.'),
+                )
+            return self.mock_create_project_memberships_response()
+
+        delete_mock.side_effect = delete
+        with self.assertRaises(ValueError) as context:
+            project_membership_api.delete_project_memberships(
+                project=self.project,
+                project_memberships=self.memberships,
+            )
+
+        self.assertIn(failed_membership.user.email, str(context.exception))
+        self.assertEqual(delete_mock.call_count, len(self.memberships))
+        call_urls = {call_args[0] for call_args, _ in delete_mock.call_args_list}
+        self.assertEqual(call_urls, {
+            'https://example.com/project/member/{code}/{email}/'.format(
+                code=self.project.code,
+                email=membership.user.email,
+            ) for membership in self.memberships
+        })
+        for membership in self.memberships:
+            membership.refresh_from_db()
+            self.assertEqual(
+                membership.status, ProjectUserMembership.AUTHORISED
+            )
+        self.assertEqual(len(mail.outbox), 0)
+
+    @mock.patch('openldap.jobs.create_project_memberships')
+    def test_activate_existing_users(self, create_mock):
+        """
+        Ensure all authorised memberships of a project are activated in one
+        job.
+        """
+        activate_existing_users(self.project)
+
+        create_mock.delay.assert_called_once()
+        _, call_kwargs = create_mock.delay.call_args
+        self.assertEqual(call_kwargs['project_id'], self.project.id)
+        self.assertEqual(
+            set(call_kwargs['project_membership_ids']),
+            {membership.id for membership in self.memberships}
+        )
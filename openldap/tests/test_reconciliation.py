@@ -0,0 +1,233 @@
+import mock
+
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+
+from openldap.api.async_api import AsyncOpenLDAPClient
+from openldap.reconciliation import (
+    DirectoryState, apply_reconciliation, fetch_cogs_state,
+    fetch_directory_state, reconcile
+)
+from openldap.tests.test_api import OpenLDAPBaseAPITests
+from openldap.tests.test_async_api import FakeResponse
+from project.models import ProjectUserMembership
+from security.json_web_token import JSONWebToken
+
+
+class OpenLDAPReconciliationTests(OpenLDAPBaseAPITests):
+
+    fixtures = OpenLDAPBaseAPITests.fixtures + [
+        'funding/fixtures/tests/funding_bodies.json',
+        'funding/fixtures/tests/attributions.json',
+        'project/fixtures/tests/categories.json',
+        'project/fixtures/tests/projects.json',
+        'project/fixtures/tests/memberships.json',
+    ]
+
+    def setUp(self):
+        super(OpenLDAPReconciliationTests, self).setUp()
+        self.directory = DirectoryState(
+            users={'e.shibboleth.user', 'e.unknown.user'},
+            projects={'scw0000', 'scw0001', 'scw9999'},
+            memberships={
+                'scw0000': {'e.project.member', 'e.unknown.user'},
+                'scw0001': set(),
+                'scw9999': {'e.shibboleth.user'},
+            },
+            errors={},
+        )
+
+    @staticmethod
+    def listing(values):
+        data = {str(index): value for index, value in enumerate(values)}
+        data.update({'count': len(values), 'error': ''})
+        return {'data': data}
+
+    def test_fetch_directory_state(self):
+        """
+        Ensure the users, projects and memberships in OpenLDAP are fetched
+        and indexed by lower case user ids and project codes.
+        """
+        members = {
+            'SCW0000': {
+                'data': {
+                    '0': {
+                        'member': {
+                            '0': 'e.shibboleth.user',
+                            'count': 1
+                        }
+                    },
+                    'count': 1,
+                    'error': '',
+                }
+            },
+        }
+
+        async def list_users(client):
+            return self.listing(['e.shibboleth.user'])
+
+        async def list_projects(client):
+            return self.listing(['SCW0000', 'SCW0001'])
+
+        async def list_project_memberships(client, project_code):
+            if project_code.upper() not in members:
+                raise ValueError('Not found')
+            return members[project_code.upper()]
+
+        with mock.patch.object(
+            AsyncOpenLDAPClient, 'list_users', list_users
+        ), mock.patch.object(
+            AsyncOpenLDAPClient, 'list_projects', list_projects
+        ), mock.patch.object(
+            AsyncOpenLDAPClient, 'list_project_memberships',
+            list_project_memberships
+        ):
+            directory = fetch_directory_state(max_workers=2)
+
+        self.assertEqual(directory.users, {'e.shibboleth.user'})
+        self.assertEqual(directory.projects, {'scw0000', 'scw0001'})
+        self.assertEqual(
+            directory.memberships, {'scw0000': {'e.shibboleth.user'}}
+        )
+        self.assertEqual(list(directory.errors), ['scw0001'])
+
+    @mock.patch('aiohttp.ClientSession.request')
+    def test_fetch_directory_state_validates_listings(self, request_mock):
+        """
+        Ensure listings from the OpenLDAP API, including projects with
+        several members, are decoded and validated by the API functions.
+        """
+        listings = {
+            'user/': self.listing(['e.shibboleth.user', 'e.project.member']),
+            'project/': self.listing(['SCW0000', 'SCW0001']),
+            'project/member/scw0000/': {
+                'data': {
+                    '0': {
+                        'member': {
+                            '0': 'e.shibboleth.user',
+                            '1': 'e.project.member',
+                            'count': 2
+                        }
+                    },
+                    'count': 1,
+                    'error': '',
+                }
+            },
+            'project/member/scw0001/': {
+                'data': {
+                    'count': 0,
+                    'error': 'Project not found',
+                }
+            },
+        }
+
+        def request(method, url, headers=None, data=None):
+            payload = {
+                'iss': settings.OPENLDAP_JWT_ISSUER,
+                'aud': settings.OPENLDAP_JWT_AUDIENCE,
+                'iat': 1527100141,
+                'nbf': 1527099541,
+                'data': listings[url[len(settings.OPENLDAP_HOST):]]['data'],
+            }
+            jwt = JSONWebToken.encode(payload, settings.OPENLDAP_JWT_KEY)
+            return FakeResponse(200, jwt)
+
+        request_mock.side_effect = request
+        directory = fetch_directory_state(max_workers=2)
+
+        self.assertEqual(
+            directory.users, {'e.shibboleth.user', 'e.project.member'}
+        )
+        self.assertEqual(
+            directory.memberships, {
+                'scw0000': {'e.shibboleth.user', 'e.project.member'},
+            }
+        )
+        self.assertEqual(list(directory.errors), ['scw0001'])
+        self.assertIn('Project not found', directory.errors['scw0001'])
+
+    def test_reconcile(self):
+        """
+        Ensure the differences between OpenLDAP and Cogs are found.
+        """
+        reconciliation = reconcile(self.directory, fetch_cogs_state())
+
+        self.assertIn('e.norman.gordon', reconciliation.users_missing)
+        self.assertEqual(reconciliation.users_unknown, ['e.unknown.user'])
+        self.assertEqual(reconciliation.projects_unknown, ['scw9999'])
+        self.assertEqual(
+            reconciliation.projects_without_gid_number,
+            ['scw0000', 'scw0001'],
+        )
+        self.assertEqual(
+            [m.id for m in reconciliation.memberships_to_create], [1, 3]
+        )
+        self.assertEqual(
+            [m.id for m in reconciliation.memberships_to_delete], [2]
+        )
+        self.assertEqual(
+            reconciliation.memberships_unknown, [
+                ('scw0000', 'e.unknown.user'),
+                ('scw9999', 'e.shibboleth.user'),
+            ]
+        )
+        self.assertEqual(
+            sorted(m.id for m in reconciliation.memberships_in_ldap_changed),
+            [1, 3]
+        )
+
+    def test_reconcile_skips_projects_with_errors(self):
+        """
+        Ensure memberships of projects which could not be listed are left
+        alone.
+        """
+        directory = self.directory._replace(
+            memberships={'scw0000': self.directory.memberships['scw0000']},
+            errors={'scw0001': 'Not found'},
+        )
+        reconciliation = reconcile(directory, fetch_cogs_state())
+        self.assertEqual(
+            [m.id for m in reconciliation.memberships_to_create], [1]
+        )
+        self.assertEqual(
+            [m.id for m in reconciliation.memberships_in_ldap_changed], [1]
+        )
+
+    @mock.patch('openldap.jobs.delete_project_memberships.delay')
+    @mock.patch('openldap.jobs.create_project_memberships.delay')
+    def test_apply_reconciliation(self, create_mock, delete_mock):
+        """
+        Ensure in_ldap flags are corrected and one job per project is
+        enqueued to create and to delete memberships without notifying users.
+        """
+        apply_reconciliation(reconcile(self.directory, fetch_cogs_state()))
+
+        self.assertFalse(ProjectUserMembership.objects.get(id=1).in_ldap)
+        self.assertTrue(ProjectUserMembership.objects.get(id=2).in_ldap)
+        self.assertFalse(ProjectUserMembership.objects.get(id=3).in_ldap)
+
+        created = {
+            call[1]['project_id']: call[1]['project_membership_ids']
+            for call in create_mock.call_args_list
+        }
+        self.assertEqual(created, {1: [1], 2: [3]})
+        for call in create_mock.call_args_list:
+            self.assertFalse(call[1]['notify_user'])
+
+        delete_mock.assert_called_once_with(
+            project_id=1, project_membership_ids=[2]
+        )
+
+    @mock.patch('openldap.management.commands.reconcile_openldap.'
+                'apply_reconciliation')
+    @mock.patch('openldap.management.commands.reconcile_openldap.'
+                'fetch_directory_state')
+    def test_command(self, fetch_mock, apply_mock):
+        fetch_mock.return_value = self.directory
+        out = StringIO()
+        call_command('reconcile_openldap', details=True, stdout=out)
+        self.assertIn('memberships_to_delete: 1', out.getvalue())
+        self.assertIn("('scw9999', 'e.shibboleth.user')", out.getvalue())
+        apply_mock.assert_not_called()
@@ -46,7 +46,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         """
         return OpenLDAPBaseAPITests.mock_response(status=204, content='')
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_list_users_query(self, get_mock):
         """
         Retrieve a list of all users.
@@ -75,7 +75,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         result = user_api.list_users()
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_create_user_query(self, post_mock):
         """
         Create a User.
@@ -127,7 +127,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         self.assertEqual("5000001", self.user.profile.uid_number)
         self.assertEqual("e.joe.bloggs", self.user.profile.scw_username)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_user_by_id_query(self, get_mock):
         """
         Get an existing user by id.
@@ -182,7 +182,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         result = user_api.get_user_by_id(user_id='e.joe.bloggs')
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_user_by_email_address_query(self, get_mock):
         """
         Get an existing user by email address.
@@ -240,7 +240,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         self.assertEqual(result, expected_response)
 
     @skip("Pending OpenLDAP fix")
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.delete')
     def test_deactivate_user_account_query(self, delete_mock):
         """
         Deactivate an existing user's OpenDLAP account
@@ -269,7 +269,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         result = user_api.deactivate_user_account(user=self.user)
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_reset_user_password_query(self, post_mock):
         """
         Reset a user's password.
@@ -296,7 +296,7 @@ class OpenLDAPUserAPITests(OpenLDAPBaseAPITests):
         result = user_api.reset_user_password(user=self.user, password=12345678)
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.put')
+    @mock.patch('requests.Session.put')
     def test_activate_user_account_query(self, put_mock):
         """
         Activate an existing user's OpenLDAP account.
@@ -14,7 +14,7 @@ from openldap.tests.test_api import OpenLDAPBaseAPITests
 class OpenLDAPUserSystemAllocationAPITests(OpenLDAPBaseAPITests):
 
     @skip("Pending implementation")
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_system_allocation_query(self, mock_get):
         """
         Get a system allocation.
@@ -22,7 +22,7 @@ class OpenLDAPUserSystemAllocationAPITests(OpenLDAPBaseAPITests):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.put')
+    @mock.patch('requests.Session.put')
     def test_update_system_allocation_query(self, mock_get):
         """
         Update a system allocation.
@@ -30,7 +30,7 @@ class OpenLDAPUserSystemAllocationAPITests(OpenLDAPBaseAPITests):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.delete')
+    @mock.patch('requests.Session.delete')
     def test_delete_system_allocation_query(self, mock_get):
         """
         Delete a system allocation.
@@ -0,0 +1,76 @@
+import importlib
+import pkgutil
+from io import StringIO
+
+import jsonschema
+from django.core.management import call_command
+from django.test import TestCase
+
+import openldap.schemas
+from openldap.management.commands.benchmark_openldap_responses import (
+    JWT_SETTINGS, make_response
+)
+from openldap.schemas.user.list_users import list_users_validator
+from openldap.util import decode_response, get_jwt_options
+
+
+class OpenLDAPResponseDecodingTests(TestCase):
+
+    def test_every_schema_is_compiled(self):
+        """
+        Ensure each schema module provides a validator compiled from its
+        schema.
+        """
+        for package in pkgutil.iter_modules(openldap.schemas.__path__):
+            package = importlib.import_module(
+                'openldap.schemas.' + package.name
+            )
+            for module in pkgutil.iter_modules(package.__path__):
+                module = importlib.import_module(
+                    package.__name__ + '.' + module.name
+                )
+                name = module.__name__.rsplit('.', 1)[1]
+                validator = getattr(module, name + '_validator')
+                self.assertIs(
+                    validator.schema, getattr(module, name + '_json')
+                )
+
+    def test_decode_response_with_validator(self):
+        """
+        Ensure a response is decoded and validated against the validator.
+        """
+        with self.settings(**JWT_SETTINGS):
+            valid = make_response(
+                {'0': 'e.joe.bloggs', 'count': 1, 'error': ''}
+            )
+            self.assertEqual(
+                decode_response(valid, list_users_validator)['data']['count'],
+                1
+            )
+
+            invalid = make_response({'0': 'e.joe.bloggs'})
+            self.assertEqual(
+                decode_response(invalid)['data'], {'0': 'e.joe.bloggs'}
+            )
+            with self.assertRaises(jsonschema.exceptions.ValidationError):
+                decode_response(invalid, list_users_validator)
+
+    def test_jwt_options_are_reused(self):
+        """
+        Ensure the JWT options are only built once for the same settings.
+        """
+        self.assertIs(
+            get_jwt_options('key', 'audience', 'HS256'),
+            get_jwt_options('key', 'audience', 'HS256'),
+        )
+        self.assertEqual(
+            get_jwt_options('key', 'audience', 'HS256')['key'], b'key'
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            'benchmark_openldap_responses', number=5, users=10, stdout=out
+        )
+        self.assertIn('get_user', out.getvalue())
+        self.assertIn('list_users', out.getvalue())
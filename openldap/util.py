@@ -1,15 +1,53 @@
+from functools import lru_cache
+
+import jsonschema
 from django.conf import settings
 
 from security.json_web_token import JSONWebToken
 
 
-def decode_response(response):
-    return JSONWebToken.decode(
-        data=response.content.strip(),
-        key=settings.OPENLDAP_JWT_KEY,
-        audience=settings.OPENLDAP_JWT_AUDIENCE,
-        algorithms=[settings.OPENLDAP_JWT_ALGORITHM],
+@lru_cache(maxsize=8)
+def get_jwt_options(key, audience, algorithm):
+    """
+    Get the options for decoding OpenLDAP API responses, built once for each
+    combination of settings rather than for every response.
+    """
+    if isinstance(key, str):
+        key = key.encode()
+    return {
+        'key': key,
+        'audience': audience,
+        'algorithms': [algorithm],
+    }
+
+
+def decode_response(response, validator=None):
+    """
+    Decode an OpenLDAP API response, and validate it with a validator
+    compiled by `openldap.schemas.compile_schema`, if given.
+    """
+    return decode_content(response.content, validator)
+
+
+def decode_content(content, validator=None):
+    """
+    Decode the body of an OpenLDAP API response, as for `decode_response`.
+    """
+    payload = JSONWebToken.decode(
+        data=content.strip(),
+        **get_jwt_options(
+            settings.OPENLDAP_JWT_KEY,
+            settings.OPENLDAP_JWT_AUDIENCE,
+            settings.OPENLDAP_JWT_ALGORITHM,
+        )
     )
+    if validator is not None:
+        error = jsonschema.exceptions.best_match(
+            validator.iter_errors(payload)
+        )
+        if error is not None:
+            raise error
+    return payload
 
 
 def verify_payload_data(payload, data, mapping):
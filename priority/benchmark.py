@@ -0,0 +1,236 @@
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from funding.models import Attribution, FundingSource, Publication
+from institution.models import Institution
+from project.models import Project
+from users.models import CustomUser, Profile, ShibbolethProfile
+
+# prefix for the Slurm accounts and project codes of synthetic data, chosen
+# so as not to clash with real project codes
+ACCOUNT_PREFIX = 'bench'
+
+SACCT_COLUMNS = [
+    'JobID', 'JobName', 'CPUTimeRAW', 'TotalCPU', 'Account', 'Partition'
+]
+PARTITIONS = np.array(['compute', 'highmem', 'gpu', 'xgpu'])
+PARTITION_WEIGHTS = [0.8, 0.08, 0.1, 0.02]
+STEP_SUFFIXES = np.array(['', '.batch', '.extern', '.0'])
+STEP_NAMES = np.array(['job', 'batch', 'extern', 'step'])
+
+
+def account_name(index):
+    return '{}{:06d}'.format(ACCOUNT_PREFIX, index)
+
+
+def generate_sacct_dump(
+    filename,
+    rows,
+    accounts=1000,
+    root_fraction=0.01,
+    seed=0,
+    block_rows=1000000,
+):
+    '''
+    Writes a synthetic pipe-delimited `sacct` dump of `rows` rows to
+    `filename`. Each job is followed by one to three job steps, with no
+    partition, as in real dumps. A fraction `root_fraction` of jobs belong
+    to the `root` account; the rest are spread unevenly over `accounts`
+    accounts, and across CPU and GPU partitions.
+    '''
+    rng = np.random.default_rng(seed)
+    account_names = np.array([account_name(index) for index in range(accounts)])
+    next_job_id = 1
+    rows_written = 0
+    with open(filename, 'w') as dump:
+        dump.write('|'.join(SACCT_COLUMNS) + '\n')
+        while rows_written < rows:
+            # Each job takes 3 rows on average
+            jobs = max(1, min(block_rows, rows - rows_written) // 3 + 1)
+            job_ids = np.arange(next_job_id, next_job_id + jobs)
+            next_job_id += jobs
+
+            job_accounts = account_names[np.minimum(
+                rng.zipf(1.5, size=jobs) - 1, accounts - 1
+            )].astype(object)
+            job_accounts[rng.random(jobs) < root_fraction] = 'root'
+            job_partitions = rng.choice(
+                PARTITIONS, size=jobs, p=PARTITION_WEIGHTS
+            )
+            job_cpu_time = rng.lognormal(10, 2, size=jobs).astype('int64')
+
+            rows_per_job = 1 + rng.integers(1, 4, size=jobs)
+            job_index = np.repeat(np.arange(jobs), rows_per_job)
+            step = np.arange(len(job_index)) - np.repeat(
+                np.cumsum(rows_per_job) - rows_per_job, rows_per_job
+            )
+
+            block = pd.DataFrame({
+                'JobID':
+                    job_ids[job_index].astype(str).astype(object) +
+                    STEP_SUFFIXES[step],
+                'JobName': STEP_NAMES[step],
+                'CPUTimeRAW': job_cpu_time[job_index],
+                'TotalCPU': '00:00:00',
+                'Account': job_accounts[job_index],
+                'Partition': np.where(
+                    step == 0, job_partitions[job_index], ''
+                ),
+            })[:rows - rows_written]
+            block.to_csv(dump, sep='|', header=False, index=False)
+            rows_written += len(block)
+
+
+def create_benchmark_projects(projects, attributions_per_project=3, seed=0):
+    '''
+    Creates `projects` projects with codes matching the accounts of
+    `generate_sacct_dump`, each with up to `attributions_per_project`
+    funding sources and publications, led by users of a new institution.
+    Model `save()` methods are bypassed, so that no notifications are sent
+    and no LDAP calls are made; this should be run inside a transaction
+    that is rolled back afterwards.
+    '''
+    rng = np.random.default_rng(seed)
+    institution = Institution.objects.create(
+        name='Benchmark University',
+        base_domain='benchmark.example.ac.uk',
+        needs_funding_approval=True,
+        AP_base=50000,
+        AP_per_publication=10000,
+        AP_per_CPU_hour=1,
+        AP_per_GPU_hour=10,
+    )
+
+    # One tech lead for every five projects
+    emails = [
+        'user{}@{}'.format(index, institution.base_domain)
+        for index in range(max(1, projects // 5))
+    ]
+    CustomUser.objects.bulk_create(
+        CustomUser(email=email, username=email) for email in emails
+    )
+    users = list(CustomUser.objects.filter(email__in=emails).order_by('id'))
+    Profile.objects.bulk_create(Profile(user=user) for user in users)
+    for profile in Profile.objects.filter(user__in=users):
+        # Multi-table inheritance rules out bulk_create for the child
+        ShibbolethProfile(
+            profile_ptr_id=profile.id,
+            user_id=profile.user_id,
+            institution=institution,
+        ).save_base(raw=True, force_insert=True)
+
+    Project.objects.bulk_create(
+        Project(
+            code=account_name(index),
+            title='Benchmark project',
+            description='Benchmark project',
+            tech_lead=users[index % len(users)],
+        ) for index in range(projects)
+    )
+    project_ids = list(
+        Project.objects.filter(code__startswith=ACCOUNT_PREFIX).order_by(
+            'code'
+        ).values_list('id', flat=True)
+    )
+
+    fundingsources = rng.integers(
+        0, attributions_per_project + 1, size=projects
+    )
+    publications = rng.integers(0, attributions_per_project + 1, size=projects)
+    Attribution.objects.bulk_create(
+        Attribution(
+            title='Benchmark {} {}'.format(kind, project_index),
+            created_by=users[project_index % len(users)],
+            owner=users[project_index % len(users)],
+        ) for kind, counts in (
+            ('fundingsource', fundingsources), ('publication', publications)
+        ) for project_index in range(projects)
+        for _ in range(counts[project_index])
+    )
+
+    project_attributions = []
+    for attribution in Attribution.objects.filter(
+        title__startswith='Benchmark '
+    ):
+        _, kind, project_index = attribution.title.split()
+        if kind == 'fundingsource':
+            child = FundingSource(
+                amount=int(rng.integers(1000, 100000)),
+                approved=bool(rng.random() < 0.5),
+            )
+        else:
+            child = Publication()
+        child.attribution_ptr_id = attribution.id
+        child.save_base(raw=True, force_insert=True)
+        project_attributions.append(
+            Project.attributions.through(
+                project_id=project_ids[int(project_index)],
+                attribution_id=attribution.id,
+            )
+        )
+    Project.attributions.through.objects.bulk_create(project_attributions)
+
+
+def measure(function, *args, **kwargs):
+    '''
+    Calls `function`, returning its result, the wall time taken in seconds,
+    and the peak memory allocated in bytes while it ran, as reported by
+    `tracemalloc`.
+    '''
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, seconds, peak_bytes
+
+
+def load_baseline(filename):
+    with open(filename) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(filename, results):
+    '''
+    Stores benchmark results, a list of dicts with keys `stage`, `rows`,
+    `seconds` and `peak_bytes`, for later comparison.
+    '''
+    with open(filename, 'w') as baseline_file:
+        json.dump(results, baseline_file, indent=2)
+
+
+def find_regressions(results, baseline, tolerance=0.2):
+    '''
+    Compares benchmark results with a baseline of the same form, and returns
+    a list of descriptions of the stages where the time or peak memory grew
+    by more than the fraction `tolerance`. Stages or sizes missing from the
+    baseline are ignored.
+    '''
+    baseline = {(entry['stage'], entry['rows']): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        previous = baseline.get((entry['stage'], entry['rows']))
+        if not previous:
+            continue
+        for measurement in ('seconds', 'peak_bytes'):
+            if entry[measurement] > previous[measurement] * (1 + tolerance):
+                regressions.append(
+                    '{stage} ({rows} rows): {measurement} {new:.6g} '
+                    'exceeds baseline {old:.6g}'.format(
+                        stage=entry['stage'],
+                        rows=entry['rows'],
+                        measurement=measurement,
+                        new=entry[measurement],
+                        old=previous[measurement],
+                    )
+                )
+
+    return regressions
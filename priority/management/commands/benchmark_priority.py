@@ -0,0 +1,184 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import setup_databases, teardown_databases
+
+from priority.benchmark import (
+    create_benchmark_projects,
+    find_regressions,
+    generate_sacct_dump,
+    load_baseline,
+    measure,
+    save_baseline,
+)
+from priority.management.commands.calculate_priority import (
+    SACCT_CHUNK_SIZE,
+    bulk_update_SlurmPriority_and_Project_tables,
+    calculate_priority,
+    get_priority_attribution_data,
+    read_and_aggregate_sacct_dump,
+    read_and_aggregate_sacct_dump_chunked,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the stages of calculate_priority on synthetic sacct dumps and '
+        'projects, reporting wall time and peak memory for each stage. The '
+        'projects are created in a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r',
+            '--rows',
+            type=int,
+            nargs='+',
+            help='Sizes of the synthetic `sacct` dumps to benchmark, in rows. '
+            'Defaults to 10000, 100000 and 1000000.',
+            default=[10000, 100000, 1000000]
+        )
+        parser.add_argument(
+            '--projects',
+            type=int,
+            help='Number of synthetic projects to create. Defaults to 1000.',
+            default=1000
+        )
+        parser.add_argument(
+            '-c',
+            '--chunk_size',
+            type=int,
+            help='Chunk size used for the chunked reading stage.',
+            default=SACCT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--full_read',
+            action='store_true',
+            help='Also time reading each dump all at once. This needs memory '
+            'in proportion to the size of the dump.',
+        )
+        parser.add_argument(
+            '--dump_dir',
+            help='Directory in which to keep the synthetic dumps, so that '
+            'they can be reused by later runs. By default they are written '
+            'to a temporary directory and removed afterwards.',
+            default=None
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Path to results saved by an earlier run with '
+            '--save_baseline. Stages whose time or peak memory exceed the '
+            'baseline by more than the tolerance are reported as errors.',
+            default=None
+        )
+        parser.add_argument(
+            '--save_baseline',
+            help='Path at which to save the results of this run.',
+            default=None
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            help='Fraction by which a stage may exceed the baseline before '
+            'it is reported. Defaults to 0.2.',
+            default=0.2
+        )
+
+    def handle(self, *args, **options):
+        # Writing the results locks every project, so the real database is
+        # never used: a test database is created, and destroyed afterwards
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            if options.get('dump_dir'):
+                os.makedirs(options['dump_dir'], exist_ok=True)
+                results = self.run_benchmarks(options['dump_dir'], options)
+            else:
+                with tempfile.TemporaryDirectory() as dump_dir:
+                    results = self.run_benchmarks(dump_dir, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if options.get('save_baseline'):
+            save_baseline(options['save_baseline'], results)
+        if options.get('baseline'):
+            regressions = find_regressions(
+                results,
+                load_baseline(options['baseline']),
+                tolerance=options.get('tolerance', 0.2)
+            )
+            if regressions:
+                raise CommandError(
+                    'Performance regressions found:\n' +
+                    '\n'.join(regressions)
+                )
+
+    def run_benchmarks(self, dump_dir, options):
+        results = []
+        self.stdout.write(
+            '{:<18} {:>12} {:>12} {:>14}'.format(
+                'stage', 'rows', 'seconds', 'peak MiB'
+            )
+        )
+        # The synthetic projects and results are never kept
+        with transaction.atomic():
+            create_benchmark_projects(options.get('projects', 1000))
+            for rows in options.get('rows', [10000]):
+                dump_file = os.path.join(
+                    dump_dir, 'bench_{}.dat'.format(rows)
+                )
+                if not os.path.exists(dump_file):
+                    generate_sacct_dump(
+                        dump_file,
+                        rows,
+                        accounts=options.get('projects', 1000)
+                    )
+
+                stages = []
+                if options.get('full_read'):
+                    stages.append(
+                        ('read', read_and_aggregate_sacct_dump, (dump_file, ))
+                    )
+                stages.append((
+                    'read_chunked', read_and_aggregate_sacct_dump_chunked, (
+                        dump_file,
+                        options.get('chunk_size') or SACCT_CHUNK_SIZE
+                    )
+                ))
+                sacct_data = None
+                for stage, function, arguments in stages:
+                    sacct_data = self.run_stage(
+                        results, stage, rows, function, *arguments
+                    )
+                attribution_data = self.run_stage(
+                    results, 'attribution_data', rows,
+                    get_priority_attribution_data
+                )
+                priority_results = self.run_stage(
+                    results, 'calculate', rows, calculate_priority,
+                    attribution_data, sacct_data
+                )
+                self.run_stage(
+                    results, 'write', rows,
+                    bulk_update_SlurmPriority_and_Project_tables,
+                    priority_results
+                )
+            transaction.set_rollback(True)
+
+        return results
+
+    def run_stage(self, results, stage, rows, function, *args):
+        result, seconds, peak_bytes = measure(function, *args)
+        results.append({
+            'stage': stage,
+            'rows': rows,
+            'seconds': seconds,
+            'peak_bytes': peak_bytes,
+        })
+        self.stdout.write(
+            '{:<18} {:>12} {:>12.3f} {:>14.1f}'.format(
+                stage, rows, seconds, peak_bytes / 2**20
+            )
+        )
+        return result
@@ -1,20 +1,80 @@
+import bz2
+import glob
+import gzip
+import io
+import lzma
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 
 import numpy as np
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
 
 import pandas as pd
-from priority.models import SlurmPriority
+from priority.models import SacctHighWaterMark, SlurmPriority
+from priority.sacct_cache import SacctCache
 from project.models import Project
+from system.models import System
 
-# remove false postive warning about chained assignment the default is 'warn'
-pd.options.mode.chained_assignment = None
+# default number of rows of a `sacct` dump to read at once when streaming
+SACCT_CHUNK_SIZE = 100000
+
+# states of Slurm jobs which may still use more time
+UNFINISHED_JOB_STATES = (
+    'PENDING', 'RUNNING', 'REQUEUED', 'RESIZING', 'SUSPENDED'
+)
+
+# format of the End times of jobs in `sacct` dumps
+SACCT_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def open_sacct_dump(filename):
+    '''
+    Opens a `sacct` dump for reading as text, decompressing it on the fly
+    if its name ends in `.gz`, `.bz2`, `.xz` or `.zst`. Reading
+    zstd-compressed dumps requires the optional `zstandard` package.
+    '''
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt')
+    if filename.endswith('.bz2'):
+        return bz2.open(filename, 'rt')
+    if filename.endswith('.xz'):
+        return lzma.open(filename, 'rt')
+    if filename.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError(
+                'The zstandard package is needed to read {}.'.format(filename)
+            )
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'))
+        )
+    return open(filename)
+
+
+def expand_sacct_dump_paths(paths):
+    '''
+    Expands a path or list of paths, any of which may be glob patterns, into
+    a sorted list of `sacct` dump filenames. Patterns matching no files are
+    kept as they are, so that opening them gives a helpful error.
+    '''
+    if isinstance(paths, str):
+        paths = [paths]
+
+    filenames = []
+    for path in paths:
+        filenames.extend(sorted(glob.glob(path)) or [path])
+
+    return filenames
 
 
 def read_raw_sacct_dump(filename):
-    df = pd.read_csv(filename, sep='|')
+    with open_sacct_dump(filename) as dump:
+        df = pd.read_csv(dump, sep='|')
 
     # remove NANs
     df = df.dropna(how='any')
@@ -23,11 +83,10 @@ def read_raw_sacct_dump(filename):
     df = df[df.JobID.str.match('[0-9]+$')]
 
     # remove root from accounts list
-    indexroot = df[df['Account'] == 'root'].index
-    df.drop(indexroot, inplace=True)
+    df = df[df['Account'] != 'root']
 
     # convert cpu time from core seconds to core hours
-    df['CPUTimeHours'] = df['CPUTimeRAW'].div(3600)
+    df = df.assign(CPUTimeHours=df['CPUTimeRAW'].div(3600))
 
     return df
 
@@ -53,72 +112,504 @@ def read_and_aggregate_sacct_dump(filename):
     return cpu_total_time, gpu_total_time
 
 
-def calculate_priority(priority_attribution_data, sacct_data):
-    # number of QOS levels
-    QOS_levels = 4.0
+def filter_sacct_chunk(df):
+    '''
+    Applies the filtering of `read_raw_sacct_dump` to one chunk of a raw
+    `sacct` dump.
+    '''
+    df = df.dropna(how='any')
+    df = df[df.JobID.str.match('[0-9]+$') & (df.Account != 'root')]
 
-    # combine the three data frames into one
-    cpu_total_time, gpu_total_time = sacct_data
-    full_data = (
-        priority_attribution_data.merge(
-            cpu_total_time, how='outer', right_index=True, left_on='account'
-        ).merge(
-            gpu_total_time, how='outer', right_index=True, left_on='account'
-        ).fillna(0).reset_index(drop=True)
+    return df
+
+
+def filter_finished_jobs(df, after_end=None, after_job_ids=()):
+    '''
+    Keeps only the jobs in a filtered chunk of a `sacct` dump which have
+    finished, using its `End` and `State` fields. If `after_end` is given,
+    only jobs which ended after that time, or at that time but are not in
+    `after_job_ids`, are kept. End times are normalised to
+    SACCT_TIME_FORMAT, so that they can be compared as strings.
+    '''
+    if 'End' not in df.columns or 'State' not in df.columns:
+        raise CommandError(
+            'Incremental runs need the End and State fields in the dump.'
+        )
+    end = pd.to_datetime(df.End, format=SACCT_TIME_FORMAT, errors='coerce')
+    finished = end.notna() & ~df.State.str.split().str[0].isin(
+        UNFINISHED_JOB_STATES
     )
+    df = df[finished].assign(End=end[finished].dt.strftime(SACCT_TIME_FORMAT))
+    if after_end is not None:
+        df = df[(df.End > after_end) | (
+            (df.End == after_end) & ~df.JobID.isin(after_job_ids)
+        )]
+
+    return df
+
+
+def aggregate_sacct_chunk(df):
+    '''
+    Reduces one filtered chunk of a `sacct` dump to per-Account totals of
+    `CPUTimeRAW` (in core seconds), split into non-GPU and GPU partitions.
+    '''
+    is_gpu = df.Partition.isin(("gpu", "xgpu"))
+    cpu_seconds = df[~is_gpu].groupby('Account')['CPUTimeRAW'].sum()
+    gpu_seconds = df[is_gpu].groupby('Account')['CPUTimeRAW'].sum()
+
+    return cpu_seconds, gpu_seconds
+
+
+def sacct_totals_to_frames(cpu_seconds, gpu_seconds):
+    '''
+    Converts per-Account totals in core seconds into the pair of DataFrames
+    returned by `read_and_aggregate_sacct_dump`.
+    '''
+    frames = []
+    for seconds, name in (
+        (cpu_seconds, 'cpu_total_time'), (gpu_seconds, 'gpu_total_time')
+    ):
+        seconds = seconds.sort_index()
+        seconds.index.name = 'Account'
+        frames.append(seconds.div(3600).astype(int).to_frame(name=name))
+
+    return tuple(frames)
+
+
+def sacct_totals_to_remainders(cpu_seconds, gpu_seconds):
+    '''
+    Returns the core seconds left over from `sacct_totals_to_frames` after
+    truncating to whole hours, as a DataFrame with an `account` column.
+    '''
+    remainders = pd.concat(
+        [
+            cpu_seconds.mod(3600).rename('cpu_seconds_remainder'),
+            gpu_seconds.mod(3600).rename('gpu_seconds_remainder'),
+        ],
+        axis=1
+    ).fillna(0).astype(int)
+    remainders.index.name = 'account'
+
+    return remainders.reset_index()
+
+
+def read_sacct_dump_chunks(filenames, chunksize):
+    '''
+    Yields chunks of at most `chunksize` rows of one or more raw `sacct`
+    dumps, so that only one chunk is held in memory at a time. `filenames`
+    may be a path or list of paths, each of which may be compressed.
+    '''
+    for filename in expand_sacct_dump_paths(filenames):
+        with open_sacct_dump(filename) as dump:
+            yield from pd.read_csv(
+                dump,
+                sep='|',
+                chunksize=chunksize,
+                dtype={
+                    'JobID': str,
+                    'Account': str,
+                    'Partition': str,
+                    'End': str,
+                    'State': str,
+                },
+            )
+
+
+def sum_sacct_totals(chunk_totals):
+    '''
+    Folds an iterable of `(cpu_seconds, gpu_seconds)` pairs into running
+    per-Account totals.
+    '''
+    cpu_seconds = pd.Series(dtype='int64')
+    gpu_seconds = pd.Series(dtype='int64')
+    for chunk_cpu_seconds, chunk_gpu_seconds in chunk_totals:
+        cpu_seconds = cpu_seconds.add(chunk_cpu_seconds, fill_value=0)
+        gpu_seconds = gpu_seconds.add(chunk_gpu_seconds, fill_value=0)
+
+    return cpu_seconds.astype('int64'), gpu_seconds.astype('int64')
+
+
+def read_sacct_dump_totals(filenames, chunksize=SACCT_CHUNK_SIZE, cache=None):
+    '''
+    Reads one or more `sacct` dumps `chunksize` rows at a time, and returns
+    per-Account totals in core seconds for non-GPU and GPU partitions.
+    If a SacctCache `cache` is given, the totals of each dump are looked up
+    there first, and stored there after reading.
+    '''
+
+    def read_file_totals(filename):
+        return sum_sacct_totals(
+            aggregate_sacct_chunk(filter_sacct_chunk(chunk))
+            for chunk in read_sacct_dump_chunks(filename, chunksize)
+        )
+
+    if cache is None:
+        return read_file_totals(filenames)
+
+    return sum_sacct_totals(
+        cache.read_totals(filename, read_file_totals)
+        for filename in expand_sacct_dump_paths(filenames)
+    )
+
+
+def read_and_aggregate_sacct_dump_chunked(
+    filenames, chunksize=SACCT_CHUNK_SIZE, cache=None
+):
+    '''
+    Streaming equivalent of `read_and_aggregate_sacct_dump`. The dump is
+    read `chunksize` rows at a time and each chunk is folded into running
+    per-Account totals, so peak memory does not grow with the dump size.
+    Core seconds are summed exactly and only converted to hours at the end.
+    `read_and_aggregate_sacct_dump` instead sums each job's hours as floats,
+    whose rounding error can leave a total just below a whole number of
+    hours, so where an account's usage is an exact number of hours it may
+    report one hour fewer than this function.
+    `filenames` may be a path or list of paths, whose totals are combined.
+    Totals are cached in `cache`, if given, as in `read_sacct_dump_totals`.
+    '''
+    return sacct_totals_to_frames(
+        *read_sacct_dump_totals(filenames, chunksize, cache=cache)
+    )
+
+
+def read_system_sacct_dumps(
+    system_filenames, chunksize, processes=None, cache=None
+):
+    '''
+    Reads the `sacct` dumps of several systems in parallel, one process per
+    system. `system_filenames` maps system names to a path or list of paths.
+    Returns a dict mapping system names to per-Account totals in core
+    seconds for non-GPU and GPU partitions, using the SacctCache `cache`
+    if given.
+    '''
+    if not processes:
+        processes = min(len(system_filenames), os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {
+            system: executor.submit(
+                read_sacct_dump_totals, filenames, chunksize, cache
+            )
+            for system, filenames in system_filenames.items()
+        }
+        return {system: future.result() for system, future in futures.items()}
+
+
+def parse_system_sacct_dumps(system_dumps):
+    '''
+    Parses a list of `SYSTEM=PATH` arguments into a dict mapping System
+    objects to lists of paths. System names are case-insensitive.
+    '''
+    systems = {system.name.lower(): system for system in System.objects.all()}
+    system_filenames = {}
+    for system_dump in system_dumps:
+        name, separator, path = system_dump.partition('=')
+        if not separator or not path:
+            raise CommandError(
+                'Expected SYSTEM=PATH, got "{}".'.format(system_dump)
+            )
+        try:
+            system = systems[name.lower()]
+        except KeyError:
+            raise CommandError('Unknown system "{}".'.format(name))
+        system_filenames.setdefault(system, []).append(path)
+
+    return system_filenames
+
+
+def write_system_priority_files(priority_results, system_totals, out_path):
+    '''
+    Writes a QOS file for each system alongside `out_path`, containing the
+    accounts which either have usage in that system's dump or belong to a
+    project with an allocation on that system.
+    '''
+    root, extension = os.path.splitext(out_path)
+    for system, (cpu_seconds, gpu_seconds) in system_totals.items():
+        accounts = set(cpu_seconds.index) | set(gpu_seconds.index) | set(
+            Project.objects.filter(allocation_systems=system).values_list(
+                'code', flat=True
+            )
+        )
+        priority_results[priority_results.account.isin(accounts)].to_csv(
+            '{}_{}{}'.format(root, system.name.lower(), extension),
+            sep='|',
+            columns=['account', 'quality_of_service'],
+            index=False
+        )
+
+
+def get_current_priorities():
+    '''
+    Returns the QOS and attribution points most recently written for each
+    account, as a DataFrame with columns `account`,
+    `previous_quality_of_service` and `previous_attribution_points`. These
+    are taken from the Project table, or for accounts without a project, from
+    the latest SlurmPriority records.
+    '''
+    columns = [
+        'account', 'previous_quality_of_service', 'previous_attribution_points'
+    ]
+    current = list(
+        Project.objects.values_list(
+            'code', 'quality_of_service', 'active_attribution_points'
+        )
+    )
+    latest_date = SlurmPriority.objects.aggregate(Max('date'))['date__max']
+    if latest_date:
+        current.extend(
+            SlurmPriority.objects.filter(
+                date=latest_date, project__isnull=True
+            ).values_list('account', 'quality_of_service', 'attribution_points')
+        )
+
+    return pd.DataFrame(current, columns=columns)
+
+
+def diff_priority_results(priority_results):
+    '''
+    Compares newly calculated priorities with those currently stored, and
+    returns only the accounts whose QOS or attribution points would change,
+    with both the new and previous values. Accounts with no previous values
+    are included.
+    '''
+    delta = priority_results[[
+        'account', 'quality_of_service', 'attribution_points'
+    ]].merge(
+        get_current_priorities(), on='account', how='left'
+    )
+    for column in ('quality_of_service', 'attribution_points'):
+        delta[column] = delta[column].astype(int)
+        delta['previous_' + column] = delta['previous_' + column].astype(
+            'Int64'
+        )
+    changed = (
+        delta.previous_quality_of_service.isna() |
+        delta.previous_attribution_points.isna() |
+        (delta.quality_of_service != delta.previous_quality_of_service) |
+        (delta.attribution_points != delta.previous_attribution_points)
+    )
+
+    return delta[changed.astype(bool)][[
+        'account', 'quality_of_service', 'previous_quality_of_service',
+        'attribution_points', 'previous_attribution_points'
+    ]].reset_index(drop=True)
+
+
+def read_sacct_dump_increment(
+    filenames, after_end=None, after_job_ids=(), chunksize=SACCT_CHUNK_SIZE
+):
+    '''
+    Reads the finished jobs in one or more `sacct` dumps which ended after
+    `after_end`, or at that time but are not in `after_job_ids`; the dumps
+    may be full dumps or cover only recent jobs. Jobs are selected by when
+    they ended rather than by ID, since a job submitted earlier may finish
+    later, and unfinished jobs are left to be read once they have finished.
+
+    Returns per-Account totals in core seconds of the new jobs, the latest
+    End time seen and the set of IDs of the jobs read which ended at that
+    time (or `after_end` and `after_job_ids` if there were no new jobs).
+    '''
+    high_water_mark = after_end
+    job_ids = set(after_job_ids)
+
+    def new_chunk_totals():
+        nonlocal high_water_mark, job_ids
+        for chunk in read_sacct_dump_chunks(filenames, chunksize):
+            chunk = filter_finished_jobs(
+                filter_sacct_chunk(chunk),
+                after_end=after_end,
+                after_job_ids=after_job_ids,
+            )
+            if not chunk.empty:
+                chunk_end = chunk.End.max()
+                if high_water_mark is None or chunk_end > high_water_mark:
+                    high_water_mark = chunk_end
+                    job_ids = set()
+                if chunk_end == high_water_mark:
+                    job_ids.update(chunk.JobID[chunk.End == chunk_end])
+            yield aggregate_sacct_chunk(chunk)
+
+    cpu_seconds, gpu_seconds = sum_sacct_totals(new_chunk_totals())
+
+    return cpu_seconds, gpu_seconds, high_water_mark, job_ids
+
+
+def get_previous_sacct_totals(on_date):
+    '''
+    Reconstructs the per-Account totals in core seconds stored in the
+    SlurmPriority table for `on_date`, including carried-over remainders.
+    '''
+    records = pd.DataFrame(
+        list(
+            SlurmPriority.objects.filter(date=on_date).values(
+                'account', 'cpu_hours_to_date', 'gpu_hours_to_date',
+                'cpu_seconds_remainder', 'gpu_seconds_remainder'
+            )
+        ),
+        columns=[
+            'account', 'cpu_hours_to_date', 'gpu_hours_to_date',
+            'cpu_seconds_remainder', 'gpu_seconds_remainder'
+        ]
+    ).set_index('account')
+
+    cpu_seconds = (
+        records['cpu_hours_to_date'] * 3600 + records['cpu_seconds_remainder']
+    ).astype('int64')
+    gpu_seconds = (
+        records['gpu_hours_to_date'] * 3600 + records['gpu_seconds_remainder']
+    ).astype('int64')
+
+    return cpu_seconds, gpu_seconds
+
+
+def read_and_aggregate_sacct_dump_incremental(
+    filenames, chunksize=SACCT_CHUNK_SIZE
+):
+    '''
+    Incremental equivalent of `read_and_aggregate_sacct_dump`. Only jobs
+    which finished after the latest SacctHighWaterMark are read from the
+    dump; their usage is added to the totals stored in the SlurmPriority
+    table on the date of that mark. Returns the usual pair of DataFrames,
+    the remainders to be stored alongside them, and the new high-water mark
+    as a pair of its End time and job IDs.
+    '''
+    last_mark = SacctHighWaterMark.objects.order_by('-date').first()
+    if last_mark:
+        cpu_seconds, gpu_seconds = get_previous_sacct_totals(last_mark.date)
+        after_end = last_mark.end
+        after_job_ids = last_mark.get_job_ids()
+    else:
+        cpu_seconds, gpu_seconds = sum_sacct_totals([])
+        after_end = None
+        after_job_ids = set()
+
+    new_cpu_seconds, new_gpu_seconds, end, job_ids = (
+        read_sacct_dump_increment(
+            filenames,
+            after_end=after_end,
+            after_job_ids=after_job_ids,
+            chunksize=chunksize,
+        )
+    )
+    cpu_seconds = cpu_seconds.add(new_cpu_seconds, fill_value=0)
+    gpu_seconds = gpu_seconds.add(new_gpu_seconds, fill_value=0)
+    cpu_seconds = cpu_seconds.astype('int64')
+    gpu_seconds = gpu_seconds.astype('int64')
+
+    return (
+        sacct_totals_to_frames(cpu_seconds, gpu_seconds),
+        sacct_totals_to_remainders(cpu_seconds, gpu_seconds),
+        (end, job_ids),
+    )
+
+
+def prioritise(
+    attribution_points,
+    quality_of_service,
+    cpu_total_time,
+    gpu_total_time,
+    cpu_hours_to_date,
+    gpu_hours_to_date,
+    prioritised_cpu_hours,
+    prioritised_gpu_hours,
+    AP_per_CPU_hour,
+    AP_per_GPU_hour,
+    QOS_levels=4.0,
+):
+    '''
+    Calculates new priorities from NumPy arrays (or anything convertible to
+    them) with one element per account, without touching the database.
+    `quality_of_service` and the `*_to_date` and `prioritised_*` arguments
+    are the values from the previous run, and `*_total_time` the current
+    usage totals. Returns a dict of arrays holding the new values of
+    `attribution_points`, `cpu_hours_delta`, `gpu_hours_delta`,
+    `prioritised_cpu_hours`, `prioritised_gpu_hours`, `cpu_hours_to_date`,
+    `gpu_hours_to_date`, `AP_credit` and `quality_of_service`.
+    '''
+    attribution_points = np.asarray(attribution_points)
+    quality_of_service = np.asarray(quality_of_service)
+    cpu_total_time = np.asarray(cpu_total_time)
+    gpu_total_time = np.asarray(gpu_total_time)
 
     # Added to avoid problems in the event that projects are in the sacct
     # Dump but not on Cogs (e.g. Cardiff users temporarily using Sunbird).
     # These would otherwise default to an AP of Zero which crashes the
     # np.log10 function.
-    full_data.attribution_points.loc[full_data.attribution_points == 0] = 50000
-
-    # Calculate cpu/gpu hours used since last sacct dump.
-    full_data['cpu_hours_delta'] = (
-        full_data['cpu_total_time'] - full_data['cpu_hours_to_date']
-    )
-    full_data['gpu_hours_delta'] = (
-        full_data['gpu_total_time'] - full_data['gpu_hours_to_date']
+    attribution_points = np.where(
+        attribution_points == 0, 50000, attribution_points
     )
 
-    # Calculate parameter such that K*log(AP) has a max defined by
-    # QOS_levels
-    max_AP = full_data['attribution_points'].max()
-    k = QOS_levels / np.log10(max_AP)
+    # Calculate cpu/gpu hours used since last sacct dump.
+    cpu_hours_delta = cpu_total_time - cpu_hours_to_date
+    gpu_hours_delta = gpu_total_time - gpu_hours_to_date
 
     # Check if previous run was prioritised and if so add the time since
     # last sacct dump to total priortised time
-    prioritised_projects = full_data[full_data['quality_of_service'] > 0]
-    prioritised_projects['prioritised_cpu_hours'] += (
-        prioritised_projects['cpu_hours_delta']
+    was_prioritised = quality_of_service > 0
+    prioritised_cpu_hours = np.where(
+        was_prioritised, prioritised_cpu_hours + cpu_hours_delta,
+        prioritised_cpu_hours
     )
-    prioritised_projects['prioritised_gpu_hours'] += (
-        prioritised_projects['gpu_hours_delta']
+    prioritised_gpu_hours = np.where(
+        was_prioritised, prioritised_gpu_hours + gpu_hours_delta,
+        prioritised_gpu_hours
     )
-    full_data.update(prioritised_projects)
-
-    full_data['cpu_hours_to_date'] = full_data['cpu_total_time']
-    full_data['gpu_hours_to_date'] = full_data['gpu_total_time']
 
     # Calculate Priority
-    full_data['AP_credit'] = ((
-        full_data['attribution_points'] - (
-            full_data['prioritised_cpu_hours'] * full_data['AP_per_CPU_hour'] +
-            full_data['prioritised_gpu_hours'] * full_data['AP_per_GPU_hour']
+    AP_credit = (
+        attribution_points - (
+            prioritised_cpu_hours * AP_per_CPU_hour +
+            prioritised_gpu_hours * AP_per_GPU_hour
         )
-    ).astype(int))
+    ).astype(int)
 
-    full_data['quality_of_service'] = (
-        full_data['attribution_points'].map(lambda a: k * np.log10(a)
-                                           ).round(0).astype(int)
+    # Calculate parameter such that K*log(AP) has a max defined by
+    # QOS_levels
+    log_AP = np.log10(attribution_points)
+    if log_AP.size:
+        log_AP *= QOS_levels / log_AP.max()
+    quality_of_service = np.where(
+        AP_credit >= 0, np.round(log_AP).astype(int), 0
     )
-    full_data['quality_of_service'] = (
-        full_data['quality_of_service'].where(full_data['AP_credit'] >= 0, 0)
+
+    return {
+        'attribution_points': attribution_points,
+        'cpu_hours_delta': cpu_hours_delta,
+        'gpu_hours_delta': gpu_hours_delta,
+        'prioritised_cpu_hours': prioritised_cpu_hours,
+        'prioritised_gpu_hours': prioritised_gpu_hours,
+        'cpu_hours_to_date': cpu_total_time,
+        'gpu_hours_to_date': gpu_total_time,
+        'AP_credit': AP_credit,
+        'quality_of_service': quality_of_service,
+    }
+
+
+def calculate_priority(priority_attribution_data, sacct_data):
+    # combine the three data frames into one
+    cpu_total_time, gpu_total_time = sacct_data
+    full_data = (
+        priority_attribution_data.merge(
+            cpu_total_time, how='outer', right_index=True, left_on='account'
+        ).merge(
+            gpu_total_time, how='outer', right_index=True, left_on='account'
+        ).fillna(0).reset_index(drop=True)
     )
 
-    full_data['quality_of_service'] = full_data['quality_of_service'].astype(
-        int
+    new_priorities = prioritise(
+        **{
+            column: full_data[column].to_numpy()
+            for column in (
+                'attribution_points', 'quality_of_service',
+                'cpu_total_time', 'gpu_total_time', 'cpu_hours_to_date',
+                'gpu_hours_to_date', 'prioritised_cpu_hours',
+                'prioritised_gpu_hours', 'AP_per_CPU_hour', 'AP_per_GPU_hour'
+            )
+        }
     )
+    for column, values in new_priorities.items():
+        full_data[column] = values
+
     return full_data
 
 
@@ -128,10 +619,14 @@ class Command(BaseCommand):
         parser.add_argument(
             '-i',
             '--input_file',
+            nargs='+',
             help='Path to `sacct` dump file. This can be an absolute path, or '
             'relative to the Django base directory. If this is not specfied, '
-            'the default path is "priority/IO/TEST_dump.csv".',
-            default='priority/IO/TEST_dump.csv'
+            'the default path is "priority/IO/TEST_dump.csv". Several paths '
+            'or glob patterns may be given, in which case usage is summed '
+            'over all matching files. Files ending in .gz, .bz2, .xz or .zst '
+            'are decompressed as they are read.',
+            default=['priority/IO/TEST_dump.csv']
         )
         parser.add_argument(
             '-o',
@@ -142,20 +637,153 @@ class Command(BaseCommand):
             'the default path is "priority/IO/QOS_output.csv".',
             default='priority/IO/QOS_output.csv'
         )
+        parser.add_argument(
+            '-c',
+            '--chunk_size',
+            type=int,
+            help='If specified, read the `sacct` dump in chunks of this many '
+            'rows rather than all at once. This keeps memory use bounded '
+            'for large dumps.',
+            default=None
+        )
+        parser.add_argument(
+            '-s',
+            '--system_dump',
+            action='append',
+            metavar='SYSTEM=PATH',
+            help='Path (or glob pattern) of the `sacct` dump for the named '
+            'system. Give this once per system to read the dumps of several '
+            'systems in parallel and combine their usage; --input_file is '
+            'then ignored.',
+        )
+        parser.add_argument(
+            '-p',
+            '--processes',
+            type=int,
+            help='Maximum number of processes used to read system dumps in '
+            'parallel. Defaults to one per system, up to the number of CPUs.',
+            default=None
+        )
+        parser.add_argument(
+            '--per_system_output',
+            action='store_true',
+            help='When using --system_dump, also write a QOS file for each '
+            'system, named after the output file with the system name '
+            'appended, containing the accounts used on or allocated to that '
+            'system.',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only read jobs which finished after the last job read by a '
+            'previous incremental run, and add their usage to the totals '
+            'stored for that run. The input may be a full dump or one '
+            'covering only recent jobs, and must include the End and State '
+            'fields.',
+        )
+        parser.add_argument(
+            '--cache_dir',
+            help='Directory in which to cache the usage totals read from '
+            'each dump, so that later runs on an unchanged dump need not '
+            're-read it. Defaults to the SACCT_CACHE_DIR setting.',
+            default=settings.SACCT_CACHE_DIR
+        )
+        parser.add_argument(
+            '--no_cache',
+            action='store_true',
+            help='Neither read nor write cached usage totals.',
+        )
+        parser.add_argument(
+            '-n',
+            '--dry_run',
+            action='store_true',
+            help='Calculate priorities and write the accounts whose QOS or '
+            'attribution points would change to the delta file, without '
+            'writing the output file or updating the database.',
+        )
+        parser.add_argument(
+            '-d',
+            '--delta_file',
+            help='Path to a pipe separated file listing only the accounts '
+            'whose QOS or attribution points changed, with their new and '
+            'previous values. With --dry_run, this defaults to the output '
+            'file name with "_delta" appended.',
+            default=None
+        )
 
     def handle(self, *args, **options):
-        in_path = options['input_file']
-        if os.path.isabs(in_path):
-            in_path = os.path.join(settings.BASE_DIR, in_path)
+        cache = None
+        if options.get('cache_dir') and not options.get('no_cache'):
+            cache = SacctCache(
+                options['cache_dir'], settings.SACCT_CACHE_MAX_BYTES
+            )
+
+        in_paths = []
+        for in_path in expand_sacct_dump_paths(options['input_file']):
+            if os.path.isabs(in_path):
+                in_path = os.path.join(settings.BASE_DIR, in_path)
+            in_paths.append(in_path)
         out_path = options['output_file']
         if os.path.isabs(out_path):
             out_path = os.path.join(settings.BASE_DIR, out_path)
 
-        sacct_data = read_and_aggregate_sacct_dump(in_path)
+        if options.get('system_dump') and options.get('incremental'):
+            raise CommandError(
+                '--incremental cannot be combined with --system_dump, since '
+                'a single End time mark is kept, which cannot record how far '
+                "each system's dump has been read."
+            )
+
+        remainders = None
+        system_totals = None
+        if options.get('system_dump'):
+            system_totals = read_system_sacct_dumps(
+                parse_system_sacct_dumps(options['system_dump']),
+                chunksize=options.get('chunk_size') or SACCT_CHUNK_SIZE,
+                processes=options.get('processes'),
+                cache=cache
+            )
+            sacct_data = sacct_totals_to_frames(
+                *sum_sacct_totals(system_totals.values())
+            )
+        elif options.get('incremental'):
+            sacct_data, remainders, (end, job_ids) = (
+                read_and_aggregate_sacct_dump_incremental(
+                    in_paths,
+                    chunksize=options.get('chunk_size') or SACCT_CHUNK_SIZE
+                )
+            )
+        elif cache or options.get('chunk_size') or len(in_paths) > 1:
+            sacct_data = read_and_aggregate_sacct_dump_chunked(
+                in_paths,
+                chunksize=options.get('chunk_size') or SACCT_CHUNK_SIZE,
+                cache=cache
+            )
+        else:
+            sacct_data = read_and_aggregate_sacct_dump(in_paths[0])
         priority_attribution_data = get_priority_attribution_data()
         priority_results = calculate_priority(
             priority_attribution_data, sacct_data
         )
+        if remainders is not None:
+            priority_results = priority_results.merge(
+                remainders, on='account', how='left'
+            )
+            for column in ('cpu_seconds_remainder', 'gpu_seconds_remainder'):
+                priority_results[column] = (
+                    priority_results[column].fillna(0).astype(int)
+                )
+
+        delta_path = options.get('delta_file')
+        if options.get('dry_run') and not delta_path:
+            root, extension = os.path.splitext(out_path)
+            delta_path = '{}_delta{}'.format(root, extension)
+        if delta_path:
+            diff_priority_results(priority_results).to_csv(
+                delta_path, sep='|', index=False
+            )
+        if options.get('dry_run'):
+            return
 
         # output Acount and QOS to pipe seperated csv file
         priority_results.to_csv(
@@ -164,9 +792,22 @@ class Command(BaseCommand):
             columns=['account', 'quality_of_service'],
             index=False
         )
+        if system_totals and options.get('per_system_output'):
+            write_system_priority_files(
+                priority_results, system_totals, out_path
+            )
 
-        for project_record in priority_results.itertuples():
-            update_SlurmPriority_and_Project_tables(project_record)
+        with transaction.atomic():
+            bulk_update_SlurmPriority_and_Project_tables(priority_results)
+
+            if options.get('incremental') and end is not None:
+                SacctHighWaterMark.objects.update_or_create(
+                    date=date.today(),
+                    defaults={
+                        'end': end,
+                        'job_ids': ','.join(sorted(job_ids)),
+                    }
+                )
 
 
 def update_SlurmPriority_and_Project_tables(project_record, override_date=None):
@@ -175,6 +816,7 @@ def update_SlurmPriority_and_Project_tables(project_record, override_date=None):
     current `attribution_points` total, current `quality_of_service`,
     then `cpu_hours_to_date`,
     `gpu_hours_to_date`, `prioritised_cpu_hours`, and `prioritised_gpu_hours`,
+    and optionally `cpu_seconds_remainder` and `gpu_seconds_remainder`,
     and writes these to the relevant points in the SlurmPriority and
     Project tables.
     `override_date` allows a different date to be provided for testing
@@ -207,11 +849,98 @@ def update_SlurmPriority_and_Project_tables(project_record, override_date=None):
             'gpu_hours_to_date': project_record.gpu_hours_to_date,
             'prioritised_cpu_hours': project_record.prioritised_cpu_hours,
             'prioritised_gpu_hours': project_record.prioritised_gpu_hours,
-            'quality_of_service': project_record.quality_of_service
+            'quality_of_service': project_record.quality_of_service,
+            'cpu_seconds_remainder':
+                getattr(project_record, 'cpu_seconds_remainder', 0),
+            'gpu_seconds_remainder':
+                getattr(project_record, 'gpu_seconds_remainder', 0),
         }
     )
 
 
+def bulk_update_SlurmPriority_and_Project_tables(
+    priority_results, override_date=None, batch_size=500
+):
+    '''
+    Equivalent to calling `update_SlurmPriority_and_Project_tables` for each
+    row of the `priority_results` DataFrame, but using a fixed number of
+    queries (for a given `batch_size`) within a single transaction, so that
+    either all records are written or none are.
+    '''
+    if override_date:
+        today = override_date
+    else:
+        today = date.today()
+
+    with transaction.atomic():
+        project_ids = dict(Project.objects.values_list('code', 'id'))
+        existing_priorities = {
+            priority.account: priority
+            for priority in SlurmPriority.objects.filter(date=today)
+        }
+
+        new_priorities = []
+        updated_priorities = []
+        updated_projects = []
+        for project_record in priority_results.itertuples():
+            project_id = project_ids.get(project_record.account)
+            fields = {
+                'project_id': project_id,
+                'attribution_points': int(project_record.attribution_points),
+                'cpu_hours_to_date': int(project_record.cpu_hours_to_date),
+                'gpu_hours_to_date': int(project_record.gpu_hours_to_date),
+                'prioritised_cpu_hours':
+                    int(project_record.prioritised_cpu_hours),
+                'prioritised_gpu_hours':
+                    int(project_record.prioritised_gpu_hours),
+                'quality_of_service': int(project_record.quality_of_service),
+                'cpu_seconds_remainder':
+                    int(getattr(project_record, 'cpu_seconds_remainder', 0)),
+                'gpu_seconds_remainder':
+                    int(getattr(project_record, 'gpu_seconds_remainder', 0)),
+            }
+
+            priority = existing_priorities.get(project_record.account)
+            if priority:
+                for field, value in fields.items():
+                    setattr(priority, field, value)
+                updated_priorities.append(priority)
+            else:
+                new_priorities.append(
+                    SlurmPriority(
+                        date=today, account=project_record.account, **fields
+                    )
+                )
+
+            if project_id:
+                updated_projects.append(
+                    Project(
+                        id=project_id,
+                        active_attribution_points=fields['attribution_points'],
+                        quality_of_service=fields['quality_of_service'],
+                    )
+                )
+
+        SlurmPriority.objects.bulk_create(
+            new_priorities, batch_size=batch_size
+        )
+        SlurmPriority.objects.bulk_update(
+            updated_priorities,
+            [
+                'project', 'attribution_points', 'cpu_hours_to_date',
+                'gpu_hours_to_date', 'prioritised_cpu_hours',
+                'prioritised_gpu_hours', 'quality_of_service',
+                'cpu_seconds_remainder', 'gpu_seconds_remainder'
+            ],
+            batch_size=batch_size
+        )
+        Project.objects.bulk_update(
+            updated_projects,
+            ['active_attribution_points', 'quality_of_service'],
+            batch_size=batch_size
+        )
+
+
 def get_priority_attribution_data():
     '''
     Counts the attribution points for all projects in the Cogs3 database,
@@ -219,11 +948,13 @@ def get_priority_attribution_data():
     database (should these exist) for comparison.
     '''
 
-    attribution_points = [
-        (project.code, project.AP()) for project in Project.objects.all()
-    ]
+    attribution_points = (
+        Project.objects.with_attribution_points().order_by('id').values_list(
+            'code', 'attribution_points'
+        )
+    )
     attribution_data = pd.DataFrame(
-        attribution_points, columns=['account', 'attribution_points']
+        list(attribution_points), columns=['account', 'attribution_points']
     )
     yesterday = date.today() - timedelta(1)
     priority_db = SlurmPriority.objects.filter(date=yesterday)
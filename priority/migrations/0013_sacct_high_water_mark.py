@@ -0,0 +1,32 @@
+# Generated by Django 2.2.13 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('priority', '0012_auto_20190813_2148_squashed_0015_auto_20190814_1453'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SacctHighWaterMark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('end', models.CharField(help_text='Latest End time, as given by sacct, of the jobs included in the totals in the SlurmPriority table for this date', max_length=19, verbose_name='Last ingested job end time')),
+                ('job_ids', models.TextField(blank=True, help_text='Comma separated IDs of the jobs included in the totals which ended at the last ingested job end time', verbose_name='Job IDs ingested at the end time')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='slurmpriority',
+            name='cpu_seconds_remainder',
+            field=models.IntegerField(default=0, help_text='CPU compute seconds used in addition to the whole hours in the total to date, carried over between incremental updates', verbose_name='CPU seconds remainder'),
+        ),
+        migrations.AddField(
+            model_name='slurmpriority',
+            name='gpu_seconds_remainder',
+            field=models.IntegerField(default=0, help_text='GPU compute seconds used in addition to the whole hours in the total to date, carried over between incremental updates', verbose_name='GPU seconds remainder'),
+        ),
+    ]
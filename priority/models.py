@@ -49,3 +49,40 @@ class SlurmPriority(models.Model):
                    'provided to Slurm.'),
         default=0,
     )
+    cpu_seconds_remainder = models.IntegerField(
+        verbose_name=('CPU seconds remainder'),
+        default=0,
+        help_text=('CPU compute seconds used in addition to the whole hours '
+                   'in the total to date, carried over between incremental '
+                   'updates'),
+    )
+    gpu_seconds_remainder = models.IntegerField(
+        verbose_name=('GPU seconds remainder'),
+        default=0,
+        help_text=('GPU compute seconds used in addition to the whole hours '
+                   'in the total to date, carried over between incremental '
+                   'updates'),
+    )
+
+
+class SacctHighWaterMark(models.Model):
+    date = models.DateField(
+        auto_now=False,
+        auto_now_add=False,
+        unique=True,
+    )
+    end = models.CharField(
+        max_length=19,
+        verbose_name=('Last ingested job end time'),
+        help_text=('Latest End time, as given by sacct, of the jobs included '
+                   'in the totals in the SlurmPriority table for this date'),
+    )
+    job_ids = models.TextField(
+        blank=True,
+        verbose_name=('Job IDs ingested at the end time'),
+        help_text=('Comma separated IDs of the jobs included in the totals '
+                   'which ended at the last ingested job end time'),
+    )
+
+    def get_job_ids(self):
+        return set(job_id for job_id in self.job_ids.split(',') if job_id)
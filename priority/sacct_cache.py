@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+import pandas as pd
+
+# bytes of a dump read at a time when computing its checksum
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+CACHE_EXTENSION = '.npz'
+
+
+class SacctCache:
+    '''
+    An on-disk cache of the per-Account totals computed from `sacct` dumps,
+    stored as compressed NumPy arrays in `directory`. Entries are keyed by
+    the checksum and modification time of the dump, so an edited or
+    replaced dump is read afresh. Entries for earlier versions of the same
+    dump are removed when a new one is stored, and the least recently used
+    entries are evicted when the cache grows beyond `max_bytes`.
+    '''
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path_prefix(self, filename):
+        return hashlib.blake2b(
+            os.path.realpath(filename).encode(), digest_size=8
+        ).hexdigest()
+
+    def entry_path(self, filename):
+        '''
+        Returns the path of the cache entry for the current contents of the
+        dump `filename`.
+        '''
+        checksum = hashlib.blake2b(digest_size=16)
+        with open(filename, 'rb') as dump:
+            for block in iter(lambda: dump.read(CHECKSUM_BLOCK_SIZE), b''):
+                checksum.update(block)
+        checksum.update(str(os.stat(filename).st_mtime_ns).encode())
+
+        return os.path.join(
+            self.directory, '{}_{}{}'.format(
+                self.path_prefix(filename), checksum.hexdigest(),
+                CACHE_EXTENSION
+            )
+        )
+
+    def get(self, entry_path):
+        '''
+        Returns the `(cpu_seconds, gpu_seconds)` totals stored at
+        `entry_path`, or None if there is no such entry.
+        '''
+        try:
+            with np.load(entry_path, allow_pickle=False) as arrays:
+                totals = tuple(
+                    pd.Series(
+                        arrays[kind + '_seconds'],
+                        index=pd.Index(
+                            arrays[kind + '_accounts'], dtype=object
+                        ),
+                        dtype='int64',
+                    ) for kind in ('cpu', 'gpu')
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Mark the entry as recently used
+        os.utime(entry_path)
+        return totals
+
+    def set(self, entry_path, cpu_seconds, gpu_seconds):
+        '''
+        Stores per-Account totals at `entry_path`, then evicts stale and
+        least recently used entries.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        arrays = {}
+        for kind, seconds in (('cpu', cpu_seconds), ('gpu', gpu_seconds)):
+            arrays[kind + '_accounts'] = seconds.index.values.astype(str)
+            arrays[kind + '_seconds'] = seconds.values.astype('int64')
+
+        # Write to a temporary file first, so that concurrent runs never
+        # see a partial entry
+        handle, temporary_path = tempfile.mkstemp(
+            dir=self.directory, suffix='.tmp'
+        )
+        with os.fdopen(handle, 'wb') as entry:
+            np.savez_compressed(entry, **arrays)
+        os.replace(temporary_path, entry_path)
+
+        self.evict(keep=entry_path)
+
+    def evict(self, keep=None):
+        '''
+        Removes entries for earlier versions of the dump cached at `keep`,
+        then the least recently used entries other than `keep` until the
+        cache fits in `max_bytes`. Entries already removed by another
+        process, such as a worker reading another dump, are skipped.
+        '''
+        prefix = os.path.basename(keep).split('_')[0] if keep else None
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if prefix and path != keep and name.startswith(prefix + '_'):
+                    os.remove(path)
+                    continue
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def read_totals(self, filename, read_totals):
+        '''
+        Returns the cached totals for the dump `filename`, calling
+        `read_totals(filename)` and caching the result on a miss.
+        '''
+        entry_path = self.entry_path(filename)
+        totals = self.get(entry_path)
+        if totals is None:
+            totals = read_totals(filename)
+            self.set(entry_path, *totals)
+
+        return totals
@@ -0,0 +1,191 @@
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+import mock
+import pandas as pd
+
+from priority.benchmark import (
+    ACCOUNT_PREFIX,
+    create_benchmark_projects,
+    find_regressions,
+    generate_sacct_dump,
+    measure,
+)
+from priority.management.commands.calculate_priority import (
+    read_and_aggregate_sacct_dump,
+)
+from priority.models import SlurmPriority
+from project.models import Project
+
+
+class GenerateSacctDumpTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.dump_file = os.path.join(self.directory, 'dump.dat')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_generate_sacct_dump(self):
+        '''
+        Check that the synthetic dump has the requested number of rows, in
+        the format of a real dump, including job steps, root usage and GPU
+        partitions.
+        '''
+        generate_sacct_dump(self.dump_file, 10000, accounts=50, block_rows=3000)
+        dump = pd.read_csv(self.dump_file, sep='|', dtype={'JobID': str})
+
+        self.assertEqual(len(dump), 10000)
+        self.assertEqual(
+            list(dump.columns), [
+                'JobID', 'JobName', 'CPUTimeRAW', 'TotalCPU', 'Account',
+                'Partition'
+            ]
+        )
+        steps = dump.JobID.str.contains('.', regex=False)
+        self.assertTrue(steps.any())
+        self.assertTrue(dump.Partition[steps].isnull().all())
+        self.assertIn('root', set(dump.Account))
+        self.assertTrue({'gpu', 'xgpu'} <= set(dump.Partition.dropna()))
+        self.assertTrue(dump.JobID.is_unique)
+
+        cpu_data, gpu_data = read_and_aggregate_sacct_dump(self.dump_file)
+        self.assertNotIn('root', cpu_data.index)
+        self.assertTrue(cpu_data.index.str.startswith(ACCOUNT_PREFIX).all())
+        self.assertFalse(gpu_data.empty)
+
+    def test_generate_sacct_dump_reproducible(self):
+        '''
+        Check that a dump is determined by its seed.
+        '''
+        other_file = os.path.join(self.directory, 'other.dat')
+        generate_sacct_dump(self.dump_file, 1000, seed=1)
+        generate_sacct_dump(other_file, 1000, seed=1)
+        with open(self.dump_file) as dump, open(other_file) as other:
+            self.assertEqual(dump.read(), other.read())
+
+
+class CreateBenchmarkProjectsTests(TestCase):
+
+    def test_create_benchmark_projects(self):
+        '''
+        Check that the synthetic projects are created with attributions
+        that count towards their attribution points.
+        '''
+        create_benchmark_projects(20)
+        projects = Project.objects.with_attribution_points().filter(
+            code__startswith=ACCOUNT_PREFIX
+        )
+
+        self.assertEqual(projects.count(), 20)
+        for project in projects:
+            self.assertEqual(project.attribution_points, project.AP())
+        self.assertTrue(
+            any(project.attribution_points > 50000 for project in projects)
+        )
+
+
+class FindRegressionsTests(TestCase):
+
+    def test_find_regressions(self):
+        '''
+        Check that only growth beyond the tolerance is reported, and that
+        stages missing from the baseline are ignored.
+        '''
+        baseline = [
+            {'stage': 'read', 'rows': 10, 'seconds': 1.0, 'peak_bytes': 100},
+            {'stage': 'write', 'rows': 10, 'seconds': 1.0, 'peak_bytes': 100},
+        ]
+        results = [
+            {'stage': 'read', 'rows': 10, 'seconds': 1.1, 'peak_bytes': 200},
+            {'stage': 'write', 'rows': 10, 'seconds': 0.5, 'peak_bytes': 50},
+            {'stage': 'read', 'rows': 20, 'seconds': 9.0, 'peak_bytes': 900},
+        ]
+
+        regressions = find_regressions(results, baseline, tolerance=0.2)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('read (10 rows): peak_bytes', regressions[0])
+
+    def test_measure(self):
+        result, seconds, peak_bytes = measure(lambda size: [0] * size, 100000)
+
+        self.assertEqual(len(result), 100000)
+        self.assertGreaterEqual(seconds, 0)
+        self.assertGreater(peak_bytes, 100000)
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.baseline_file = os.path.join(self.directory, 'baseline.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @mock.patch(
+        'priority.management.commands.benchmark_priority.teardown_databases'
+    )
+    @mock.patch(
+        'priority.management.commands.benchmark_priority.setup_databases'
+    )
+    def test_benchmark_command(self, setup_mock, teardown_mock):
+        '''
+        Check that each stage is reported for each size, that the synthetic
+        data is removed afterwards, and that a baseline can be saved and
+        compared against. The command runs in the test database already set
+        up, rather than its own.
+        '''
+        out = StringIO()
+        call_command(
+            'benchmark_priority',
+            rows=[1000, 2000],
+            projects=10,
+            full_read=True,
+            dump_dir=self.directory,
+            save_baseline=self.baseline_file,
+            stdout=out,
+        )
+
+        with open(self.baseline_file) as baseline_file:
+            results = json.load(baseline_file)
+        self.assertEqual(
+            [(entry['stage'], entry['rows']) for entry in results], [
+                (stage, rows) for rows in (1000, 2000) for stage in (
+                    'read', 'read_chunked', 'attribution_data', 'calculate',
+                    'write'
+                )
+            ]
+        )
+        self.assertIn('read_chunked', out.getvalue())
+        self.assertFalse(
+            Project.objects.filter(code__startswith=ACCOUNT_PREFIX).exists()
+        )
+        self.assertFalse(SlurmPriority.objects.exists())
+        setup_mock.assert_called_once_with(verbosity=0, interactive=False)
+        teardown_mock.assert_called_once_with(
+            setup_mock.return_value, verbosity=0
+        )
+
+        for entry in results:
+            entry['seconds'] = 0
+        with open(self.baseline_file, 'w') as baseline_file:
+            json.dump(results, baseline_file)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_priority',
+                rows=[1000],
+                projects=10,
+                dump_dir=self.directory,
+                baseline=self.baseline_file,
+                stdout=StringIO(),
+            )
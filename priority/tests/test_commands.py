@@ -4,24 +4,34 @@ import os
 import tempfile
 import shutil
 import filecmp
+import gzip
+import lzma
 
 from pandas import to_numeric
 from django.test import TestCase
 from django.conf import settings
+from django.core.management.base import CommandError
 
+import mock
 import numpy as np
+import pandas as pd
 
 from funding.models import FundingSource
 from priority.management.commands.calculate_priority import (
     update_SlurmPriority_and_Project_tables,
+    bulk_update_SlurmPriority_and_Project_tables,
     get_priority_attribution_data,
     read_raw_sacct_dump,
     read_and_aggregate_sacct_dump,
+    read_and_aggregate_sacct_dump_chunked,
+    read_sacct_dump_increment,
     calculate_priority,
+    prioritise,
     Command,
 )
-from priority.models import SlurmPriority
-from project.models import Project
+from priority.models import SacctHighWaterMark, SlurmPriority
+from project.models import Project, ProjectSystemAllocation
+from system.models import System
 from users.models import CustomUser
 
 Pandas = namedtuple(
@@ -37,6 +47,48 @@ Pandas = namedtuple(
 )
 
 
+def split_dump(dump_file, directory, last_job_id):
+    '''
+    Splits a sacct dump into two files in `directory`, the second containing
+    only jobs (and their steps) after `last_job_id`.
+    '''
+    with open(dump_file) as dump:
+        header, *lines = dump.readlines()
+    paths = []
+    for name, include in (
+        ('old.dat', lambda job_id: job_id <= last_job_id),
+        ('new.dat', lambda job_id: job_id > last_job_id),
+    ):
+        paths.append(os.path.join(directory, name))
+        with open(paths[-1], 'w') as part:
+            part.write(header)
+            part.writelines(
+                line for line in lines
+                if include(int(line.split('|')[0].split('.')[0]))
+            )
+    return paths
+
+
+def add_end_times(dump_file, path, overrides={}):
+    '''
+    Writes a copy of a sacct dump to `path` with End and State fields, the
+    job with ID n having ended n minutes after midnight on 1 January 2020.
+    `overrides` maps job IDs to the (End, State) to give them instead.
+    '''
+    with open(dump_file) as dump:
+        header, *lines = dump.read().splitlines()
+    with open(path, 'w') as dump:
+        dump.write(header + '|End|State\n')
+        for line in lines:
+            job_id = int(line.split('|')[0].split('.')[0])
+            end = (
+                pd.Timestamp('2020-01-01') + pd.Timedelta(minutes=job_id)
+            ).strftime('%Y-%m-%dT%H:%M:%S')
+            end, state = overrides.get(job_id, (end, 'COMPLETED'))
+            dump.write('{}|{}|{}\n'.format(line, end, state))
+    return path
+
+
 class PriorityCommandTests(TestCase):
     dump_file = os.path.join(settings.BASE_DIR, 'priority/tests/test_dump.dat')
 
@@ -95,6 +147,179 @@ class ReadSacctDumpTests(PriorityCommandTests, TestCase):
         self.assertEqual(tuple(cpu_data.itertuples()), expected_cpu_data)
         self.assertEqual(tuple(gpu_data.itertuples()), expected_gpu_data)
 
+    def test_read_and_aggregate_sacct_dump_chunked(self):
+        '''
+        Test that reading the sacct dump in chunks gives the same totals
+        as reading it all at once, including chunks with no whole jobs.
+        '''
+        cpu_data, gpu_data = read_and_aggregate_sacct_dump(self.dump_file)
+        for chunksize in (1, 7, 100, 10000):
+            chunked_cpu_data, chunked_gpu_data = (
+                read_and_aggregate_sacct_dump_chunked(
+                    self.dump_file, chunksize=chunksize
+                )
+            )
+            self.assertTrue(chunked_cpu_data.equals(cpu_data))
+            self.assertTrue(chunked_gpu_data.equals(gpu_data))
+
+    def test_read_and_aggregate_sacct_dump_chunked_is_exact(self):
+        '''
+        Test that the chunked totals are exact where summing hours as floats
+        falls just short of a whole hour.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            dump_file = os.path.join(directory, 'dump.dat')
+            with open(dump_file, 'w') as dump:
+                dump.write('JobID|CPUTimeRAW|Account|Partition\n')
+                for job_id, seconds in enumerate((2671, 31951, 1378)):
+                    for step in ('', '.batch'):
+                        dump.write(
+                            '{}{}|{}|scw0000|compute\n'.format(
+                                job_id, step, seconds
+                            )
+                        )
+
+            cpu_data, _ = read_and_aggregate_sacct_dump(dump_file)
+            chunked_cpu_data, _ = read_and_aggregate_sacct_dump_chunked(
+                dump_file, chunksize=2
+            )
+        self.assertEqual(cpu_data.cpu_total_time['scw0000'], 9)
+        self.assertEqual(chunked_cpu_data.cpu_total_time['scw0000'], 10)
+
+    def test_read_sacct_dump_increment(self):
+        '''
+        Test that only jobs which finished after the high-water mark are
+        read, and that the new high-water mark is the latest End time read,
+        with the IDs of the jobs which ended then.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            dump_file = add_end_times(
+                self.dump_file, os.path.join(directory, 'dump.dat')
+            )
+            cpu_seconds, gpu_seconds, end, job_ids = (
+                read_sacct_dump_increment(dump_file, chunksize=50)
+            )
+            self.assertEqual(end, '2020-01-01T15:45:00')
+            self.assertEqual(job_ids, {'945'})
+            self.assertEqual(cpu_seconds['scw0000'], 3 * 242493 + 96975)
+            self.assertEqual(gpu_seconds['scw0002'], 7147392)
+
+            cpu_seconds, gpu_seconds, end, job_ids = (
+                read_sacct_dump_increment(
+                    dump_file,
+                    after_end='2020-01-01T11:32:00',
+                    after_job_ids={'692'},
+                    chunksize=50,
+                )
+            )
+            self.assertEqual(end, '2020-01-01T15:45:00')
+            self.assertEqual(cpu_seconds['scw0000'], 10570)
+            self.assertEqual(
+                cpu_seconds['scw0001'], 16771600 + 21136200 + 21135600
+            )
+            self.assertNotIn('scw1000', cpu_seconds)
+            self.assertTrue(gpu_seconds.empty)
+
+            cpu_seconds, gpu_seconds, end, job_ids = (
+                read_sacct_dump_increment(
+                    dump_file,
+                    after_end='2020-01-01T15:45:00',
+                    after_job_ids={'945'},
+                )
+            )
+            self.assertEqual(end, '2020-01-01T15:45:00')
+            self.assertEqual(job_ids, {'945'})
+            self.assertTrue(cpu_seconds.empty)
+
+    def test_read_sacct_dump_increment_late_jobs(self):
+        '''
+        Test that a job which finishes after jobs with higher IDs is read
+        once it has finished, and that unfinished jobs are not read.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            dump_file = add_end_times(
+                self.dump_file,
+                os.path.join(directory, 'running.dat'),
+                {692: ('Unknown', 'RUNNING')},
+            )
+            cpu_seconds, _, end, _ = read_sacct_dump_increment(
+                dump_file, after_end='2020-01-01T11:00:00'
+            )
+            self.assertEqual(end, '2020-01-01T15:45:00')
+            self.assertEqual(cpu_seconds['scw0000'], 10570)
+
+            dump_file = add_end_times(
+                self.dump_file,
+                os.path.join(directory, 'finished.dat'),
+                {692: ('2020-01-02T00:00:00', 'CANCELLED by 1000')},
+            )
+            cpu_seconds, _, end, job_ids = read_sacct_dump_increment(
+                dump_file, after_end=end, after_job_ids={'945'}
+            )
+            self.assertEqual(end, '2020-01-02T00:00:00')
+            self.assertEqual(job_ids, {'692'})
+            self.assertEqual(cpu_seconds.to_dict(), {'scw0000': 86405})
+
+
+class CompressedAndMultipleSacctDumpTests(PriorityCommandTests, TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.expected_data = read_and_aggregate_sacct_dump(self.dump_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def assertSacctDataEqual(self, sacct_data):
+        for actual, expected in zip(sacct_data, self.expected_data):
+            self.assertTrue(actual.equals(expected))
+
+    def test_read_compressed_sacct_dump(self):
+        '''
+        Test that compressed dumps give the same totals as uncompressed ones,
+        whether read at once or in chunks.
+        '''
+        with open(self.dump_file, 'rb') as dump:
+            contents = dump.read()
+        for extension, compressor in (('gz', gzip), ('xz', lzma)):
+            compressed_file = os.path.join(
+                self.test_dir, 'dump.dat.' + extension
+            )
+            with compressor.open(compressed_file, 'wb') as compressed:
+                compressed.write(contents)
+
+            self.assertSacctDataEqual(
+                read_and_aggregate_sacct_dump(compressed_file)
+            )
+            self.assertSacctDataEqual(
+                read_and_aggregate_sacct_dump_chunked(
+                    compressed_file, chunksize=20
+                )
+            )
+
+    def test_read_multiple_sacct_dumps(self):
+        '''
+        Test that usage is summed across several dumps, given either as a
+        list or as a glob pattern.
+        '''
+        old_dump, new_dump = split_dump(self.dump_file, self.test_dir, 430)
+        with open(new_dump, 'rb') as dump:
+            contents = dump.read()
+        os.remove(new_dump)
+        with gzip.open(new_dump + '.gz', 'wb') as compressed:
+            compressed.write(contents)
+
+        self.assertSacctDataEqual(
+            read_and_aggregate_sacct_dump_chunked(
+                [old_dump, new_dump + '.gz'], chunksize=20
+            )
+        )
+        self.assertSacctDataEqual(
+            read_and_aggregate_sacct_dump_chunked(
+                os.path.join(self.test_dir, '*.dat*')
+            )
+        )
+
 
 class PriorityCalculationTests(PriorityCommandTests, TestCase):
 
@@ -134,6 +359,51 @@ class PriorityCalculationTests(PriorityCommandTests, TestCase):
         )
 
 
+class PrioritiseTests(TestCase):
+
+    def test_prioritise(self):
+        '''
+        Test the array-based priority calculation on accounts that are
+        unknown to Cogs, newly prioritised, prioritised and in credit, and
+        prioritised and out of credit.
+        '''
+        priorities = prioritise(
+            attribution_points=np.array([0, 1000000, 100000, 100000]),
+            quality_of_service=np.array([0, 0, 3, 3]),
+            cpu_total_time=np.array([500, 500, 500, 500]),
+            gpu_total_time=np.array([0, 0, 10, 10]),
+            cpu_hours_to_date=np.array([0, 400, 400, 400]),
+            gpu_hours_to_date=np.array([0, 0, 0, 0]),
+            prioritised_cpu_hours=np.array([0, 0, 100, 1000]),
+            prioritised_gpu_hours=np.array([0, 0, 0, 0]),
+            AP_per_CPU_hour=np.array([1, 1, 1, 100]),
+            AP_per_GPU_hour=np.array([10, 10, 10, 10]),
+        )
+
+        np.testing.assert_array_equal(
+            priorities['attribution_points'], [50000, 1000000, 100000, 100000]
+        )
+        np.testing.assert_array_equal(
+            priorities['prioritised_cpu_hours'], [0, 0, 200, 1100]
+        )
+        np.testing.assert_array_equal(
+            priorities['prioritised_gpu_hours'], [0, 0, 10, 10]
+        )
+        np.testing.assert_array_equal(
+            priorities['cpu_hours_to_date'], [500, 500, 500, 500]
+        )
+        np.testing.assert_array_equal(
+            priorities['AP_credit'], [50000, 1000000, 99700, -10100]
+        )
+        np.testing.assert_array_equal(
+            priorities['quality_of_service'], [3, 4, 3, 0]
+        )
+
+    def test_prioritise_no_accounts(self):
+        priorities = prioritise(*([np.array([])] * 10))
+        self.assertEqual(len(priorities['quality_of_service']), 0)
+
+
 class CalculatePriorityCommandTests(PriorityCommandTests, TestCase):
 
     def setUp(self):
@@ -161,6 +431,232 @@ class CalculatePriorityCommandTests(PriorityCommandTests, TestCase):
         )
 
 
+class IncrementalCalculatePriorityCommandTests(PriorityCommandTests, TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_incremental_command(self):
+        '''
+        Test that two incremental runs over consecutive parts of the dump
+        give the same totals as reading the whole dump at once.
+        '''
+        dump_file = add_end_times(
+            self.dump_file, os.path.join(self.test_dir, 'dump.dat')
+        )
+        old_dump, new_dump = split_dump(dump_file, self.test_dir, 430)
+        out_file = os.path.join(self.test_dir, 'qos.psv')
+
+        Command.handle(
+            None,
+            input_file=old_dump,
+            output_file=out_file,
+            incremental=True,
+            chunk_size=20
+        )
+        self.assertEqual(
+            SacctHighWaterMark.objects.get().end, '2020-01-01T07:10:00'
+        )
+
+        # Pretend the first run happened yesterday
+        yesterday = date.today() - timedelta(1)
+        SlurmPriority.objects.update(date=yesterday)
+        SacctHighWaterMark.objects.update(date=yesterday)
+
+        # Rereading the full dump should skip the jobs already seen
+        Command.handle(
+            None,
+            input_file=dump_file,
+            output_file=out_file,
+            incremental=True,
+            chunk_size=20
+        )
+        mark = SacctHighWaterMark.objects.get(date=date.today())
+        self.assertEqual(mark.end, '2020-01-01T15:45:00')
+        self.assertEqual(mark.get_job_ids(), {'945'})
+
+        cpu_data, gpu_data = read_and_aggregate_sacct_dump(self.dump_file)
+        today = SlurmPriority.objects.filter(date=date.today())
+        for account, cpu_hours in cpu_data.cpu_total_time.items():
+            self.assertEqual(
+                today.get(account=account).cpu_hours_to_date, cpu_hours
+            )
+        for account, gpu_hours in gpu_data.gpu_total_time.items():
+            self.assertEqual(
+                today.get(account=account).gpu_hours_to_date, gpu_hours
+            )
+
+
+class DryRunCalculatePriorityCommandTests(PriorityCommandTests, TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out_file = os.path.join(self.test_dir, 'qos.psv')
+        self.delta_file = os.path.join(self.test_dir, 'qos_delta.psv')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def read_delta(self):
+        return pd.read_csv(self.delta_file, sep='|')
+
+    def test_dry_run_writes_nothing(self):
+        '''
+        Test that a dry run writes only the delta file, which lists every
+        account since none has been prioritised before.
+        '''
+        Command.handle(
+            None,
+            input_file=self.dump_file,
+            output_file=self.out_file,
+            dry_run=True
+        )
+
+        self.assertFalse(os.path.exists(self.out_file))
+        self.assertFalse(SlurmPriority.objects.exists())
+        self.assertFalse(
+            Project.objects.filter(quality_of_service__isnull=False).exists()
+        )
+        delta = self.read_delta()
+        self.assertEqual(
+            list(delta.columns), [
+                'account', 'quality_of_service', 'previous_quality_of_service',
+                'attribution_points', 'previous_attribution_points'
+            ]
+        )
+        self.assertTrue(delta.previous_quality_of_service.isnull().all())
+        self.assertEqual(
+            set(Project.objects.values_list('code', flat=True)),
+            set(Project.objects.values_list('code', flat=True)) &
+            set(delta.account)
+        )
+
+    def test_dry_run_reports_changes(self):
+        '''
+        Test that after a real run, the delta is empty until attribution
+        points change, and then lists only the affected accounts.
+        '''
+        Command.handle(
+            None, input_file=self.dump_file, output_file=self.out_file
+        )
+        Command.handle(
+            None,
+            input_file=self.dump_file,
+            output_file=self.out_file,
+            delta_file=self.delta_file,
+            dry_run=True
+        )
+        self.assertTrue(self.read_delta().empty)
+
+        FundingSource.objects.filter(title='Test funding source'
+                                    ).update(amount=1000000)
+        changed_accounts = {
+            project.code
+            for project in Project.objects.with_attribution_points()
+            if project.attribution_points != project.active_attribution_points
+        }
+        self.assertTrue(changed_accounts)
+
+        Command.handle(
+            None,
+            input_file=self.dump_file,
+            output_file=self.out_file,
+            delta_file=self.delta_file,
+            dry_run=True
+        )
+        # QOS levels are relative, so other accounts may change too
+        delta = self.read_delta()
+        self.assertTrue(changed_accounts <= set(delta.account))
+        for row in delta.itertuples():
+            # Accounts without a project are compared with SlurmPriority
+            priority = SlurmPriority.objects.get(account=row.account)
+            self.assertEqual(
+                row.previous_attribution_points, priority.attribution_points
+            )
+            self.assertEqual(
+                row.previous_quality_of_service, priority.quality_of_service
+            )
+            self.assertTrue(
+                row.attribution_points != row.previous_attribution_points or
+                row.quality_of_service != row.previous_quality_of_service
+            )
+
+
+class MultipleSystemCalculatePriorityCommandTests(
+    PriorityCommandTests, TestCase
+):
+    fixtures = PriorityCommandTests.fixtures + [
+        'system/fixtures/tests/systems.json',
+    ]
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_command_with_system_dumps(self):
+        '''
+        Test that dumps from several systems are combined, and that a QOS
+        file is written for each system.
+        '''
+        first_dump, second_dump = split_dump(
+            self.dump_file, self.test_dir, 757
+        )
+        out_file = os.path.join(self.test_dir, 'qos.psv')
+        project = Project.objects.get(code='scw0002')
+        ProjectSystemAllocation.objects.create(
+            project=project,
+            system=System.objects.get(name='Phoenix'),
+            date_allocated=date.today(),
+            date_unallocated=date.today() + timedelta(365),
+        )
+
+        Command.handle(
+            None,
+            input_file=['nonexistent.dat'],
+            output_file=out_file,
+            system_dump=['nemesis=' + first_dump, 'Phoenix=' + second_dump],
+            per_system_output=True,
+            processes=2
+        )
+
+        cpu_data, gpu_data = read_and_aggregate_sacct_dump(self.dump_file)
+        today = SlurmPriority.objects.filter(date=date.today())
+        for account, cpu_hours in cpu_data.cpu_total_time.items():
+            self.assertEqual(
+                today.get(account=account).cpu_hours_to_date, cpu_hours
+            )
+        for account, gpu_hours in gpu_data.gpu_total_time.items():
+            self.assertEqual(
+                today.get(account=account).gpu_hours_to_date, gpu_hours
+            )
+
+        for system, expected_accounts in (
+            ('nemesis', {'scw0000', 'scw0001', 'scw0002', 'scw1000'}),
+            ('phoenix', {'scw0000', 'scw0001', 'scw0002'}),
+        ):
+            system_file = os.path.join(
+                self.test_dir, 'qos_{}.psv'.format(system)
+            )
+            self.assertEqual(
+                set(pd.read_csv(system_file, sep='|').account),
+                expected_accounts
+            )
+
+    def test_command_with_unknown_system(self):
+        with self.assertRaises(CommandError):
+            Command.handle(
+                None,
+                input_file=[self.dump_file],
+                output_file=os.path.join(self.test_dir, 'qos.psv'),
+                system_dump=['unknown=' + self.dump_file],
+            )
+
+
 class TableUpdateTests(PriorityCommandTests, TestCase):
 
     def test_update_new_record(self):
@@ -235,6 +731,85 @@ class TableUpdateTests(PriorityCommandTests, TestCase):
         self.assertEqual(project.quality_of_service, 3)
 
 
+class BulkTableUpdateTests(PriorityCommandTests, TestCase):
+
+    def setUp(self):
+        self.records = pd.DataFrame(
+            [
+                Pandas('scw0000', 62000, 2, 1000, 10, 500, 0),
+                Pandas('scw0001', 50000, 1, 200, 0, 0, 0),
+                Pandas('invalid', 50000, 1, 100000, 1000, 0, 0),
+            ],
+            columns=Pandas._fields
+        )
+
+    def test_bulk_update_matches_single_updates(self):
+        '''
+        Test that the bulk update writes the same SlurmPriority and Project
+        records as updating one record at a time, for both new and existing
+        SlurmPriority records.
+        '''
+        fields = ('account', 'project') + Pandas._fields[1:]
+
+        for project_record in self.records.itertuples():
+            update_SlurmPriority_and_Project_tables(project_record)
+        expected_priorities = list(
+            SlurmPriority.objects.order_by('account').values(*fields)
+        )
+        expected_projects = list(
+            Project.objects.order_by('id').values(
+                'code', 'active_attribution_points', 'quality_of_service'
+            )
+        )
+
+        Project.objects.update(
+            active_attribution_points=None, quality_of_service=None
+        )
+        for update_existing in (False, True):
+            if not update_existing:
+                SlurmPriority.objects.all().delete()
+            else:
+                SlurmPriority.objects.update(
+                    quality_of_service=0, cpu_hours_to_date=0
+                )
+            bulk_update_SlurmPriority_and_Project_tables(self.records)
+
+            self.assertEqual(
+                list(SlurmPriority.objects.order_by('account').values(*fields)),
+                expected_priorities
+            )
+            self.assertEqual(
+                list(
+                    Project.objects.order_by('id').values(
+                        'code', 'active_attribution_points',
+                        'quality_of_service'
+                    )
+                ), expected_projects
+            )
+
+    def test_bulk_update_query_count(self):
+        '''
+        Test that the number of queries doesn't depend on the number of
+        records.
+        '''
+        # Savepoint, projects, existing priorities, insert priorities,
+        # update projects, release savepoint
+        with self.assertNumQueries(6):
+            bulk_update_SlurmPriority_and_Project_tables(self.records)
+
+    def test_bulk_update_is_atomic(self):
+        '''
+        Test that nothing is written if any part of the update fails.
+        '''
+        with mock.patch.object(
+            Project.objects, 'bulk_update', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                bulk_update_SlurmPriority_and_Project_tables(self.records)
+
+        self.assertFalse(SlurmPriority.objects.exists())
+
+
 class PriorityAttributionDataTests(PriorityCommandTests, TestCase):
 
     def test_get_priority_attribution_data_empty_db(self):
@@ -1,7 +1,7 @@
 from django.test import TestCase
 
 from project.models import Project
-from funding.models import Attribution
+from funding.models import Attribution, FundingSource
 
 
 class PriorityTests(TestCase):
@@ -46,3 +46,53 @@ class Priority_ProjectModelTests(PriorityTests):
     def test_AP_with_publication_and_fundingsource(self):
         self.project.attributions.add(self.publication)
         self.assertEqual(self.project.AP(), 72000)
+
+
+class Priority_ProjectManagerTests(PriorityTests):
+
+    def assertBulkAPMatches(self):
+        '''
+        Check that the bulk annotation agrees with `Project.AP()` for every
+        project.
+        '''
+        projects = Project.objects.with_attribution_points()
+        self.assertEqual(len(projects), Project.objects.count())
+        for project in projects:
+            self.assertEqual(
+                project.attribution_points,
+                Project.objects.get(pk=project.pk).AP()
+            )
+
+    def test_bulk_AP_with_no_funding_approval(self):
+        self.assertBulkAPMatches()
+        self.assertEqual(
+            Project.objects.with_attribution_points().get(code='scw0000').
+            attribution_points, 62000
+        )
+
+    def test_bulk_AP_with_unapproved_and_approved_funding(self):
+        institution = (
+            Project.objects.get(code='scw0000').tech_lead.profile.institution
+        )
+        institution.needs_funding_approval = True
+        institution.save()
+        self.assertBulkAPMatches()
+
+        FundingSource.objects.filter(title='Test funding source').update(
+            approved=True, amount=15000
+        )
+        self.assertBulkAPMatches()
+
+    def test_bulk_AP_with_publication_and_fundingsource(self):
+        project = Project.objects.get(code='scw0000')
+        project.attributions.add(
+            Attribution.objects.get(title='Test publication')
+        )
+        project.attributions.add(
+            Attribution.objects.get(title='Test funding source 2')
+        )
+        self.assertBulkAPMatches()
+
+    def test_bulk_AP_query_count(self):
+        with self.assertNumQueries(1):
+            list(Project.objects.with_attribution_points())
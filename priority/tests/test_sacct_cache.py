@@ -0,0 +1,149 @@
+import filecmp
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+import mock
+
+from priority.management.commands import calculate_priority
+from priority.management.commands.calculate_priority import (
+    Command,
+    read_sacct_dump_totals,
+)
+from priority.sacct_cache import SacctCache
+from priority.tests.test_commands import PriorityCommandTests
+
+
+class SacctCacheTests(PriorityCommandTests, TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.test_dir, 'cache')
+        self.cache = SacctCache(self.cache_dir, max_bytes=1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def copy_dump(self, name):
+        path = os.path.join(self.test_dir, name)
+        shutil.copyfile(self.dump_file, path)
+        return path
+
+    def test_cached_totals_match(self):
+        '''
+        Check that totals read from the cache equal those read from the dump,
+        and that the dump is not read again while it is unchanged.
+        '''
+        expected = read_sacct_dump_totals(self.dump_file)
+        first = read_sacct_dump_totals(self.dump_file, cache=self.cache)
+        with mock.patch.object(
+            calculate_priority, 'read_sacct_dump_chunks'
+        ) as read_chunks:
+            second = read_sacct_dump_totals(self.dump_file, cache=self.cache)
+            read_chunks.assert_not_called()
+
+        for totals in (first, second):
+            for actual_seconds, expected_seconds in zip(totals, expected):
+                self.assertTrue(
+                    actual_seconds.sort_index().equals(
+                        expected_seconds.sort_index()
+                    )
+                )
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_modified_dump_is_reread(self):
+        '''
+        Check that touching a dump invalidates its entry, and that the stale
+        entry is removed.
+        '''
+        dump_file = self.copy_dump('dump.dat')
+        read_sacct_dump_totals(dump_file, cache=self.cache)
+        stale_entries = os.listdir(self.cache_dir)
+
+        status = os.stat(dump_file)
+        os.utime(dump_file, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+        with mock.patch.object(
+            calculate_priority,
+            'read_sacct_dump_chunks',
+            wraps=calculate_priority.read_sacct_dump_chunks
+        ) as read_chunks:
+            read_sacct_dump_totals(dump_file, cache=self.cache)
+            read_chunks.assert_called_once()
+
+        entries = os.listdir(self.cache_dir)
+        self.assertEqual(len(entries), 1)
+        self.assertNotEqual(entries, stale_entries)
+
+    def test_size_cap(self):
+        '''
+        Check that the least recently used entries are evicted once the
+        cache exceeds its size cap.
+        '''
+        dump_files = [self.copy_dump('dump{}.dat'.format(i)) for i in range(3)]
+        read_sacct_dump_totals(dump_files[0], cache=self.cache)
+        entry_size = os.path.getsize(
+            os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        )
+        self.cache.max_bytes = 2 * entry_size
+
+        first_entry = self.cache.entry_path(dump_files[0])
+        second_entry = self.cache.entry_path(dump_files[1])
+        read_sacct_dump_totals(dump_files[1], cache=self.cache)
+        os.utime(first_entry, (0, 0))
+        read_sacct_dump_totals(dump_files[2], cache=self.cache)
+
+        self.assertFalse(os.path.exists(first_entry))
+        self.assertTrue(os.path.exists(second_entry))
+        self.assertTrue(
+            os.path.exists(self.cache.entry_path(dump_files[2]))
+        )
+
+    def test_concurrent_eviction(self):
+        '''
+        Check that entries removed by another process while the cache is
+        being evicted are skipped.
+        '''
+        dump_files = [self.copy_dump('dump{}.dat'.format(i)) for i in range(3)]
+        for dump_file in dump_files:
+            read_sacct_dump_totals(dump_file, cache=self.cache)
+        self.cache.max_bytes = 0
+        removed = self.cache.entry_path(dump_files[0])
+        stat = os.stat
+
+        def stat_removed(path, *args, **kwargs):
+            if path == removed:
+                raise FileNotFoundError(path)
+            return stat(path, *args, **kwargs)
+
+        with mock.patch('priority.sacct_cache.os.stat', stat_removed):
+            with mock.patch(
+                'priority.sacct_cache.os.remove',
+                side_effect=FileNotFoundError
+            ) as remove:
+                self.cache.evict(keep=self.cache.entry_path(dump_files[2]))
+        remove.assert_called_once_with(self.cache.entry_path(dump_files[1]))
+
+    def test_command_with_cache(self):
+        '''
+        Check that the command writes the same output with and without the
+        cache.
+        '''
+        out_files = [
+            os.path.join(self.test_dir, name)
+            for name in ('uncached.psv', 'cached.psv', 'cached_again.psv')
+        ]
+        Command.handle(
+            None, input_file=self.dump_file, output_file=out_files[0]
+        )
+        for out_file in out_files[1:]:
+            Command.handle(
+                None,
+                input_file=self.dump_file,
+                output_file=out_file,
+                cache_dir=self.cache_dir
+            )
+
+        self.assertTrue(filecmp.cmp(out_files[0], out_files[1], shallow=False))
+        self.assertTrue(filecmp.cmp(out_files[0], out_files[2], shallow=False))
@@ -10,7 +10,8 @@ from project.models import (
     RSEAllocation, SystemAllocationRequest
 )
 from project.openldap import (
-    update_openldap_project, update_openldap_project_membership
+    create_openldap_project_memberships, update_openldap_project,
+    update_openldap_project_membership
 )
 
 
@@ -49,11 +50,13 @@ class ProjectUserMembershipAdmin(SimpleHistoryAdmin):
 
     def activate_project_memberships(self, request, queryset):
         rows_updated = 0
-        for membership in queryset:
+        memberships = []
+        for membership in queryset.select_related('project', 'user'):
             membership.status = ProjectUserMembership.AUTHORISED
             membership.save()
-            update_openldap_project_membership(membership)
+            memberships.append(membership)
             rows_updated += 1
+        create_openldap_project_memberships(memberships)
         message = self._project_membership_action_message(rows_updated)
         self.message_user(
             request,
@@ -1,10 +1,11 @@
 from django import forms
+from django.db import transaction
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
 from common.util import email_user_async
 from funding.models import Attribution, FundingSource
-from institution.models import Institution
+from institution.registry import institution_registry
 from project.models import (
     Project, ProjectUserMembership, RSEAllocation, SystemAllocationRequest
 )
@@ -184,10 +185,10 @@ class SystemAllocationRequestAdminForm(forms.ModelForm):
         allocation = super(SystemAllocationRequestAdminForm,
                            self).save(commit=False)
         allocation.previous_status = self.initial_status
-        if self.initial_status != allocation.status:
-            update_openldap_project(allocation)
         if commit:
             allocation.save()
+        if self.initial_status != allocation.status:
+            transaction.on_commit(lambda: update_openldap_project(allocation))
         return allocation
 
 
@@ -222,18 +223,13 @@ class ProjectCreationForm(forms.ModelForm):
 
     def clean_supervisor_email(self):
         cleaned_data = super().clean()
-        try:
-            email = cleaned_data['supervisor_email']
-            domain = email.split('@')[1]
-            if Institution.objects.filter(base_domain=domain).exists():
-                return email
-        except:
-            pass
+        email = cleaned_data.get('supervisor_email')
+        if institution_registry.get_by_email_address(email) is not None:
+            return email
         raise forms.ValidationError(_(
             'Please enter an institutional email address ending '
             'with one of: ' + ', '.join(
-                '@' + institution.base_domain
-                for institution in Institution.objects.all()
+                institution_registry.get_valid_domains()
             ) + '.'
         ))
 
@@ -479,7 +475,14 @@ class ProjectUserMembershipAdminForm(forms.ModelForm):
                 user = project_user_membership.user
                 if user.profile.institution and user.profile.institution.needs_user_approval:
                     user.profile.activate()
-            update_openldap_project_membership(project_user_membership)
         if commit:
             project_user_membership.save()
+        if self.initial_status != project_user_membership.status:
+            # Queue the job once the membership has been saved and
+            # committed, so that it loads the membership as saved.
+            transaction.on_commit(
+                lambda: update_openldap_project_membership(
+                    project_user_membership
+                )
+            )
         return project_user_membership
@@ -6,6 +6,8 @@ from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import ngettext_lazy
 from simple_history.models import HistoricalRecords
@@ -38,11 +40,39 @@ class ProjectCategory(models.Model):
         return self.name
 
 
+class ProjectManager(models.Manager):
+
+    def with_attribution_points(self):
+        '''
+        Annotate each project with `attribution_points`, computed in the
+        database in the same way as `Project.AP()`. Projects whose technical
+        lead has no institution are annotated with None.
+        '''
+        institution = 'tech_lead__profile__shibbolethprofile__institution__'
+        funding_amount = Sum(
+            'attributions__fundingsource__amount',
+            filter=(
+                Q(attributions__fundingsource__approved=True) |
+                Q(**{institution + 'needs_funding_approval': False})
+            ),
+        )
+        publication_count = Count('attributions__publication')
+        return self.annotate(
+            attribution_points=ExpressionWrapper(
+                F(institution + 'AP_base') + Coalesce(funding_amount, 0) +
+                publication_count * F(institution + 'AP_per_publication'),
+                output_field=models.IntegerField()
+            )
+        )
+
+
 class Project(models.Model):
 
     class Meta:
         verbose_name_plural = _('Projects')
 
+    objects = ProjectManager()
+
     title = models.CharField(
         max_length=256,
         verbose_name=_('Project Title'),
@@ -353,6 +383,10 @@ class Project(models.Model):
         return self.code
 
     def AP(self):
+        '''
+        Count the attribution points of this project. To count them for many
+        projects at once, use `Project.objects.with_attribution_points()`.
+        '''
         institution = self.tech_lead.profile.institution
         total_points = institution.AP_base
 
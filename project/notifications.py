@@ -6,7 +6,7 @@ from institution.models import Institution
 from common.util import email_user
 
 
-@job
+@job('email')
 def project_created_notification(project):
     """
     Notify support that a new project has been created.
@@ -29,7 +29,7 @@ def project_created_notification(project):
     email_user(subject, context, text_template_path, html_template_path)
 
 
-@job
+@job('email')
 def project_membership_created(membership):
     """
     Notify the project's technical lead that a project membership has been created.
@@ -48,7 +48,7 @@ def project_membership_created(membership):
     email_user(subject, context, text_template_path, html_template_path)
 
 
-@job
+@job('email')
 def supervisor_project_created_notification(project):
     subject = _('{company_name} Project Created'.format(company_name=settings.COMPANY_NAME))
     context = {
@@ -1,6 +1,6 @@
 import logging
 
-from openldap.api import project_api, project_membership_api
+from openldap import jobs
 from project.models import ProjectUserMembership, SystemAllocationRequest
 
 logger = logging.getLogger('apps')
@@ -20,18 +20,18 @@ def update_openldap_project(allocation):
 
     if allocation.status == SystemAllocationRequest.APPROVED:
         if project.gid_number:
-            project_api.activate_project.delay(allocation=allocation)
+            jobs.activate_project.delay(allocation_id=allocation.pk)
         else:
-            project_api.create_project.delay(allocation=allocation)
+            jobs.create_project.delay(allocation_id=allocation.pk)
     elif allocation.status in deactivate_project_states:
         # Check for other approved allocations before deactivating
-        num_approved_allocations = SystemAllocationRequest.objects.filter(
+        num_other_approved_allocations = SystemAllocationRequest.objects.filter(
             project=project,
             status=SystemAllocationRequest.APPROVED,
-        ).count()
+        ).exclude(pk=allocation.pk).count()
 
-        if num_approved_allocations == 1:
-            project_api.deactivate_project.delay(allocation=allocation)
+        if num_other_approved_allocations == 0:
+            jobs.deactivate_project.delay(allocation_id=allocation.pk)
         else:
             logger.warning(
                 'Failed to deactivate project system allocation request.'
@@ -47,20 +47,35 @@ def update_openldap_project_membership(project_membership):
         ProjectUserMembership.SUSPENDED,
     ]
     if project_membership.status == ProjectUserMembership.AUTHORISED:
-        project_membership_api.create_project_membership.delay(
-            project_membership=project_membership
+        jobs.create_project_membership.delay(
+            project_membership_id=project_membership.pk
         )
     elif project_membership.status in delete_project_membership_states:
-        project_membership_api.delete_project_membership.delay(
-            project_membership=project_membership
+        jobs.delete_project_membership.delay(
+            project_membership_id=project_membership.pk
+        )
+
+
+def create_openldap_project_memberships(project_memberships, notify_user=True):
+    """
+    Propagate several authorised project memberships to OpenLDAP, with one
+    job for each project rather than one for each membership.
+    """
+    membership_ids_by_project = {}
+    for project_membership in project_memberships:
+        membership_ids_by_project.setdefault(
+            project_membership.project_id, []
+        ).append(project_membership.pk)
+    for project_id, membership_ids in membership_ids_by_project.items():
+        jobs.create_project_memberships.delay(
+            project_id=project_id,
+            project_membership_ids=membership_ids,
+            notify_user=notify_user,
         )
 
 
 def activate_existing_users(project):
     memberships = ProjectUserMembership.objects.filter(
         project=project, status=ProjectUserMembership.AUTHORISED
-    )
-    for membership in memberships:
-        project_membership_api.create_project_membership.delay(
-            project_membership=membership
-        )
+    ).only('pk', 'project_id')
+    create_openldap_project_memberships(memberships)
@@ -1,8 +1,9 @@
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 
-from project.models import Project
+from common import cache
+from project.models import Project, ProjectUserMembership
 
 
 @receiver(pre_delete, sender=Project)
@@ -17,3 +18,13 @@ def remove_tech_lead_from_project_owner(**kwargs):
     if techlead_projects.count() == 1:
         group = Group.objects.get(name='project_owner')
         tech_lead.groups.remove(group)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=ProjectUserMembership)
+@receiver(post_delete, sender=ProjectUserMembership)
+def invalidate_project_user_memberships(**kwargs):
+    # Counts of memberships awaiting authorisation depend on both the
+    # memberships and the tech lead of their projects
+    cache.invalidate('project_user_memberships')
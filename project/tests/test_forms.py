@@ -5,9 +5,11 @@ import string
 import mock
 from django.conf import settings
 from django.core import mail
+from django.db import transaction
 from django.test import TestCase
 
 from institution.models import Institution
+from openldap import jobs
 from openldap.tests.test_api import OpenLDAPBaseAPITests
 from openldap.tests.test_project_api import OpenLDAPProjectAPITests
 from openldap.tests.test_project_membership_api import \
@@ -15,7 +17,7 @@ from openldap.tests.test_project_membership_api import \
 from project.forms import (
     ProjectCreationForm, ProjectManageAttributionForm,
     ProjectSupervisorApproveForm, ProjectUserInviteForm,
-    ProjectUserMembershipCreationForm, RSEAllocationRequestCreationForm,
+    ProjectUserMembershipAdminForm, ProjectUserMembershipCreationForm, RSEAllocationRequestCreationForm,
     SystemAllocationRequestAdminForm, SystemAllocationRequestCreationForm
 )
 from project.models import (
@@ -48,7 +50,7 @@ class SystemAllocationRequestAdminFormTests(TestCase):
 
     # yapf: disable
     @mock.patch(
-        'requests.post',
+        'requests.Session.post',
         side_effect=[
             OpenLDAPProjectAPITests.mock_create_project_response(),
             OpenLDAPProjectMembershipAPITests.mock_create_project_membership_response()
@@ -149,7 +151,7 @@ class SystemAllocationRequestAdminFormTests(TestCase):
 
     # yapf: disable
     @mock.patch(
-        'requests.delete',
+        'requests.Session.delete',
         side_effect=[OpenLDAPProjectAPITests.mock_deactivate_project_response()]
     )
     # yapf: enable
@@ -213,7 +215,7 @@ class SystemAllocationRequestAdminFormTests(TestCase):
 
     # yapf: disable
     @mock.patch(
-        'requests.put',
+        'requests.Session.put',
         side_effect=[OpenLDAPProjectAPITests.mock_reactivate_project_response()]
     )
     # yapf: enable
@@ -278,6 +280,64 @@ class SystemAllocationRequestAdminFormTests(TestCase):
         self.assertNotEqual(email.body.find(self.tech_lead.first_name), -1)
 
 
+class ProjectUserMembershipAdminFormTests(TestCase):
+    """
+    Ensure OpenLDAP jobs queued by the admin form see the saved membership.
+    """
+
+    fixtures = [
+        'institution/fixtures/tests/institutions.json',
+        'users/fixtures/tests/users.json',
+        'funding/fixtures/tests/funding_bodies.json',
+        'funding/fixtures/tests/attributions.json',
+        'project/fixtures/tests/categories.json',
+        'project/fixtures/tests/projects.json',
+        'project/fixtures/tests/memberships.json',
+    ]
+
+    @mock.patch('openldap.jobs.create_project_membership.delay')
+    def test_job_is_queued_after_commit(self, delay_mock):
+        """
+        Ensure the job is only queued once the membership is committed, as
+        the admin saves it after the form, and that the job loads it with
+        its new status.
+        """
+        loaded = []
+        delay_mock.side_effect = lambda project_membership_id: loaded.append(
+            jobs.load(
+                'project.ProjectUserMembership', project_membership_id,
+                jobs.PROJECT_MEMBERSHIP_RELATED
+            )
+        )
+        form = ProjectUserMembershipAdminForm(
+            data={
+                'project': 1,
+                'user': 8,
+                'status': ProjectUserMembership.AUTHORISED,
+                'date_joined': '2019-07-30',
+                'date_left': '2020-07-30',
+            }
+        )
+        self.assertTrue(form.is_valid())
+
+        # Test cases never commit, so run the commit callbacks by hand
+        callbacks = []
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=callbacks.append
+        ):
+            with transaction.atomic():
+                membership = form.save(commit=False)
+                membership.save()
+        delay_mock.assert_not_called()
+        for callback in callbacks:
+            callback()
+
+        delay_mock.assert_called_once_with(
+            project_membership_id=membership.pk
+        )
+        self.assertEqual(loaded[0].pk, membership.pk)
+        self.assertEqual(loaded[0].status, ProjectUserMembership.AUTHORISED)
+
 class ProjectFormTestCase(TestCase):
 
     fixtures = [
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserChangeForm
 from django.contrib.auth.models import Permission
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 
 from institution.exceptions import InvalidInstitutionalEmailAddress
@@ -29,14 +30,16 @@ class ProfileUpdateForm(forms.ModelForm):
 
     def save(self, commit=True):
         profile = super(ProfileUpdateForm, self).save(commit=False)
-
-        # Ensure any updates to the account status are propagated to LDAP.
         profile.previous_account_status = self.initial_account_status
-        if self.initial_account_status != profile.account_status:
-            update_openldap_user(profile)
-
         if commit:
             profile.save()
+
+        # Ensure any updates to the account status are propagated to LDAP,
+        # once the profile has been saved and committed. The admin saves
+        # the profile after calling save(commit=False), in the same
+        # transaction.
+        if self.initial_account_status != profile.account_status:
+            transaction.on_commit(lambda: update_openldap_user(profile))
         return profile
 
 
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 from django.conf import settings
 from django.contrib import auth
@@ -6,38 +7,75 @@ from django.contrib.auth import load_backend
 from django.contrib.auth.backends import RemoteUserBackend
 from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import resolve, reverse
+from django.utils import translation
 from shibboleth.middleware import (
     ShibbolethRemoteUserMiddleware, ShibbolethValidationError
 )
 
-from institution.exceptions import InvalidInstitutionalIndentityProvider
-from institution.models import Institution
+from institution.registry import institution_registry
+
+# Session key flagging that the user has completed their registration and
+# accepted the terms of service
+ONBOARDED_SESSION_KEY = 'onboarded'
+
+
+@lru_cache(maxsize=None)
+def get_path(url_name, language):
+    """
+    Reverse a URL once for each language, which prefixes the URL's path.
+    """
+    with translation.override(language):
+        return reverse(url_name)
 
 
 class TermsOfServiceMiddleware:
+    """
+    Redirect authenticated users to complete their registration and accept
+    the terms of service, before any other view is run.
+
+    Once a user has done both, their session is flagged so that later
+    requests skip the checks without loading the user.
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        response = self.get_response(request)
-        if request.user.is_authenticated:
-            if (
-                request.user.first_name == '' and
-                request.user.last_name == '' and
-                request.session.get('shib', None)
-            ):
-                if not request.path.startswith(
-                    reverse('complete-registration')
-                ):
-                    return HttpResponseRedirect(
-                        reverse('complete-registration')
-                    )
-            elif not request.user.accepted_terms_and_conditions:
-                if not request.path.startswith(reverse('terms-of-service')):
-                    return HttpResponseRedirect(reverse('terms-of-service'))
+        response = self.get_onboarding_redirect(request)
+        if response is None:
+            response = self.get_response(request)
         return response
 
+    def get_onboarding_redirect(self, request):
+        user_id = request.session.get(auth.SESSION_KEY)
+        if (
+            user_id is None or
+            request.session.get(ONBOARDED_SESSION_KEY) == user_id or
+            not request.user.is_authenticated
+        ):
+            return None
+
+        language = translation.get_language()
+        if (
+            request.user.first_name == '' and
+            request.user.last_name == '' and
+            request.session.get('shib', None)
+        ):
+            path = get_path('complete-registration', language)
+        elif not request.user.accepted_terms_and_conditions:
+            path = get_path('terms-of-service', language)
+        else:
+            request.session[ONBOARDED_SESSION_KEY] = user_id
+            return None
+
+        # Users can always log out
+        if (
+            request.path.startswith(path) or
+            request.path.startswith(get_path('logout', language))
+        ):
+            return None
+        return HttpResponseRedirect(path)
+
 
 class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
 
@@ -45,7 +83,9 @@ class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
         # The identity of external collaborators is managed within the django application.
         # Therefore, exclude the external collaborator login form from the SCW Remote User
         # Middleware.
-        if request.path.startswith(reverse('external-login')):
+        if request.path.startswith(
+            get_path('external-login', translation.get_language())
+        ):
             return
 
         # AuthenticationMiddleware is required so that request.user exists.
@@ -81,18 +121,16 @@ class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
             return
 
         # Ensure the Shib-Identity-Provider is supported / valid.
-        try:
-            Institution.is_valid_identity_provider(identity_provider)
-        except InvalidInstitutionalIndentityProvider:
+        institution = institution_registry.get_by_identity_provider(
+            identity_provider
+        )
+        if institution is None:
             return
 
         # The REMOTE USER header may return the authenticated user's email address or username.
         email_regex = r'(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)'
         if not re.match(email_regex, username):
             # Must append the institutions base domain to the username.
-            institution = Institution.objects.get(
-                identity_provider=identity_provider
-            )
             username = '@'.join([username, institution.base_domain])
 
         # If the user is already authenticated and that user is the user we are getting passed in
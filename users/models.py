@@ -9,6 +9,7 @@ from django.utils.translation import gettext_lazy as _
 from users.openldap import update_openldap_user
 
 from institution.models import Institution
+from institution.registry import institution_registry
 from users.notifications import user_created_notification
 
 
@@ -324,8 +325,13 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def save(self, *args, **kwargs):
         super(CustomUser, self).save(*args, **kwargs)
         if self.is_shibboleth_login_required:
-            _, domain = self.email.split('@')
-            institution = Institution.objects.get(base_domain=domain)
+            institution = institution_registry.get_by_email_address(
+                self.email
+            )
+            if institution is None:
+                raise Institution.DoesNotExist(
+                    'No institution has the domain of {}'.format(self.email)
+                )
             obj, created = ShibbolethProfile.objects.update_or_create(
                 user=self,
                 defaults={
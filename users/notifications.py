@@ -8,7 +8,7 @@ from institution.models import Institution
 from common.util import email_user
 
 
-@job
+@job('email')
 def user_created_notification(user):
     """
     Notify support that a user has created an account. 
@@ -3,7 +3,7 @@ import re
 from django.http import JsonResponse
 from django.utils.translation import gettext as _
 
-from openldap.api import user_api
+from openldap import jobs
 
 
 def reset_openldap_password(request):
@@ -26,7 +26,7 @@ def reset_openldap_password(request):
             raise ValidationError()
 
         # Submit an OpenLDAP password reset request.
-        user_api.reset_user_password.delay(user=request.user, password=password)
+        jobs.reset_user_password.delay(user_id=request.user.pk, password=password)
 
         message = _('Successfully submitted a password reset request. You should receive a '
                     'confirmation email once the request has been processed.')
@@ -49,8 +49,8 @@ def update_openldap_user(profile):
     ]
     if profile.account_status == profile.APPROVED:
         if profile.scw_username:
-            user_api.activate_user_account.delay(user=profile.user)
+            jobs.activate_user_account.delay(user_id=profile.user_id)
         else:
-            user_api.create_user.delay(user=profile.user)
+            jobs.create_user.delay(user_id=profile.user_id)
     elif profile.account_status in deactivate_user_states:
-        user_api.deactivate_user_account.delay(user=profile.user)
+        jobs.deactivate_user_account.delay(user_id=profile.user_id)
@@ -36,7 +36,7 @@ class ProfileUpdateFormTests(TestCase):
         )
 
     @mock.patch(
-        'requests.post',
+        'requests.Session.post',
         side_effect=[OpenLDAPUserAPITests.mock_profile_activation_response()]
     )
     def test_profile_activation(self, post_mock):
@@ -101,7 +101,7 @@ class ProfileUpdateFormTests(TestCase):
         post_mock.call_args_list = []
 
     @mock.patch(
-        'requests.delete',
+        'requests.Session.delete',
         side_effect=[
             OpenLDAPUserAPITests.mock_profile_deactivation_response(),
             OpenLDAPUserAPITests.mock_profile_deactivation_response()
@@ -0,0 +1,85 @@
+import mock
+
+from django.contrib import auth
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from users.middleware import ONBOARDED_SESSION_KEY, TermsOfServiceMiddleware
+from users.models import CustomUser
+
+
+class TermsOfServiceMiddlewareTests(TestCase):
+
+    fixtures = [
+        'institution/fixtures/tests/institutions.json',
+        'users/fixtures/tests/users.json',
+    ]
+
+    def setUp(self):
+        self.view = mock.Mock(return_value='response')
+        self.middleware = TermsOfServiceMiddleware(self.view)
+
+    def get_request(self, user, path):
+        request = RequestFactory().get(path)
+        SessionMiddleware().process_request(request)
+        request.session[auth.SESSION_KEY] = str(user.pk)
+        request.user = SimpleLazyObject(
+            lambda: CustomUser.objects.get(pk=user.pk)
+        )
+        return request
+
+    def test_redirect_before_view(self):
+        """
+        Ensure a user who has not accepted the terms of service is
+        redirected without the view being run.
+        """
+        user = CustomUser.objects.get(email='shibboleth.user@example.ac.uk')
+        user.accepted_terms_and_conditions = False
+        user.save()
+
+        response = self.middleware(self.get_request(user, reverse('home')))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('terms-of-service'))
+        self.view.assert_not_called()
+
+        for path in (reverse('terms-of-service'), reverse('logout')):
+            request = self.get_request(user, path)
+            self.assertEqual(self.middleware(request), 'response')
+            self.assertNotIn(ONBOARDED_SESSION_KEY, request.session)
+
+    def test_redirect_to_complete_registration(self):
+        user = CustomUser.objects.get(
+            email='preregistered.user@example.ac.uk'
+        )
+        request = self.get_request(user, reverse('home'))
+        request.session['shib'] = {'username': user.email}
+        response = self.middleware(request)
+        self.assertEqual(response.url, reverse('complete-registration'))
+        self.view.assert_not_called()
+
+    def test_onboarded_user_is_not_loaded(self):
+        """
+        Ensure the checks are skipped for a user already found to have
+        completed their registration and accepted the terms of service.
+        """
+        user = CustomUser.objects.get(email='shibboleth.user@example.ac.uk')
+        request = self.get_request(user, reverse('home'))
+        self.assertEqual(self.middleware(request), 'response')
+        self.assertEqual(request.session[ONBOARDED_SESSION_KEY], str(user.pk))
+
+        request = self.get_request(user, reverse('home'))
+        request.session[ONBOARDED_SESSION_KEY] = str(user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.middleware(request), 'response')
+
+        # The flag is only trusted for the user it was set for
+        other_user = CustomUser.objects.get(
+            email='preregistered.user@example.ac.uk'
+        )
+        request = self.get_request(other_user, reverse('home'))
+        request.session[ONBOARDED_SESSION_KEY] = str(user.pk)
+        self.assertEqual(
+            self.middleware(request).url, reverse('terms-of-service')
+        )
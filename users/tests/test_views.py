@@ -1,6 +1,11 @@
-from django.test import TestCase
+import mock
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils.html import escape
 
+from common import cache
+from common.testing import LOCAL_CACHES
 from institution.models import Institution
 from users.models import CustomUser
 from users.models import Profile
@@ -120,6 +125,7 @@ class CompleteRegistrationViewTests(UserViewTests, TestCase):
                                    CompleteRegistrationView))
 
 
+@override_settings(CACHES=LOCAL_CACHES)
 class LoginViewTests(UserViewTests, TestCase):
 
     def test_login_view_as_an_unauthorised_user(self):
@@ -153,6 +159,67 @@ class LoginViewTests(UserViewTests, TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('home'))
 
+    def test_login_view_caches_institutions(self):
+        """
+        Ensure the list of institutions is rendered once and cached until an
+        institution changes, so that the login page makes no queries.
+        """
+        cache.get_cache().clear()
+        self.client.get(reverse('login'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('login'))
+        self.assertContains(response, self.institution.identity_provider)
+        self.assertEqual(cache.get_stats('login'), {'hits': 1, 'misses': 1})
+
+        self.institution.identity_provider = 'https://login.example.ac.uk/idp'
+        # Run the commit callbacks, as test cases never commit
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=lambda func: func()
+        ):
+            self.institution.save()
+        response = self.client.get(reverse('login'))
+        self.assertContains(response, 'https://login.example.ac.uk/idp')
+
+    def test_login_view_caches_institutions_once_for_every_next_url(self):
+        """
+        Ensure the cached list of institutions does not depend on the next
+        URL, which is put in its links afterwards, escaped, if it is safe.
+        """
+        cache.get_cache().clear()
+        for next_url in ('/en-gb/projects/', '/en-gb/?a=1&b=2'):
+            response = self.client.get(reverse('login'), {'next': next_url})
+            self.assertContains(
+                response, 'https://scw.bangor.ac.uk' + escape(next_url)
+            )
+        self.assertEqual(cache.get_stats('login'), {'hits': 1, 'misses': 1})
+
+        response = self.client.get(
+            reverse('login'), {'next': 'https://example.com/'}
+        )
+        self.assertNotContains(response, 'example.com')
+        self.assertEqual(cache.get_stats('login'), {'hits': 2, 'misses': 1})
+
+    def test_login_view_revalidation(self):
+        """
+        Ensure the login page can be cached and revalidated using its ETag.
+        """
+        response = self.client.get(reverse('login'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.client.get(reverse('login'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(
+            reverse('login'), {'next': '/en-gb/projects/'},
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/en-gb/projects/')
+        self.assertNotEqual(response['ETag'], etag)
+
 
 class LogoutViewTests(UserViewTests, TestCase):
 
@@ -1,16 +1,110 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import LoginView
 from django.shortcuts import redirect
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.urls import reverse_lazy
+from django.utils import translation
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.html import escape
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
 from django.views import generic
 
+from common import cache
+from institution.models import Institution
 from users.forms import RegisterForm
 from users.forms import TermsOfServiceForm
 from users.models import CustomUser
 
 
+class EducationalLoginView(LoginView):
+    """
+    The login page of users from educational institutions.
+
+    The list of institutions is rendered once for each language and cached
+    until an institution changes, and the page carries an ETag so that
+    browsers revalidating it get a 304 without it being rendered again. The
+    `next` URL is left out of the cached list, which would otherwise grow
+    with every URL requested, and put in its links afterwards.
+    """
+    # Stands for the `next` URL in the cached list of institutions
+    next_placeholder = '__login_next_url__'
+    redirect_authenticated_user = True
+    template_name = 'registration/educational_login.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            # LoginView forbids caching, which is only needed for its form
+            del response['Cache-Control']
+            del response['Expires']
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.LOGIN_PAGE_CACHE_MAX_AGE,
+            )
+            patch_vary_headers(response, ['Cookie'])
+        return response
+
+    def get(self, request, *args, **kwargs):
+        self.institutions_html = self.get_institutions_html()
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def get_institutions_html(self):
+        institutions_html = cache.get_or_set(
+            'login',
+            ['institutions', translation.get_language()],
+            lambda: render_to_string(
+                'registration/institutions.html',
+                {
+                    'institutions': Institution.objects.order_by('name'),
+                    'shibboleth_idp_login':
+                        settings.SHIBBOLETH_IDENTITY_PROVIDER_LOGIN,
+                    'next': self.next_placeholder,
+                },
+            ),
+            tags=['institutions'],
+        )
+        # get_redirect_url() only returns a URL which is safe to redirect to
+        return institutions_html.replace(
+            self.next_placeholder, escape(self.get_redirect_url())
+        )
+
+    def get_etag(self):
+        """
+        Build the ETag of the page from everything it is rendered from.
+        """
+        checksum = hashlib.md5()
+        for part in (
+            self.request.path,
+            self.institutions_html,
+            self.request.session.get(
+                settings.SHIBBOLETH_FORCE_REAUTH_SESSION_KEY
+            ),
+            self.request.COOKIES.get('cookielaw_accepted'),
+        ):
+            checksum.update(str(part).encode())
+            checksum.update(b'\0')
+        return quote_etag(checksum.hexdigest())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['institutions_html'] = mark_safe(self.institutions_html)
+        return context
+
+
 class TermsOfService(LoginRequiredMixin, generic.UpdateView):
     form_class = TermsOfServiceForm
     model = CustomUser